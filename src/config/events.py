@@ -1,11 +1,11 @@
 import json
 import typing
+from datetime import datetime
 import fastapi
 from utils.logger import logger
 from memory.metadata import metadata_map
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.schedulers.background import BackgroundScheduler
 from router.events import (
     initialize_correlation,
     initialize_metadata,
@@ -17,28 +17,93 @@ from router.events import (
     initialize_intra_long_short,
     initialize_long_short,
     update_atm_iv_data,
+    update_atm_iv_data_async,
+    warm_up,
+    end_of_day,
     initialize_atr,
-    initialize_surface_iv
-    
+    initialize_surface_iv,
+    snapshots,
 )
 from config.manager import settings
+from utils.api import close_async_http_client, close_http_client, token_manager
+from utils.stream import UpstreamSubscriber
+from utils.journal import recorder
+from utils.pacing import TickPacer
+from utils.offload import cpu_pool
+from utils.session import MarketCalendar, SessionController
+from utils.common import CONFIG
+from contants.dates import EXPIRY
+
+# jobs run on the app's event loop; the tick is a coroutine, plain functions
+# (session checks) go to the loop's default executor
+scheduler = AsyncIOScheduler()
+subscriber = UpstreamSubscriber(update_atm_iv_data, settings.PUSH_DEBOUNCE_MS)
+# in push mode the interval is only a safety net, never stretch it
+pacer = TickPacer(
+    "atm_iv_update",
+    adaptive=settings.TICK_ADAPTIVE_INTERVAL and settings.INGESTION_MODE != "push",
+    headroom=settings.TICK_INTERVAL_HEADROOM,
+    max_interval_ms=settings.TICK_INTERVAL_MAX,
+)
+session = SessionController(
+    MarketCalendar(
+        CONFIG["SESSION_PRE_OPEN"],
+        CONFIG["SESSION_OPEN"],
+        CONFIG["SESSION_CLOSE"],
+        CONFIG["SESSION_HOLIDAYS"],
+    ),
+    enabled=settings.MARKET_SESSION,
+    after_hours_ms=CONFIG["SESSION_AFTER_HOURS_INTERVAL"],
+    warm_up=warm_up,
+    end_of_day=end_of_day,
+)
+
 
-scheduler = BackgroundScheduler()
+def open_interval() -> int:
+    if settings.INGESTION_MODE == "push":
+        return settings.PUSH_FALLBACK_INTERVAL
+    return settings.ATM_UPDATE_INTERVAL
 
 
 def start_scheduler() -> None:
     logger.info("Starting Scheduler")
+    token_manager.start()
+    if settings.JOURNAL_DIR:
+        recorder.open(settings.JOURNAL_DIR, {"expiries": EXPIRY})
+    if settings.INGESTION_MODE == "push":
+        # updates are driven by the upstream stream, the interval job is only
+        # a slow safety net in case the stream silently stalls
+        logger.info("Starting upstream subscriber")
+        subscriber.start()
+    pacer.attach(scheduler, open_interval())
+    # at most one tick pending, a tick due while one runs is dropped and counted
     scheduler.add_job(
-        update_atm_iv_data,
-        IntervalTrigger(seconds=settings.ATM_UPDATE_INTERVAL / 1000),
+        pacer.wrap(update_atm_iv_data_async),
+        pacer.trigger(),
         id="atm_iv_update",
+        coalesce=True,
+        max_instances=1,
+    )
+    # pauses or slows the tick outside the session, first check right away
+    session.attach(scheduler, pacer, "atm_iv_update", open_interval)
+    scheduler.add_job(
+        session.check,
+        IntervalTrigger(seconds=15),
+        id="market_session",
+        next_run_time=datetime.now(),
+        coalesce=True,
+        max_instances=1,
     )
     scheduler.start()
 
 
 def stop_scheduler() -> None:
     logger.info("Stopping Scheduler")
+    subscriber.stop()
+    token_manager.stop()
     scheduler.shutdown()
+    cpu_pool.shutdown()
+    recorder.close()
 
 
 def execute_backend_server_event_handler(backend_app: fastapi.FastAPI) -> typing.Any:
@@ -78,6 +143,10 @@ def execute_backend_server_event_handler(backend_app: fastapi.FastAPI) -> typing
 
         logger.info("Initializing Surface IV Screener...")
         initialize_surface_iv()
+
+        # endpoints serve the initialized state until the first tick publishes
+        snapshots.capture_all()
+        snapshots.publish()
         logger.info("Initialization complete.")
 
     return launch_backend_server_events
@@ -87,5 +156,7 @@ def terminate_backend_server_event_handler(backend_app: fastapi.FastAPI) -> typi
     async def stop_backend_server_events() -> None:
         print("Shuting down")
         metadata_map.clear_metadata()
+        close_http_client()
+        await close_async_http_client()
 
     return stop_backend_server_events
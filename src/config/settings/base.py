@@ -50,9 +50,79 @@ class BackendBaseSettings(BaseSettings):
 
     AT_VALIDITY: float = decouple.config("ATH_VALIDITY", cast=float, default=30 * 60.0)  # type: ignore
     RT_VALIDITY: float = decouple.config("RT_VALIDITY", cast=float, default=12 * 60 * 60.0)  # type: ignore
+    TOKEN_REFRESH_MARGIN: float = decouple.config("TOKEN_REFRESH_MARGIN", cast=float, default=60.0)  # type: ignore
+    TOKEN_MAX_BACKOFF: float = decouple.config("TOKEN_MAX_BACKOFF", cast=float, default=60.0)  # type: ignore
 
     BACKEND_URL: str = decouple.config("ATHENA_SERVER_URL", cast=str)  # type: ignore
 
+    HTTP2_ENABLED: bool = decouple.config("HTTP2_ENABLED", cast=bool, default=False)  # type: ignore
+    HTTP_MAX_CONNECTIONS: int = decouple.config("HTTP_MAX_CONNECTIONS", cast=int, default=20)  # type: ignore
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = decouple.config("HTTP_MAX_KEEPALIVE_CONNECTIONS", cast=int, default=10)  # type: ignore
+    HTTP_KEEPALIVE_EXPIRY: float = decouple.config("HTTP_KEEPALIVE_EXPIRY", cast=float, default=30.0)  # type: ignore
+    HTTP_CONNECT_TIMEOUT: float = decouple.config("HTTP_CONNECT_TIMEOUT", cast=float, default=5.0)  # type: ignore
+    HTTP_READ_TIMEOUT: float = decouple.config("HTTP_READ_TIMEOUT", cast=float, default=10.0)  # type: ignore
+    HTTP_POOL_TIMEOUT: float = decouple.config("HTTP_POOL_TIMEOUT", cast=float, default=5.0)  # type: ignore
+
+    UPSTREAM_INCREMENTAL: bool = decouple.config("UPSTREAM_INCREMENTAL", cast=bool, default=True)  # type: ignore
+
+    # per endpoint read timeouts and hedging delays, in seconds (0 disables hedging)
+    ATM_IV_TIMEOUT: float = decouple.config("ATM_IV_TIMEOUT", cast=float, default=5.0)  # type: ignore
+    SKEW_TIMEOUT: float = decouple.config("SKEW_TIMEOUT", cast=float, default=5.0)  # type: ignore
+    TOKEN_SET_TIMEOUT: float = decouple.config("TOKEN_SET_TIMEOUT", cast=float, default=15.0)  # type: ignore
+    ATM_IV_HEDGE_AFTER: float = decouple.config("ATM_IV_HEDGE_AFTER", cast=float, default=1.5)  # type: ignore
+    SKEW_HEDGE_AFTER: float = decouple.config("SKEW_HEDGE_AFTER", cast=float, default=1.5)  # type: ignore
+    TOKEN_SET_HEDGE_AFTER: float = decouple.config("TOKEN_SET_HEDGE_AFTER", cast=float, default=0.0)  # type: ignore
+    UPSTREAM_RETRIES: int = decouple.config("UPSTREAM_RETRIES", cast=int, default=2)  # type: ignore
+    UPSTREAM_RETRY_BASE: float = decouple.config("UPSTREAM_RETRY_BASE", cast=float, default=0.2)  # type: ignore
+    UPSTREAM_RETRY_CAP: float = decouple.config("UPSTREAM_RETRY_CAP", cast=float, default=2.0)  # type: ignore
+    BREAKER_THRESHOLD: int = decouple.config("BREAKER_THRESHOLD", cast=int, default=5)  # type: ignore
+    BREAKER_COOLDOWN: float = decouple.config("BREAKER_COOLDOWN", cast=float, default=30.0)  # type: ignore
+    TICK_DEADLINE: float = decouple.config("TICK_DEADLINE", cast=float, default=5.0)  # type: ignore  # in seconds
+    # per screener stage, 0 leaves only TICK_DEADLINE; a late stage blocks its dependents for the tick
+    STAGE_TIMEOUT: float = decouple.config("STAGE_TIMEOUT", cast=float, default=0.0)  # type: ignore  # in seconds
+    # CPU time a tick may spend before best effort screeners are deferred, 0 never defers;
+    # a screener deferred for TICK_MAX_DEFER runs regardless
+    TICK_CPU_BUDGET: int = decouple.config("TICK_CPU_BUDGET", cast=int, default=0)  # type: ignore  # in ms
+    TICK_MAX_DEFER: float = decouple.config("TICK_MAX_DEFER", cast=float, default=30.0)  # type: ignore  # in seconds
+    # screeners unread for this long stop recomputing, 0 keeps all running. The first read
+    # after that catches up ("sync", waiting up to LAZY_CATCHUP_WAIT for the tick) or is served stale ("stale")
+    SCREENER_IDLE_AFTER: float = decouple.config("SCREENER_IDLE_AFTER", cast=float, default=0.0)  # type: ignore  # in seconds
+    LAZY_CATCHUP: str = decouple.config("LAZY_CATCHUP", cast=str, default="sync")  # type: ignore
+    LAZY_CATCHUP_WAIT: float = decouple.config("LAZY_CATCHUP_WAIT", cast=float, default=2.0)  # type: ignore  # in seconds
+    # worker processes for the CPU heavy kernels of calendars/bcrs, 0 runs them in the stage thread
+    CPU_WORKERS: int = decouple.config("CPU_WORKERS", cast=int, default=0)  # type: ignore
+
+    # tiered option chain polling: hot symbols every tick, the rest in CHAIN_COLD_EVERY buckets
+    CHAIN_TIERING: bool = decouple.config("CHAIN_TIERING", cast=bool, default=True)  # type: ignore
+    CHAIN_HOT_SIZE: int = decouple.config("CHAIN_HOT_SIZE", cast=int, default=40)  # type: ignore
+    CHAIN_COLD_EVERY: int = decouple.config("CHAIN_COLD_EVERY", cast=int, default=5)  # type: ignore
+    CHAIN_ACTIVITY_DECAY: float = decouple.config("CHAIN_ACTIVITY_DECAY", cast=float, default=0.8)  # type: ignore
+
+    # option chain requests are split in concurrent shards of this many symbols
+    CHAIN_SHARD_SIZE: int = decouple.config("CHAIN_SHARD_SIZE", cast=int, default=100)  # type: ignore
+    CHAIN_SHARD_BY_EXPIRY: bool = decouple.config("CHAIN_SHARD_BY_EXPIRY", cast=bool, default=False)  # type: ignore
+    CHAIN_SHARD_CONCURRENCY: int = decouple.config("CHAIN_SHARD_CONCURRENCY", cast=int, default=8)  # type: ignore
+
+    INGESTION_MODE: str = decouple.config("INGESTION_MODE", cast=str, default="poll")  # type: ignore  # "poll" or "push"
+    PUSH_DEBOUNCE_MS: int = decouple.config("PUSH_DEBOUNCE_MS", cast=int, default=200)  # type: ignore
+    PUSH_FALLBACK_INTERVAL: int = decouple.config("PUSH_FALLBACK_INTERVAL", cast=int, default=30000)  # type: ignore  # in miliseconds
+
+    # /screener/stream and /screener/ws: messages a subscriber may fall behind before it is dropped,
+    # and the heartbeat sent on a quiet connection
+    STREAM_QUEUE_SIZE: int = decouple.config("STREAM_QUEUE_SIZE", cast=int, default=64)  # type: ignore
+    STREAM_HEARTBEAT: float = decouple.config("STREAM_HEARTBEAT", cast=float, default=15.0)  # type: ignore  # in seconds
+
+    # stretch the tick interval to the measured tick time x headroom, between
+    # ATM_UPDATE_INTERVAL and TICK_INTERVAL_MAX
+    TICK_ADAPTIVE_INTERVAL: bool = decouple.config("TICK_ADAPTIVE_INTERVAL", cast=bool, default=False)  # type: ignore
+    TICK_INTERVAL_HEADROOM: float = decouple.config("TICK_INTERVAL_HEADROOM", cast=float, default=1.2)  # type: ignore
+    TICK_INTERVAL_MAX: int = decouple.config("TICK_INTERVAL_MAX", cast=int, default=10000)  # type: ignore  # in miliseconds
+
+    # pace the tick by the market session in scan_config.json (SESSION_*), False polls around the clock
+    MARKET_SESSION: bool = decouple.config("MARKET_SESSION", cast=bool, default=True)  # type: ignore
+
+    JOURNAL_DIR: str = decouple.config("JOURNAL_DIR", cast=str, default="")  # type: ignore  # empty disables recording
+
     AUTH_STORAGE_DIR: pathlib.Path = decouple.config("AUTH_STORAGE_DIR", cast=pathlib.Path, default=PARENT_DIR / "auth_storage")  # type: ignore
 
     class Config(SettingsConfigDict):
@@ -46,7 +46,8 @@ def get_computed_expiries():
     return cached_expiry_dates
 
 
-MONTHLY_EXPIRY_1, MONTHLY_EXPIRY_2, MONTHLY_EXPIRY_3 = get_cached_monthly_expiry_dates()
+# screeners work on the three nearest monthlies, upstream may list more
+MONTHLY_EXPIRY_1, MONTHLY_EXPIRY_2, MONTHLY_EXPIRY_3 = get_cached_monthly_expiry_dates()[:3]
 
 EXPIRY = [
     format_date(MONTHLY_EXPIRY_1, "%Y-%m-%d"),
@@ -1,3 +1,9 @@
+import multiprocessing
+
+# frozen builds start CPU workers (utils.offload) by running this executable
+# again, hand them over before the app is imported
+multiprocessing.freeze_support()
+
 import os
 import fastapi
 from pathlib import Path
@@ -7,29 +13,23 @@ from fastapi.middleware.gzip import GZipMiddleware
 
 # from fastapi_profiler import PyInstrumentProfilerMiddleware
 
-from router.endpoints import router as api_endpoint_router
-from config.events import (
-    execute_backend_server_event_handler,
-    start_scheduler,
-    stop_scheduler,
-    terminate_backend_server_event_handler,
-)
 from config.manager import settings
 import sys
 import socket
 import signal
 
 
-ip_addr = socket.gethostbyname(socket.gethostname())
-print(ip_addr)
-if settings.CHECK_HOST and ip_addr not in [
-    "192.168.1.78",
-    "192.168.1.81",
-    "192.168.1.206",
-    "192.168.1.139",
-    "192.168.1.178",
-]:
-    exit()
+def check_host():
+    ip_addr = socket.gethostbyname(socket.gethostname())
+    print(ip_addr)
+    if settings.CHECK_HOST and ip_addr not in [
+        "192.168.1.78",
+        "192.168.1.81",
+        "192.168.1.206",
+        "192.168.1.139",
+        "192.168.1.178",
+    ]:
+        exit()
 
 
 def proc_exit_on_signal(signal_number, frame):
@@ -40,11 +40,16 @@ def proc_exit_on_signal(signal_number, frame):
     os._exit(255)
 
 
-signal.signal(signal.SIGINT, proc_exit_on_signal)
-signal.signal(signal.SIGTERM, proc_exit_on_signal)
-
-
 def initialize_backend_application() -> fastapi.FastAPI:
+    from router.endpoints import router as api_endpoint_router
+    from config.events import (
+        execute_backend_server_event_handler,
+        start_scheduler,
+        stop_scheduler,
+        terminate_backend_server_event_handler,
+    )
+    from utils.middleware import DataAgeMiddleware
+
     app = fastapi.FastAPI(**settings.set_backend_app_attributes)  # type: ignore
 
     # app.add_middleware(
@@ -60,9 +65,11 @@ def initialize_backend_application() -> fastapi.FastAPI:
         allow_origins=settings.ALLOWED_ORIGINS,
         allow_methods=settings.ALLOWED_METHODS,
         allow_headers=settings.ALLOWED_HEADERS,
-        allow_credentials=True
+        allow_credentials=True,
+        expose_headers=["X-Data-Age", "X-Stale", "ETag", "Last-Modified"],
     )
     app.add_middleware(GZipMiddleware, minimum_size=1000)
+    app.add_middleware(DataAgeMiddleware, prefix=f"{settings.API_PREFIX}/screener")
 
     app.add_event_handler(
         "startup",
@@ -89,7 +96,13 @@ def initialize_backend_application() -> fastapi.FastAPI:
     return app
 
 
-backend_app: fastapi.FastAPI = initialize_backend_application()
+# spawned CPU workers import this module as __mp_main__ and need none of the app
+if __name__ != "__mp_main__":
+    check_host()
+    signal.signal(signal.SIGINT, proc_exit_on_signal)
+    signal.signal(signal.SIGTERM, proc_exit_on_signal)
+
+    backend_app: fastapi.FastAPI = initialize_backend_application()
 
 if __name__ == "__main__":
 
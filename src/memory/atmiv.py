@@ -5,17 +5,21 @@ import numpy as np
 import json
 from datetime import datetime
 from contants.dates import EXPIRY
+from utils import clock
 from utils.common import asset2df, ASSET_DIR, cols_2, CONFIG
-from utils.api import get_atm_iv_from_api, get_z_score_from_api
+from utils.api import get_atm_iv_from_api, get_z_score_from_api, NOT_MODIFIED
 from utils.logger import logger
+from utils.decode import atm_iv_frame
 
-date_today = datetime.now().date()
+date_today = clock.now().date()
 idv_file_path_exists = os.path.join(ASSET_DIR, "idv_cal", f"{date_today}.csv")
 idv_file_path = os.path.join("idv_cal", f"{date_today}.csv")
 
 MOVE_TRACKER_VAL = CONFIG["MOVE_TRACKER_VAL"]
 
 class ATM_IV:
+    inputs = ()
+
     def __init__(self):
         self.expiry_1: pd.DataFrame = pd.DataFrame()
         self.expiry_2: pd.DataFrame = pd.DataFrame()
@@ -34,7 +38,7 @@ class ATM_IV:
         df.rename(columns={"long_move": "long_move_val", "fut_close": "fut_benchmark"}, inplace=True)
         df["fut_benchmark"] = df["fut_benchmark"].astype(float)
         df["fut_benchmark_track"] = df["fut_benchmark"].astype(float)
-        df[["long_moves", "long_moves_track", "days_theta", "idv_updated_time", "idv_updated_time_track"]] = 0,0,0,str(datetime.now()),str(datetime.now())
+        df[["long_moves", "long_moves_track", "days_theta", "idv_updated_time", "idv_updated_time_track"]] = 0,0,0,str(clock.now()),str(clock.now())
         df["long_move_val"] = df["long_move_val"].fillna(9999999)
         df["long_move_val_track"] = df["full_move"].fillna(9999999)
         df["long_move_val_track"] = df["long_move_val_track"]*MOVE_TRACKER_VAL
@@ -59,7 +63,7 @@ class ATM_IV:
 
     def calc_idv(self, df):
         # df = df[df["expiry"] == (df["expiry"]).unique()[0]]
-        current_time = datetime.now()
+        current_time = clock.now()
 
         condition_check = (abs(df["ltp"] - df["fut_benchmark"]) > df["long_move_val"]) & (df["pct_change"] > -800)
         
@@ -117,23 +121,15 @@ class ATM_IV:
         return df, check_df_1
 
     def _process_atm_iv(self):
-        atm_iv_data = get_atm_iv_from_api().copy()
-        
+        atm_iv_data = get_atm_iv_from_api()
+        if atm_iv_data is NOT_MODIFIED:
+            # nothing moved upstream, keep the current stores untouched
+            return None, None, None, None
+
         # z_score_data = get_z_score_from_api().copy()
         if atm_iv_data is not None : #and z_score_data is not None:
-            df = pd.DataFrame(atm_iv_data)
-
-            columns_to_drop = ["pk", "atm_iv_pk", "errors"]
-            df = df.drop(columns=columns_to_drop)
-            df = df.explode(
-                ["expiry", "atm_strike", "type", "delta", "ltp", "atm_iv", "iv_stats", "percent_change", "ivp"]
-            )
-            # print(df[df["symbol"]=="NIFTY"])
-            # Convert numerical columns to appropriate data types
-            df["pct_change"] = df["percent_change"].apply(lambda x: x['fut'])
-            df["delta"] = df["delta"].astype(float)
-            df["atm_iv"] = df["atm_iv"].astype(float)
-            df["ltp"] = df["ltp"].astype(float)
+            # one row per (symbol, expiry) with typed columns and pct_change
+            df = atm_iv_frame(atm_iv_data)
 
             # df2 = pd.DataFrame(z_score_data)
             # df2 = df2.explode(
@@ -151,6 +147,8 @@ class ATM_IV:
             # )
 
             # merged_df = pd.merge(df, df2, on=["symbol", "expiry"], how="inner")
+            # with incremental polling df may only hold the changed symbols, the
+            # concat + drop_duplicates below merges them into the stores
             merged_df = df
 
             expiry_groups = {
@@ -203,7 +201,7 @@ class ATM_IV:
             )
         else:
             logger.warning("Error in processing ATM IV")
-            return None, None, None
+            return None, None, None, None
 
     def update(self):
         processed_expiry_1, processed_expiry_2, processed_expiry_3, processed_move_tracker = (
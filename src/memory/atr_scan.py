@@ -9,6 +9,8 @@ from utils.common import asset2df
 warnings.filterwarnings("ignore")
 
 class ATR_IV:
+    inputs = ("atm_iv",)
+
     def __init__(self):
         self.expiry_1_short: pd.DataFrame = pd.DataFrame()
         self.expiry_1_long: pd.DataFrame = pd.DataFrame()
@@ -1,5 +1,6 @@
 import json
 from typing import Literal
+import numpy as np
 import pandas as pd
 from contants.dates import EXPIRY
 from utils.api import get_all_token_set
@@ -8,7 +9,10 @@ from .atmiv import memory_atm_iv
 from .calendars import memory_calendars
 from datetime import datetime
 import os
+from utils import clock
 from utils.common import ASSET_DIR, savedf, CONFIG
+from utils.kernels import min_delta_gap
+from utils.offload import cpu_pool, symbol_codes
 
 ## BCRS INIT ##
 BCRS_STRIKE_1_DELTA_LOW = CONFIG["BCRS_CALL_STRIKE_1_DELTA_LOW"]
@@ -30,8 +34,8 @@ CVS_SAVE_TIME = CONFIG["BCRS_CSV_SAVE_TIME"]
 BCRS_LIQUIDITY_CHECK = CONFIG["BCRS_LIQUIDITY_CHECK"]/100
 BCRS_LIQUIDITY_CHECK = 999 if BCRS_LIQUIDITY_CHECK == 0 else BCRS_LIQUIDITY_CHECK
 
-date_today = datetime.now().date()
-date_today_pd = pd.to_datetime('today').date()
+date_today = clock.now().date()
+date_today_pd = date_today
 
 
 bcrs_file_path = os.path.join(ASSET_DIR, "ratio_spread_data", f"{date_today}_bull_call_ratio_spread.csv")
@@ -41,31 +45,33 @@ bprs_file_path = os.path.join(ASSET_DIR, "ratio_spread_data", f"{date_today}_bea
 
 
 class BCRS:
+    inputs = ("atm_iv", "calendars")
+
     def __init__(self):
         self.bcrs_df: pd.DataFrame = pd.DataFrame()
         self.bprs_df: pd.DataFrame = pd.DataFrame()
         self.index_straddle_df: pd.DataFrame = pd.DataFrame()    
-    def find_min_delta_diff(self, row, net_df, strike_diff_delta, pe_or_ce):
-
-        filtered_df = net_df[net_df['symbol'] == row['symbol']]
-        # if row["symbol"] == "AMBUJACEM":
-        #     print(filtered_df)
-        
-        filtered_df['delta_diff'] = row['params.delta'] - filtered_df['params.delta']
-        if pe_or_ce == "PE":
-            filtered_df["delta_diff"] = filtered_df["delta_diff"]*(-1)
-        filtered_df = filtered_df[filtered_df["delta_diff"] >= strike_diff_delta]
-        filtered_df = filtered_df.sort_values(by="delta_diff", ascending=True)
-
-        # if row["symbol"] == "AMBUJACEM":
-        #     print(filtered_df)
-
-        if filtered_df.empty:
-            return 0, 0, 0
-
-        closest_row = filtered_df.head(1)
-    
-        return closest_row['strike_price'].values[0], closest_row["opt_ltp"].values[0], closest_row['params.delta'].values[0]
+    def find_min_delta_diff(self, df, net_df, strike_diff_delta, pe_or_ce):
+        """Strike, mid price and delta of the far leg paired with each near strike of df."""
+        query_symbol, candidate_symbol = symbol_codes(df["symbol"], net_df["symbol"])
+        index = cpu_pool.run(min_delta_gap, {
+            "query_symbol": query_symbol,
+            "query_delta": df["params.delta"].to_numpy(dtype=float),
+            "candidate_symbol": candidate_symbol,
+            "candidate_delta": net_df["params.delta"].to_numpy(dtype=float),
+        }, gap=strike_diff_delta, sign=-1.0 if pe_or_ce == "PE" else 1.0)["index"]
+        found = index >= 0
+
+        def pick(column):
+            values = np.zeros(len(df))
+            values[found] = net_df[column].to_numpy(dtype=float)[index[found]]
+            return values
+
+        return pd.DataFrame({
+            "strike_price_far": pick("strike_price"),
+            "opt_ltp_far": pick("opt_ltp"),
+            "params.delta_far": pick("params.delta"),
+        }, index=df.index)
     
     def _process_ratio_df(self, raw_df, strike_1_delta, strike_2_diff, strike_ratio, pe_ce):
         
@@ -90,8 +96,8 @@ class BCRS:
         bcrs_strikes = bcrs_strikes[["symbol", "pct_change", "ivp", "strike_price", "opt_ltp", "params.delta", "ltp"]]
         # print(near_strikes)
 
-        bcrs_strikes[['strike_price_far', 'opt_ltp_far', 'params.delta_far']] = bcrs_strikes.apply(
-            lambda row: pd.Series(self.find_min_delta_diff(row, bcrs_strikes_all, strike_2_diff, pe_ce)), axis=1
+        bcrs_strikes[['strike_price_far', 'opt_ltp_far', 'params.delta_far']] = self.find_min_delta_diff(
+            bcrs_strikes, bcrs_strikes_all, strike_2_diff, pe_ce
         )
         
         bcrs_strikes["bcrs_val"] = bcrs_strikes["opt_ltp_far"]*strike_ratio - bcrs_strikes["opt_ltp"]
@@ -145,14 +151,16 @@ class BCRS:
         bcrs_df = self._process_ratio_df(ce_df_current, bcrs_strike_1_delta, BCRS_STRIKE_2_DELTA_DIFF, BCRS_STRIKE_RATIO, "CE")
         bprs_df = self._process_ratio_df(pe_df_current, bprs_strike_1_delta, BPRS_STRIKE_2_DELTA_DIFF, BPRS_STRIKE_RATIO, "PE")
 
-        if str(datetime.now().time())>=CVS_SAVE_TIME and not os.path.exists(bcrs_file_path):
-            savedf("ratio_spread_data", f"{date_today}_bull_call_ratio_spread.csv", bcrs_df)
-        
-        if str(datetime.now().time())>=CVS_SAVE_TIME and not os.path.exists(bprs_file_path):
-            savedf("ratio_spread_data", f"{date_today}_bear_put_ratio_spread.csv", bprs_df)
-        
         return bcrs_df, bprs_df, straddle_df
 
+    def save_ratio_spreads(self):
+        """Save today's ratio spreads once, at BCRS_CSV_SAVE_TIME or at the end of day."""
+        if not self.bcrs_df.empty and not os.path.exists(bcrs_file_path):
+            savedf("ratio_spread_data", f"{date_today}_bull_call_ratio_spread.csv", self.bcrs_df)
+
+        if not self.bprs_df.empty and not os.path.exists(bprs_file_path):
+            savedf("ratio_spread_data", f"{date_today}_bear_put_ratio_spread.csv", self.bprs_df)
+
     def update(self):
         processed_bcrs_df, processed_bprs_df, processed_straddle_df = (
             self._process_bcrs()
@@ -167,6 +175,9 @@ class BCRS:
         if processed_straddle_df is not None:
             self.index_straddle_df = processed_straddle_df
 
+        if str(clock.now().time())>=CVS_SAVE_TIME:
+            self.save_ratio_spreads()
+
     def get_data(self, num: Literal[-1, 1, 2, 3]):
         if num == 1:
             return (self.bcrs_df, self.bprs_df, self.index_straddle_df)
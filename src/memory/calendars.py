@@ -3,11 +3,15 @@ import pandas as pd
 import numpy as np
 import json
 from contants.dates import EXPIRY
-from utils.api import get_all_token_set
 from utils.logger import logger
 from .atmiv import memory_atm_iv
+from .chain import memory_chain
+from utils.decode import normalize
 from datetime import datetime
+from utils import clock
 from utils.common import CONFIG
+from utils.kernels import nearest_delta
+from utils.offload import cpu_pool, symbol_codes
 
 
 CAL_CALL_UPPER_DELTA = CONFIG["CAL_CALL_UPPER_DELTA"]
@@ -28,9 +32,17 @@ CAL_HIGH_IVP_LIMIT = CONFIG["CAL_HIGH_IVP_LIMIT"]
 # json.dump(CONFIG, CONFIG_FILE, indent=2)
 # CONFIG_FILE.close()
 
-date_today = datetime.now().date()
+date_today = clock.now().date()
+
+memory_chain.register(
+    "calendars",
+    delta={"pe": ["-0.6", "-0.05"], "ce": ["0.05", "0.6"]},
+    expiry=[EXPIRY[0], EXPIRY[1], EXPIRY[2]],
+)
 
 class CALENDARS:
+    inputs = ("atm_iv",)
+
     def __init__(self):
         self.get_token_data_pe_dump: pd.DataFrame = pd.DataFrame()
         self.get_token_data_ce_dump: pd.DataFrame = pd.DataFrame()
@@ -64,17 +76,28 @@ class CALENDARS:
         # Update the benchmark and timestamp in the merged DataFrame
         self.update()
 
-    def find_closest_delta(self, row, net_df_current):
-
-        filtered_df = net_df_current[net_df_current['symbol'] == row['symbol']]
-        if filtered_df.empty:
-            return 0, "NA", 0, 0
-        
-        filtered_df['delta_diff'] = abs(filtered_df['params.delta'] - row['params.delta'])
-        idx_min_delta = filtered_df['delta_diff'].idxmin()
-        closest_row = filtered_df.loc[idx_min_delta]
-    
-        return closest_row['strike_price'], closest_row["pk.asset_type"], closest_row['params.delta'], closest_row['params.last_iv']
+    def find_closest_delta(self, df, net_df_current):
+        """Strike, type, delta and iv of the current expiry option closest in delta to each row of df."""
+        query_symbol, candidate_symbol = symbol_codes(df["symbol"], net_df_current["symbol"])
+        index = cpu_pool.run(nearest_delta, {
+            "query_symbol": query_symbol,
+            "query_delta": df["params.delta"].to_numpy(dtype=float),
+            "candidate_symbol": candidate_symbol,
+            "candidate_delta": net_df_current["params.delta"].to_numpy(dtype=float),
+        })["index"]
+        found = index >= 0
+
+        def pick(column, missing):
+            values = np.full(len(df), missing, dtype=object)
+            values[found] = net_df_current[column].to_numpy()[index[found]]
+            return values
+
+        return pd.DataFrame({
+            "strike_price_current": pick("strike_price", 0),
+            "current_opt_type": pick("pk.asset_type", "NA"),
+            "closest_delta": pick("params.delta", 0),
+            "closest_iv": pick("params.last_iv", 0),
+        }, index=df.index)
     
     def calendar_init_cleaner(self, call_df, put_df, last_trade_time, expiry_current, expiry_next):
 
@@ -97,18 +120,13 @@ class CALENDARS:
 
         df_init_processed = net_df[net_df["params.ltt"]>=last_trade_time]
 
-        df_init_processed["sort_time"] = pd.Timestamp.now()
+        df_init_processed["sort_time"] = pd.Timestamp(clock.now())
         df_init_processed = df_init_processed[["symbol", "strike_price", "pk.asset_type", "params.ltt", "params.delta", "params.last_iv", "sort_time"]]
 
         df_init_processed["params.delta"] = round(df_init_processed["params.delta"],2)
 
-        # print(df_init_processed)
-        # print(df_init_processed.apply(
-        #     lambda row: pd.Series(self.find_closest_delta(row, net_df_current)), axis=1
-        # ))
-        
-        df_init_processed[['strike_price_current', 'current_opt_type', 'closest_delta', 'closest_iv']] = df_init_processed.apply(
-            lambda row: pd.Series(self.find_closest_delta(row, net_df_current)), axis=1
+        df_init_processed[['strike_price_current', 'current_opt_type', 'closest_delta', 'closest_iv']] = self.find_closest_delta(
+            df_init_processed, net_df_current
         )
 
         return df_init_processed
@@ -152,11 +170,11 @@ class CALENDARS:
     def _process_calendar(self):
 
         merged_cal_df = pd.DataFrame()
-        data = get_all_token_set(delta={"pe": ["-0.6","-0.05"], "ce": ["0.05","0.6"]}, expiry=[EXPIRY[0], EXPIRY[1], EXPIRY[2]]).copy()
+        data = memory_chain.view("calendars")
 
-        self.get_token_pe_dump = pd.json_normalize(data, record_path=['markers', 'pe_data'], meta=[['symbol'], ['markers', 'expiry']])
+        self.get_token_pe_dump = normalize(data, ['markers', 'pe_data'], [['symbol'], ['markers', 'expiry']])
         pe_df = self.get_token_pe_dump[(self.get_token_pe_dump["params.delta"]<=CAL_PUT_UPPER_DELTA)&(self.get_token_pe_dump["params.delta"]>=CAL_PUT_LOWER_DELTA)]
-        self.get_token_ce_dump = pd.json_normalize(data, record_path=['markers', 'ce_data'], meta=[['symbol'], ['markers', 'expiry']])
+        self.get_token_ce_dump = normalize(data, ['markers', 'ce_data'], [['symbol'], ['markers', 'expiry']])
         ce_df = self.get_token_ce_dump[(self.get_token_ce_dump["params.delta"]<=CAL_CALL_UPPER_DELTA)&(self.get_token_ce_dump["params.delta"]>=CAL_CALL_LOWER_DELTA)]
         # ce_df = ce_df[ce_df["params.liquidity"]<=0.05]     
 
@@ -206,6 +224,15 @@ class CALENDARS:
         if processed_cal_df_high_ivp_2_neg is not None:
             self.calendars_2_high_ivp_neg = processed_cal_df_high_ivp_2_neg
 
+        # symbols flagged by the ivp buckets stay in the hot polling tier
+        flagged = [
+            processed_cal_df_low_ivp_pos, processed_cal_df_low_ivp_neg,
+            processed_cal_df_high_ivp_pos, processed_cal_df_high_ivp_neg,
+            processed_cal_df_low_ivp_2_pos, processed_cal_df_low_ivp_2_neg,
+            processed_cal_df_high_ivp_2_pos, processed_cal_df_high_ivp_2_neg,
+        ]
+        memory_chain.pin("calendars", {s for df in flagged if df is not None for s in df["symbol"]})
+
     def get_data(self, num: Literal[-1, 1, 2, 3]):
         if num == 1:
             return (self.calendars_1, self.calendars_1_low_ivp, self.calendars_1_high_ivp)
@@ -0,0 +1,368 @@
+import asyncio
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+from config.manager import settings
+from memory.atmiv import memory_atm_iv
+from utils.api import fetch_token_set, get_all_token_set, reset_watermark, NOT_MODIFIED
+from utils.logger import logger
+
+INDEX_SYMBOLS = {"NIFTY", "BANKNIFTY"}
+
+# shard requests share the keep-alive pool of the http client
+_shard_pool = ThreadPoolExecutor(max_workers=settings.CHAIN_SHARD_CONCURRENCY, thread_name_prefix="chain-shard")
+
+
+class ChainRequest:
+    def __init__(
+        self,
+        delta: Optional[Dict[str, List[str]]] = None,
+        expiry: Optional[List[str]] = None,
+        symbols: Optional[List[str]] = None,
+    ):
+        self.delta = delta
+        self.expiry = expiry
+        self.symbols = symbols
+
+
+class SymbolTiers:
+    """
+    Ranks the universe by recent activity to decide which symbols are polled
+    every tick (hot) and which only once every `cold_every` ticks (cold).
+
+    Activity is a decayed sum of absolute ltp returns seen in memory_atm_iv.
+    Symbols in the latest move_tracker rows, index symbols and symbols pinned
+    by screeners (the ones currently on screen) are always hot.
+    """
+
+    def __init__(self, hot_size: int, cold_every: int, decay: float):
+        self.hot_size = hot_size
+        self.cold_every = max(1, cold_every)
+        self.decay = decay
+        self.activity: Dict[str, float] = {}
+        self.last_ltp: Dict[str, float] = {}
+        self.pins: Dict[str, Set[str]] = {}
+        self.current: Set[str] = set()
+
+    def pin(self, name: str, symbols: Set[str]) -> None:
+        self.pins[name] = set(symbols)
+
+    def _observe(self) -> None:
+        atm = memory_atm_iv.expiry(1)
+        if "ltp" not in atm.columns:
+            return
+        for symbol, ltp in zip(atm["symbol"], atm["ltp"]):
+            previous = self.last_ltp.get(symbol)
+            move = abs(ltp / previous - 1) if previous else 0.0
+            self.activity[symbol] = self.activity.get(symbol, 0.0) * self.decay + move
+            self.last_ltp[symbol] = ltp
+
+    def _movers(self) -> Set[str]:
+        tracker = memory_atm_iv.move_tracker_func()
+        if tracker is None or "symbol" not in tracker.columns:
+            return set()
+        # newest rows are prepended
+        return set(tracker["symbol"].head(self.hot_size))
+
+    def hot(self, universe: List[str]) -> List[str]:
+        self._observe()
+        members = set(universe)
+        always = (INDEX_SYMBOLS | self._movers()).union(*self.pins.values()) & members
+        ranked = sorted(
+            (s for s in universe if s not in always),
+            key=lambda s: self.activity.get(s, 0.0),
+            reverse=True,
+        )
+        room = max(0, self.hot_size - len(always))
+        # hysteresis: a hot symbol only drops out once it leaves the top 2x
+        keep = [s for s in ranked[: room * 2] if s in self.current][:room]
+        fill = [s for s in ranked if s not in keep][: room - len(keep)]
+        self.current = always | set(keep) | set(fill)
+        return sorted(self.current)
+
+    def bucket(self, symbol: str) -> int:
+        # stable across runs, so each cold bucket keeps its own watermark
+        return zlib.crc32(symbol.encode()) % self.cold_every
+
+    def cold(self, universe: List[str], tick: int) -> List[str]:
+        due = tick % self.cold_every
+        return [s for s in universe if self.bucket(s) == due]
+
+
+class OptionChain:
+    """
+    Tick scoped option chain fetcher. Screeners register the slice of the
+    token-set they need, the union of all registrations is fetched once per
+    tick and each screener reads a filtered view of it.
+
+    With CHAIN_TIERING the first fetch is the full union; after that each
+    tick only asks for the hot symbols and one cold bucket (see
+    SymbolTiers) and merges the answers into the chain, so a cold symbol is
+    at most CHAIN_COLD_EVERY ticks old.
+    """
+
+    def __init__(self):
+        self.tiers = SymbolTiers(settings.CHAIN_HOT_SIZE, settings.CHAIN_COLD_EVERY, settings.CHAIN_ACTIVITY_DECAY)
+        self.hot_symbols: List[str] = []
+        self.requests: Dict[str, ChainRequest] = {}
+        self.data: Optional[List[Dict[str, Any]]] = None
+        self.by_symbol: Dict[str, Dict[str, Any]] = {}
+        self.query: Optional[tuple] = None
+        self.tick: int = 0
+        self.fetched_tick: int = -1
+        self.lock = threading.Lock()
+        # watermark keys handed out per stream and the shard count they were made for
+        self.stream_keys: Dict[str, Set[str]] = {}
+        self.shard_layout: Dict[str, int] = {}
+
+    def register(
+        self,
+        name: str,
+        delta: Optional[Dict[str, List[str]]] = None,
+        expiry: Optional[List[str]] = None,
+        symbols: Optional[List[str]] = None,
+    ) -> None:
+        with self.lock:
+            self.requests[name] = ChainRequest(delta=delta, expiry=expiry, symbols=symbols)
+
+    def begin_tick(self) -> None:
+        self.tick += 1
+
+    def pin(self, name: str, symbols) -> None:
+        """Keep `symbols` in the hot tier while screener `name` shows them."""
+        self.tiers.pin(name, set(symbols))
+
+    def _union_delta(self) -> Optional[Dict[str, List[str]]]:
+        ranges = [r.delta for r in self.requests.values()]
+        if not ranges or any(r is None for r in ranges):
+            return None
+        union = {}
+        for side in ("pe", "ce"):
+            lows = [float(r[side][0]) for r in ranges if side in r]
+            highs = [float(r[side][1]) for r in ranges if side in r]
+            if lows:
+                union[side] = [str(min(lows)), str(max(highs))]
+        return union
+
+    @staticmethod
+    def _union_list(values: List[Optional[List[str]]]) -> Optional[List[str]]:
+        if not values or any(v is None for v in values):
+            return None
+        merged: List[str] = []
+        for v in values:
+            merged.extend(x for x in v if x not in merged)
+        return merged
+
+    def _plan(self) -> List[Tuple[str, Dict[str, Any], bool]]:
+        """Watermark key, get_all_token_set arguments and by-expiry flag of every request this tick."""
+        delta = self._union_delta()
+        expiry = self._union_list([r.expiry for r in self.requests.values()])
+        symbols = self._union_list([r.symbols for r in self.requests.values()])
+        query = (repr(delta), repr(expiry), repr(symbols))
+        if query != self.query:
+            # a different union is a different upstream stream, start over
+            self.by_symbol = {}
+            self.data = None
+            self.query = query
+            self.hot_symbols = []
+            self._reset_watermarks()
+
+        universe = symbols if symbols is not None else self._known_universe()
+        if not settings.CHAIN_TIERING or self.data is None:
+            return self._plan_stream("all", universe, delta, expiry)
+
+        # the hot stream keeps its since-watermark when membership changes: a
+        # newly promoted symbol may miss a move made before its promotion,
+        # but every symbol stays in its cold bucket and catches up there
+        self.hot_symbols = self.tiers.hot(universe)
+        plan = self._plan_stream("hot", self.hot_symbols, delta, expiry)
+
+        due = self.tick % self.tiers.cold_every
+        cold = self.tiers.cold(universe, self.tick)
+        if cold:
+            plan += self._plan_stream(f"cold:{due}", cold, delta, expiry)
+        return plan
+
+    def _known_universe(self) -> Optional[List[str]]:
+        if self.by_symbol:
+            return list(self.by_symbol)
+        atm = memory_atm_iv.expiry(1)
+        if "symbol" in atm.columns and not atm.empty:
+            return list(atm["symbol"])
+        # nothing to shard on yet, the bootstrap goes out as one request
+        return None
+
+    @staticmethod
+    def _shards(symbols: List[str], expiry: Optional[List[str]]) -> List[Tuple[str, List[str], Optional[List[str]]]]:
+        count = max(1, -(-len(symbols) // settings.CHAIN_SHARD_SIZE))
+        # crc32 keeps a symbol in the same shard (and watermark) across ticks
+        groups: List[List[str]] = [[] for _ in range(count)]
+        for symbol in symbols:
+            groups[zlib.crc32(symbol.encode()) % count].append(symbol)
+        if settings.CHAIN_SHARD_BY_EXPIRY and expiry:
+            return [(f"{i}:{e}", group, [e]) for i, group in enumerate(groups) if group for e in expiry]
+        return [(str(i), group, expiry) for i, group in enumerate(groups) if group]
+
+    def _plan_stream(
+        self, stream: str, symbols: Optional[List[str]], delta, expiry: Optional[List[str]]
+    ) -> List[Tuple[str, Dict[str, Any], bool]]:
+        """
+        Split `symbols` into shards of at most CHAIN_SHARD_SIZE symbols (and
+        one expiry each with CHAIN_SHARD_BY_EXPIRY). Every shard has its own
+        watermark and retries on its own, a failed shard only leaves its
+        symbols at their previous values.
+        """
+        if symbols is None:
+            return [(stream, {"delta": delta, "expiry": expiry, "watermark_key": stream}, False)]
+
+        shards = self._shards(symbols, expiry)
+        if self.shard_layout.get(stream) != len(shards):
+            # symbols moved between shards, their watermarks no longer apply
+            for key in self.stream_keys.pop(stream, set()):
+                reset_watermark(key)
+            self.shard_layout[stream] = len(shards)
+
+        by_expiry = settings.CHAIN_SHARD_BY_EXPIRY and bool(expiry)
+        plan = []
+        for shard, group, shard_expiry in shards:
+            key = f"{stream}:{shard}"
+            self.stream_keys.setdefault(stream, set()).add(f"TOKEN_SET:{key}")
+            plan.append((key, {"delta": delta, "expiry": shard_expiry, "symbols": group, "watermark_key": key}, by_expiry))
+        return plan
+
+    def _fetch(self) -> None:
+        plan = self._plan()
+        if len(plan) == 1:
+            answers = [get_all_token_set(**plan[0][1])]
+        else:
+            futures = [_shard_pool.submit(get_all_token_set, **filters) for _, filters, _ in plan]
+            answers = [future.result() for future in futures]
+        self._merge_answers(plan, answers)
+
+    async def prefetch(self) -> None:
+        """
+        Fetch this tick's chain ahead of the screeners reading it (async
+        tick), every shard of every stream concurrently.
+        """
+        if self.fetched_tick == self.tick:
+            return
+        # the lock is held by stage pool threads too, take it off the loop
+        loop = asyncio.get_running_loop()
+        plan = await loop.run_in_executor(None, self._locked_plan)
+        slots = asyncio.Semaphore(settings.CHAIN_SHARD_CONCURRENCY)
+
+        async def fetch(filters: Dict[str, Any]) -> Any:
+            async with slots:
+                return await fetch_token_set(**filters)
+
+        answers = await asyncio.gather(*(fetch(filters) for _, filters, _ in plan))
+        await loop.run_in_executor(None, self._locked_merge, plan, answers)
+
+    def _locked_plan(self) -> List[Tuple[str, Dict[str, Any], bool]]:
+        with self.lock:
+            return self._plan()
+
+    def _locked_merge(self, plan: List[Tuple[str, Dict[str, Any], bool]], answers: List[Any]) -> None:
+        with self.lock:
+            self._merge_answers(plan, answers)
+            self.fetched_tick = self.tick
+
+    def _merge_answers(self, plan: List[Tuple[str, Dict[str, Any], bool]], answers: List[Any]) -> None:
+        for (key, _, by_expiry), data in zip(plan, answers):
+            if data is None and len(plan) > 1:
+                logger.warning(f"Option chain shard {key} failed, keeping its previous data")
+                continue
+            self._merge(data, by_expiry=by_expiry)
+
+    def _reset_watermarks(self) -> None:
+        for keys in self.stream_keys.values():
+            for key in keys:
+                reset_watermark(key)
+        self.stream_keys = {}
+        self.shard_layout = {}
+        reset_watermark("TOKEN_SET:all")
+
+    def _merge(self, data: Any, by_expiry: bool = False) -> None:
+        if data is None:
+            logger.warning("Error fetching option chain")
+            return
+        if data is NOT_MODIFIED:
+            return
+        # upstream may send only the symbols that changed, merge them in
+        for entry in data:
+            symbol = entry.get("symbol")
+            previous = self.by_symbol.get(symbol)
+            if by_expiry and previous is not None:
+                # this shard only carries some expiries, keep the others
+                entry = {**entry, "markers": self._merge_markers(previous.get("markers"), entry.get("markers"))}
+            self.by_symbol[symbol] = entry
+        self.data = list(self.by_symbol.values())
+
+    @staticmethod
+    def _merge_markers(old: Any, new: Any) -> List[Dict[str, Any]]:
+        old = [old] if isinstance(old, dict) else list(old or [])
+        new = [new] if isinstance(new, dict) else list(new or [])
+        fresh = {m.get("expiry") for m in new}
+        return [m for m in old if m.get("expiry") not in fresh] + new
+
+    def _ensure_fetched(self) -> None:
+        if self.fetched_tick == self.tick:
+            return
+        with self.lock:
+            if self.fetched_tick != self.tick:
+                self._fetch()
+                self.fetched_tick = self.tick
+
+    @staticmethod
+    def _in_range(item: Dict[str, Any], bounds: Optional[List[str]]) -> bool:
+        if bounds is None:
+            return True
+        delta = (item.get("params") or {}).get("delta")
+        if delta is None:
+            return False
+        return float(bounds[0]) <= delta <= float(bounds[1])
+
+    def _filter(self, req: ChainRequest) -> List[Dict[str, Any]]:
+        symbols = set(req.symbols) if req.symbols is not None else None
+        expiries = set(req.expiry) if req.expiry is not None else None
+        pe_bounds = req.delta.get("pe") if req.delta is not None else None
+        ce_bounds = req.delta.get("ce") if req.delta is not None else None
+
+        def filter_marker(marker):
+            marker = dict(marker)
+            if "pe_data" in marker:
+                marker["pe_data"] = [i for i in marker["pe_data"] if self._in_range(i, pe_bounds)]
+            if "ce_data" in marker:
+                marker["ce_data"] = [i for i in marker["ce_data"] if self._in_range(i, ce_bounds)]
+            return marker
+
+        view = []
+        for entry in self.data:
+            if symbols is not None and entry.get("symbol") not in symbols:
+                continue
+            markers = entry.get("markers", [])
+            if isinstance(markers, dict):
+                if expiries is not None and markers.get("expiry") not in expiries:
+                    continue
+                markers = filter_marker(markers)
+            else:
+                markers = [
+                    filter_marker(m) for m in markers
+                    if expiries is None or m.get("expiry") in expiries
+                ]
+            view.append({**entry, "markers": markers})
+        return view
+
+    def view(self, name: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Filtered view of this tick's chain for a registered screener. The
+        first caller in a tick triggers the shared fetch.
+        """
+        self._ensure_fetched()
+        if self.data is None:
+            return None
+        return self._filter(self.requests[name])
+
+
+memory_chain = OptionChain()
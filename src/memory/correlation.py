@@ -8,6 +8,8 @@ import warnings
 warnings.filterwarnings("ignore")
 
 class Correlation:
+    inputs = ("atm_iv",)
+
     def __init__(self):
         self.expiry_1: pd.DataFrame = pd.DataFrame()
         self.expiry_1_with_atm: pd.DataFrame = pd.DataFrame()
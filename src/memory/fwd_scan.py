@@ -9,6 +9,8 @@ from utils.common import asset2df
 warnings.filterwarnings("ignore")
 
 class FWD_IV:
+    inputs = ("atm_iv",)
+
     def __init__(self):
         self.expiry_1_abv_fwd: pd.DataFrame = pd.DataFrame()
         self.expiry_1_blw_fwd: pd.DataFrame = pd.DataFrame()
@@ -7,12 +7,17 @@ from utils.api import get_all_token_set
 from utils.logger import logger
 from .atmiv import memory_atm_iv
 import warnings
-from utils.common import asset2df, ASSET_DIR
+from utils import clock
+from utils.common import asset2df, ASSET_DIR, CONFIG
 warnings.filterwarnings("ignore")
 
-date_today = datetime.now().date()
+date_today = clock.now().date()
+
+INTRA_LS_SWITCH_TIME = CONFIG["INTRA_LS_SWITCH_TIME"]
 
 class INTRA_L_S:
+    inputs = ("atm_iv",)
+
     def __init__(self):
         self.expiry_1_long: pd.DataFrame = pd.DataFrame()
         self.expiry_1_short: pd.DataFrame = pd.DataFrame()
@@ -59,7 +64,7 @@ class INTRA_L_S:
                              &(exp_df1_long_short["atm_iv"]>exp_df1_long_short["fwd_iv"]))
         
         short_condition_2_1 = ((exp_df1_long_short["ivp"]>=60)&(exp_df1_long_short["ivp"]<=90))
-        if str(datetime.now().time()) < "10:30:00":
+        if str(clock.now().time()) < INTRA_LS_SWITCH_TIME:
             short_condition_2_2 = (exp_df1_long_short["atm_iv"]>exp_df1_long_short["fwd_iv"])
         else:
             short_condition_2_2 = (exp_df1_long_short["atm_iv"]>(exp_df1_long_short["fwd_iv"]+exp_df1_long_short["bench_mark_iv"])/2)
@@ -67,7 +72,7 @@ class INTRA_L_S:
         short_condition_3 = (exp_df1_long_short["ivp"]>90
                              &(exp_df1_long_short["atm_iv"]>exp_df1_long_short["bench_mark_iv"]))
         
-        if str(datetime.now().time()) < "10:30:00":
+        if str(clock.now().time()) < INTRA_LS_SWITCH_TIME:
             long_condition_0_1 = (exp_df1_long_short["days_theta"]>=0)
         else:
             long_condition_0_1 = (exp_df1_long_short["days_theta"]>=0.5)
@@ -79,7 +84,7 @@ class INTRA_L_S:
                              &(exp_df1_long_short["atm_iv"]<exp_df1_long_short["fwd_iv"]))
         
         long_condition_2_1 = ((exp_df1_long_short["ivp"]>=60)&(exp_df1_long_short["ivp"]<=90))
-        if str(datetime.now().time()) < "10:30:00":
+        if str(clock.now().time()) < INTRA_LS_SWITCH_TIME:
             long_condition_2_2 = (exp_df1_long_short["atm_iv"]<exp_df1_long_short["fwd_iv"])
         else:
             long_condition_2_2 = (exp_df1_long_short["atm_iv"]<(exp_df1_long_short["fwd_iv"]+exp_df1_long_short["bench_mark_iv"])/2)
@@ -7,12 +7,15 @@ import pandas as pd
 from typing import Literal, Optional
 
 from contants.dates import EXPIRY  # kept for compatibility if you reference it elsewhere
-from utils.api import get_all_token_set
 from utils.logger import logger
 from utils.common import asset2df, convert_filter_token_set, ASSET_DIR
+from .chain import memory_chain
 
 warnings.filterwarnings("ignore")
 
+SURFACE_DELTA_FILTER = {"pe": ["-0.5", "-0.2"], "ce": ["0.2", "0.5"]}
+memory_chain.register("surface_iv", delta=SURFACE_DELTA_FILTER)
+
 
 EXCLUDE_SYMBOLS = {
     'NIFTY', 'BANKNIFTY', 'AXISBANK', 'RELIANCE', 'LT', 'ICICIBANK',
@@ -33,6 +36,8 @@ def _safe_to_numeric(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
 
 
 class Surface_IV:
+    inputs = ()
+
     def __init__(self):
         # live outputs
         self.intraday_short: pd.DataFrame = pd.DataFrame()
@@ -79,6 +84,12 @@ class Surface_IV:
             self.expiry_list = []
             self.target_expiry = None
 
+        memory_chain.register(
+            "surface_iv",
+            delta=SURFACE_DELTA_FILTER,
+            expiry=self.expiry_list or None,
+        )
+
         logger.info(f"[Surface_IV] initialized. expiry_list={self.expiry_list} target_expiry={self.target_expiry}")
 
     def _process_surface_iv(self):
@@ -86,13 +97,8 @@ class Surface_IV:
         self.intraday_ref = asset2df("intraday_iv_surface.csv")
         self.eod_iv_ref = asset2df("eod_iv_surface.csv")
 
-        # Build filter for token-set fetch
-        delta_filter = {"pe": ["-0.5", "-0.2"], "ce": ["0.2", "0.5"]}
-        kwargs = {"delta": delta_filter}
-        if self.expiry_list:
-            kwargs["expiry"] = self.expiry_list
-
-        filtered_data = get_all_token_set(**kwargs)
+        # shared per-tick token-set, filtered to this screener's delta/expiry window
+        filtered_data = memory_chain.view("surface_iv")
         current_df = convert_filter_token_set(filtered_data)
 
         return self.compare_current_with_reference(
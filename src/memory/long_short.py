@@ -6,6 +6,7 @@ from utils.logger import logger
 from .atmiv import memory_atm_iv
 import warnings
 import json
+from utils import clock
 from utils.common import asset2df, CONFIG
 from datetime import datetime, timedelta
 warnings.filterwarnings("ignore")
@@ -13,6 +14,8 @@ warnings.filterwarnings("ignore")
 NO_OF_DAYS_TO_RESULT = CONFIG["NO_OF_DAYS_TO_RESULT"]
 
 class LS_IV:
+    inputs = ("atm_iv",)
+
     def __init__(self):
         self.expiry_1_short: pd.DataFrame = pd.DataFrame()
         self.expiry_1_long: pd.DataFrame = pd.DataFrame()
@@ -30,7 +33,7 @@ class LS_IV:
 
     def initialize(self):
         self.expiry_1 = asset2df("avg_risk_prem.csv")
-        today = datetime.today().date()
+        today = clock.now().date()
         future_date = today + timedelta(days=NO_OF_DAYS_TO_RESULT)
         future_date = str(future_date)
         today = str(today)
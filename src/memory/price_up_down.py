@@ -7,6 +7,8 @@ from .atmiv import memory_atm_iv
 from utils.api import get_all_token_set
 
 class PRICE_CHNG:
+    inputs = ("atm_iv",)
+
     def __init__(self):
         self.expiry_1_abv_price: pd.DataFrame = pd.DataFrame()
         self.expiry_1_blw_price: pd.DataFrame = pd.DataFrame()
@@ -1,23 +1,38 @@
 from typing import Any, Literal, Optional
 import pandas as pd
 from contants.dates import EXPIRY
-from utils.api import get_skew_from_api
+from utils.api import get_skew_from_api, NOT_MODIFIED
 from memory.atmiv import memory_atm_iv
+from utils.decode import normalize
 
 
 class Skew:
+    inputs = ("atm_iv",)
+
     def __init__(self):
         self.df: pd.DataFrame = pd.DataFrame()
         self.dump: pd.DataFrame = pd.DataFrame()
         self.sorted_data: Any = []
         self.flattened_dict = {}
+        self.raw_by_symbol: dict = {}
+        # merged payload not yet processed successfully, recompute even on 304
+        self.dirty = False
 
     def update(self):
-        data = get_skew_from_api().copy()
+        data = get_skew_from_api()
+        if data is NOT_MODIFIED and not self.dirty:
+            return
 
         if data is not None:
+            # upstream may only send the symbols that changed since last poll
+            if data is not NOT_MODIFIED:
+                for entry in data:
+                    self.raw_by_symbol[entry["symbol"]] = entry
+                self.dirty = True
+            data = list(self.raw_by_symbol.values())
+
             # Normalize data into DataFrame
-            df = pd.json_normalize(data, "individual", ["symbol"])
+            df = normalize(data, ["individual"], [["symbol"]])
 
             # Filter out rows with empty expiry
             df = df.dropna(subset=["expiry"])
@@ -40,20 +55,19 @@ class Skew:
                 for expiry in df["expiry"].unique()
             }
 
-            exp_df1_pct_change = memory_atm_iv.expiry(1).copy()
+            exp_df1_pct_change = memory_atm_iv.expiry(1)
+            if "pct_change" not in exp_df1_pct_change.columns:
+                # atm iv has not produced data yet
+                exp_df1_pct_change = pd.DataFrame(columns=["symbol", "pct_change"])
             # exp_df1_pct_change["pct_change"] = (-1)*exp_df1_pct_change["pct_change"]
             self.pct_change_df = exp_df1_pct_change[["symbol", "pct_change"]]
+            # looked up four times per row, a dict instead of a scan of the frame each time
+            first_pct_change = self.pct_change_df.drop_duplicates("symbol")
+            pct_change_by_symbol = dict(zip(first_pct_change["symbol"], first_pct_change["pct_change"]))
             
             def add_pct_change(row, symbol, ubl_data):
                 """ Add pct_change to the symbol's data """
-            
-                pct_change = self.pct_change_df.loc[
-                    self.pct_change_df["symbol"] == symbol, "pct_change"
-                ]
-                if not pct_change.empty:
-                    ubl_data["pct_change"] = pct_change.iloc[0]
-                else:
-                    ubl_data["pct_change"] = 0
+                ubl_data["pct_change"] = pct_change_by_symbol.get(symbol, 0)
 
             def process_pe_pe(row):
                 z_score = row.get("pe_pe.z_score", 0)
@@ -223,6 +237,7 @@ class Skew:
             final_data = list(expiry_map.values())
 
             self.sorted_data = final_data
+            self.dirty = False
 
     def get_dump(self):
         return self.dump
@@ -233,6 +248,9 @@ class Skew:
     def get_flattened_dict(self, num: Literal[-1, 1, 2, 3]):
         if num == -1:
             return self.flattened_dict
+        elif EXPIRY[min(num, 3) - 1] not in self.flattened_dict:
+            # nothing processed for this expiry yet
+            return pd.DataFrame()
         elif num == 1:
             df = self.flattened_dict[EXPIRY[0]].copy()
             df_expanded = pd.concat([df[['expiry', 'type', 'symbol']], pd.json_normalize(df['sym_details'])], axis=1)
@@ -7,6 +7,8 @@ from utils.common import asset2df, ASSET_DIR
 
 
 class Skew_Benchmark:
+    inputs = ("skew",)
+
     def __init__(self):
         self.expiry_1: pd.DataFrame = pd.DataFrame()
         self.expiry_1_with_skew: pd.DataFrame = pd.DataFrame()
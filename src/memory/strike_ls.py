@@ -12,6 +12,8 @@ import pandas as pd
 
 
 class STRIKE_LS:
+    inputs = ()
+
     def __init__(self):
         self.display_df = pd.DataFrame()
 
@@ -1,6 +1,7 @@
 from typing import Literal, Optional
 import pandas as pd
 import json
+from utils import clock
 from utils.common import asset2df, CONFIG
 from datetime import datetime
 from .atmiv import memory_atm_iv
@@ -8,6 +9,8 @@ from .atmiv import memory_atm_iv
 VOL_TRACKER_PERC = CONFIG["VOL_TRACKER_PERC"]
 
 class Vol:
+    inputs = ("atm_iv",)
+
     def __init__(self):
         self.expiry_1: pd.DataFrame = pd.DataFrame()
         self.expiry_1_with_atm: pd.DataFrame = pd.DataFrame()
@@ -22,8 +25,8 @@ class Vol:
         df["forward_vol"] = df["forward_vol"].astype(float).round(1)
         df["vol_threshold_percentage"] = VOL_TRACKER_PERC/100
         df['vol_threshold_val'] = df["forward_vol"] * df["vol_threshold_percentage"]
-        df["vol_up_updated_at"] = str(datetime.now())
-        df["vol_down_updated_at"] = str(datetime.now())
+        df["vol_up_updated_at"] = str(clock.now())
+        df["vol_down_updated_at"] = str(clock.now())
         return df
 
     def initialize(self):
@@ -37,7 +40,7 @@ class Vol:
         self.expiry_2_down_display_df = pd.DataFrame(columns=self.expiry_2.columns)
 
     def _update_benchmark(self, df, number: pd.DataFrame):
-        current_time = datetime.now()
+        current_time = clock.now()
         step_1 = df.copy()
         # print(number, df[df["atm_iv"] == 0])
         # df = df[df['atm_iv'] != 0]
@@ -94,6 +97,32 @@ class Vol:
         
         return df, vol_up_df, vol_down_df
 
+    def update_ticker_benchmark(
+        self,
+        expiry: Literal[1, 2],
+        ticker: str,
+        vol_up_benchmark: Optional[float],
+        vol_down_benchmark: Optional[float],
+        vol_up_threshold_percentage: Optional[float],
+        vol_down_threshold_percentage: Optional[float],
+    ):
+        # one benchmark and threshold track both directions
+        benchmark = vol_up_benchmark if vol_up_benchmark is not None else vol_down_benchmark
+        percentage = vol_up_threshold_percentage if vol_up_threshold_percentage is not None else vol_down_threshold_percentage
+
+        for name in (f"expiry_{expiry}", f"expiry_{expiry}_with_atm"):
+            # copied, the published snapshot may hold the current frame
+            df = getattr(self, name).copy()
+            rows = df["symbol"] == ticker
+            if not rows.any():
+                raise ValueError(f"Ticker {ticker} not found in expiry {expiry}.")
+            if benchmark is not None:
+                df.loc[rows, "vol_benchmark"] = round(benchmark, 1)
+            if percentage is not None:
+                df.loc[rows, "vol_threshold_percentage"] = percentage / 100
+            df.loc[rows, "vol_threshold_val"] = df.loc[rows, "vol_benchmark"] * df.loc[rows, "vol_threshold_percentage"]
+            setattr(self, name, df)
+
     def update(self):
         temp_1 = memory_atm_iv.expiry(1)[['symbol', 'atm_iv', 'fwd_iv', 'pct_change']].copy()
         # temp_1["pct_change"] = (-1)*temp_1["pct_change"]
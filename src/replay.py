@@ -0,0 +1,80 @@
+"""
+Replay a recorded upstream journal through the tick pipeline.
+
+    PYTHONPATH=src python src/replay.py journals/upstream-20240610-091500.jsonl.gz --speed 10
+
+Responses are served from the journal instead of the network and the memory
+layer sees the recorded clock, so a session can be profiled or compared
+outside market hours. --speed 1 keeps the recorded pacing, N plays N times
+faster and 0 runs the ticks back to back.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from utils import clock
+from utils.journal import read_session, read_ticks, player
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("journal")
+    parser.add_argument("--speed", type=float, default=0, help="1 = real time, N = N times faster, 0 = as fast as possible")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many ticks")
+    args = parser.parse_args()
+
+    ticks = read_ticks(args.journal)
+    first = next(ticks, None)
+    if first is None:
+        print("Journal has no ticks")
+        return
+
+    # expiries and the date are read at import time, pin both before importing
+    expiries = read_session(args.journal).get("expiries")
+    if expiries:
+        os.environ["EXPIRY_DATES"] = ";".join(expiries)
+    replay_clock = clock.ManualClock(first.clock)
+    clock.set_source(replay_clock)
+
+    from config.events import execute_backend_server_event_handler
+    from router.events import update_atm_iv_data, runner
+    from utils.logger import logger
+
+    asyncio.run(execute_backend_server_event_handler(None)())
+
+    def play():
+        yield first
+        yield from ticks
+
+    count = failed = 0
+    started = time.monotonic()
+    for tick in play():
+        if args.limit is not None and count >= args.limit:
+            break
+        if args.speed:
+            # pace against the recorded timeline so slow ticks do not drift
+            delay = started + (tick.ts - first.ts) / args.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        replay_clock.set(tick.clock)
+        player.load(tick)
+        try:
+            update_atm_iv_data()
+        except Exception:
+            # the scheduler logs a failed job and carries on, so does replay
+            logger.exception(f"Tick at {tick.clock} failed")
+            failed += 1
+        # screeners past the tick deadline must not read the next tick's responses
+        runner.wait_idle()
+        for key, left in player.unused():
+            logger.warning(f"Tick at {tick.clock}: {left} recorded {key} response(s) not consumed")
+        count += 1
+
+    elapsed = time.monotonic() - started
+    print(f"Replayed {count} ticks ({failed} failed) in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.1f} ticks/s)")
+
+
+if __name__ == "__main__":
+    main()
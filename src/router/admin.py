@@ -2,12 +2,13 @@ from fastapi import APIRouter, HTTPException, status
 from fastapi.responses import JSONResponse
 import httpx
 from pydantic import BaseModel
-import requests
+from typing import Dict, Literal
 from config.manager import settings
-from config.events import scheduler
-from apscheduler.triggers.interval import IntervalTrigger
+from config.events import pacer, session
 
-from utils.api import login_inner
+from utils.api import login_inner, token_manager, upstream_status
+from router.events import demand, governor, responses, runner, snapshots, screener_ages, screener_cadences, update_screener_cadences
+from router.screener import broadcaster
 from utils.authentication import Credentials, check_creds, set_creds
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -17,6 +18,15 @@ class IntervalUpdateRequest(BaseModel):
     interval: int
 
 
+class CadenceUpdateRequest(BaseModel):
+    intervals: Dict[str, int]
+
+
+class DemandOverrideRequest(BaseModel):
+    screener: str
+    mode: Literal["on", "off", "auto"]
+
+
 @router.get(path="/updateInterval", name="admin:updateInterval")
 async def update_inteval(request: IntervalUpdateRequest):
     new_interval = request.interval
@@ -28,20 +38,70 @@ async def update_inteval(request: IntervalUpdateRequest):
     # Update the settings or configuration with the new interval
     settings.ATM_UPDATE_INTERVAL = new_interval
 
-    if scheduler.get_job("atm_iv_update"):
-        scheduler.reschedule_job(
-            "atm_iv_update", trigger=IntervalTrigger(seconds=new_interval / 1000)
-        )
+    # only takes effect on the tick while the market session is open
+    session.apply()
 
     return {"success": True, "interval": new_interval}
 
 
+@router.get("/cadences", name="admin:getCadences")
+def get_cadences():
+    return {
+        "success": True,
+        "msg": "Milliseconds between updates of each screener, 0 is every tick",
+        "data": screener_cadences(),
+    }
+
+
+@router.post("/cadences", name="admin:updateCadences")
+def update_cadences(request: CadenceUpdateRequest):
+    unknown = sorted(set(request.intervals) - set(screener_cadences()))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown screeners: {unknown}"
+        )
+    if any(interval < 0 for interval in request.intervals.values()):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Intervals cannot be negative."
+        )
+
+    return {
+        "success": True,
+        "msg": "Screener cadences updated",
+        "data": update_screener_cadences(request.intervals),
+    }
+
+
+@router.get("/demand", name="admin:getDemand")
+def get_demand():
+    return {
+        "success": True,
+        "msg": "Screener reads and which screeners are recomputed",
+        "data": demand.snapshot(),
+    }
+
+
+@router.post("/demand", name="admin:overrideDemand")
+def override_demand(request: DemandOverrideRequest):
+    if request.screener not in runner.stages:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown screener: {request.screener}"
+        )
+
+    demand.force(request.screener, {"on": True, "off": False, "auto": None}[request.mode])
+    return {
+        "success": True,
+        "msg": f"Screener {request.screener} set to {request.mode}",
+        "data": demand.snapshot()[request.screener],
+    }
+
+
 @router.post("/login", name="admin:userLogin")
 def user_login(payload: Credentials):
 
     try:
         login_inner(payload)
-    except (httpx.HTTPStatusError, requests.HTTPError) as exc:
+    except httpx.HTTPStatusError as exc:
         return JSONResponse(
             status_code=status.HTTP_401_UNAUTHORIZED,
             content={
@@ -52,6 +112,7 @@ def user_login(payload: Credentials):
         )
 
     set_creds(payload)
+    token_manager.invalidate()
 
     return {
         "success": True,
@@ -91,4 +152,30 @@ def get_expiries():
             detail={"success": False, "msg": str(e), "data": None},
         )
 
-    return {"success": True, "msg": "Expiries fetched successfully", "data": expiries}
\ No newline at end of file
+    return {"success": True, "msg": "Expiries fetched successfully", "data": expiries}
+
+@router.get("/health", name="admin:health")
+def health():
+    return {
+        "success": True,
+        "msg": "Upstream, screener freshness, published snapshot, response cache, streams, tick pacing, CPU budget and market session",
+        "data": {
+            "upstream": upstream_status(),
+            "screener_age": screener_ages(),
+            "snapshot": snapshots.report(),
+            "responses": responses.report(),
+            "streams": broadcaster.report(),
+            "ticks": pacer.snapshot(),
+            "budget": governor.snapshot(),
+            "session": session.snapshot(),
+        },
+    }
+
+
+@router.get("/stages", name="admin:stages")
+def stages():
+    return {
+        "success": True,
+        "msg": "Per screener stage timings over recent ticks",
+        "data": runner.report(),
+    }
@@ -1,11 +1,24 @@
+import asyncio
 import json
+import threading
 import numpy as np
 import pandas as pd
 from datetime import datetime
 from functools import lru_cache
 from utils.logger import log_execution_time
-from utils.common import asset2df
-from concurrent.futures import ThreadPoolExecutor
+from utils import clock
+from utils.api import fetch_atm_iv, fetch_skew, prefetch
+from utils.journal import recorder
+from utils.common import CONFIG, asset2df
+from utils.dag import CRITICAL, SUSPENDED, DagRunner, Stage
+from utils.demand import DemandTracker
+from utils.governor import TickGovernor
+from utils.snapshot import SnapshotStore
+from utils.response_cache import ResponseCache
+from utils.offload import cpu_pool
+from typing import Callable, Dict, Optional, Set
+from fastapi import Depends, Request
+from config.manager import settings
 from contants.color import get_color
 from memory.atmiv import memory_atm_iv
 from memory.vol import memory_vol
@@ -21,6 +34,7 @@ from memory.intra_long_short import memory_intra_long_short
 from memory.long_short import memory_ls_iv
 from memory.atr_scan import memory_atr
 from memory.iv_surface import memory_surface_scan_iv
+from memory.chain import memory_chain
 
 
 @lru_cache(maxsize=None)
@@ -113,26 +127,208 @@ def initialize_surface_iv():
     memory_surface_scan_iv.initialize()
 
 
+SCREENERS = {
+    "atm_iv": memory_atm_iv,
+    "vol": memory_vol,
+    "correlation": memory_correlation,
+    "skew": memory_skew,
+    "skew_benchmark": memory_skew_benchmark,
+    "fwd_scan": memory_fwd_scan_iv,
+    "price_change": memory_price_change,
+    "strike_ls": memory_strike_ls,
+    "calendars": memory_calendars,
+    "bcrs": memory_bcrs,
+    "intra_long_short": memory_intra_long_short,
+    "long_short": memory_ls_iv,
+    "atr": memory_atr,
+    "surface_iv": memory_surface_scan_iv,
+}
+
+# outputs served by the /screener endpoints, per screener and view
+SNAPSHOT_VIEWS = {
+    "atm_iv": {"expiries": lambda: memory_atm_iv.expiry(-1)},
+    "vol": {
+        "display": lambda: memory_vol.expiry_with_atm_display(-1),
+        "with_atm": lambda: memory_vol.expiry_with_atm(-1),
+    },
+    "correlation": {"with_atm": lambda: memory_correlation.expiry_with_atm(-1)},
+    "skew": {"sorted": memory_skew.get_data},
+    "skew_benchmark": {"with_skew": lambda: memory_skew_benchmark.expiry_with_skew(-1)},
+    "fwd_scan": {"expiries": lambda: memory_fwd_scan_iv.expiry(-1)},
+    "price_change": {"expiries": lambda: memory_price_change.expiry(-1)},
+    "strike_ls": {"expiry_1": lambda: memory_strike_ls.expiry(1)},
+    "calendars": {"all": lambda: memory_calendars.get_data(3)},
+    "bcrs": {"expiry_1": lambda: memory_bcrs.get_data(1)},
+    "intra_long_short": {"expiry_1": lambda: memory_intra_long_short.expiry(1)},
+    "long_short": {"expiries": lambda: memory_ls_iv.expiry(-1)},
+    "atr": {"expiries": lambda: memory_atr.expiry(-1)},
+    "surface_iv": {"expiries": lambda: memory_surface_scan_iv.expiry(-1)},
+}
+
+# each stage captures its outputs as it finishes, each tick publishes them at once
+snapshots = SnapshotStore(SNAPSHOT_VIEWS)
+
+# encoded endpoint bodies, rebuilt once per screener version
+responses = ResponseCache()
+
+# ticks can come from the interval job and the push subscriber, never overlap them
+tick_lock = threading.Lock()
+
+
+def _update_and_capture(name: str, memory):
+    def update():
+        memory.update()
+        snapshots.capture(name)
+
+    return update
+
+
+# every screener declares the screeners it reads as `inputs`, by the names
+# above; a stage only starts once its inputs finished this tick
+runner = DagRunner([
+    Stage(
+        name,
+        _update_and_capture(name, memory),
+        inputs=memory.inputs,
+        timeout=settings.STAGE_TIMEOUT,
+        interval=CONFIG.get("SCREENER_INTERVALS", {}).get(name, 0) / 1000,
+        priority=CONFIG.get("SCREENER_PRIORITIES", {}).get(name, CRITICAL),
+    )
+    for name, memory in SCREENERS.items()
+])
+
+# screeners nobody reads stop recomputing after SCREENER_IDLE_AFTER seconds
+demand = DemandTracker(settings.SCREENER_IDLE_AFTER, {name: memory.inputs for name, memory in SCREENERS.items()})
+
+# past TICK_CPU_BUDGET a tick defers its best effort screeners
+governor = TickGovernor(runner, settings.TICK_CPU_BUDGET / 1000, settings.TICK_MAX_DEFER)
+
+# upstream answers each stage reads, fetched concurrently ahead of an async tick
+FETCHES = {
+    "atm_iv": ("ATM_IV", fetch_atm_iv),
+    "skew": ("SKEW", fetch_skew),
+}
+
+
+def screener_ages() -> Dict[str, Optional[float]]:
+    """Seconds since each screener last refreshed, None if it never has."""
+    return {name: stage["age"] for name, stage in runner.report().items()}
+
+
+def screener_cadences() -> Dict[str, int]:
+    """Milliseconds between updates of each screener, 0 for every tick."""
+    return {name: int(stage.interval * 1000) for name, stage in runner.stages.items()}
+
+
+def update_screener_cadences(intervals: Dict[str, int]) -> Dict[str, int]:
+    for name, interval in intervals.items():
+        runner.stages[name].interval = interval / 1000
+
+    CONFIG["SCREENER_INTERVALS"] = screener_cadences()
+    CONFIG_FILE = open("scan_config.json", "w")
+    json.dump(CONFIG, CONFIG_FILE, indent=2)
+    CONFIG_FILE.close()
+
+    return CONFIG["SCREENER_INTERVALS"]
+
+
+@log_execution_time
+def update_atm_iv_data(everything: bool = False):
+    with tick_lock:
+        if everything:
+            _run_tick(None, governed=False)
+        else:
+            _run_tick(demand.active())
+
+
+def _run_tick(active: Optional[Set[str]], governed: bool = True):
+    _begin_tick()
+    runner.run(settings.TICK_DEADLINE, active, governor.plan(active) if governed else None)
+    # stages past the deadline are captured when they finish, and published next tick
+    snapshots.publish()
+
+
+def _begin_tick():
+    if recorder.enabled:
+        recorder.tick(clock.now())
+    memory_chain.begin_tick()
+
+
 @log_execution_time
-def update_atm_iv_data():
-    with ThreadPoolExecutor() as executor:
-        tasks = [
-            executor.submit(memory_atm_iv.update),
-            executor.submit(memory_vol.update),
-            executor.submit(memory_correlation.update),
-            executor.submit(memory_skew.update),
-            executor.submit(memory_skew_benchmark.update),
-            executor.submit(memory_fwd_scan_iv.update),
-            executor.submit(memory_price_change.update),
-            executor.submit(memory_strike_ls.update),
-            executor.submit(memory_calendars.update),
-            executor.submit(memory_bcrs.update),
-            executor.submit(memory_intra_long_short.update),
-            executor.submit(memory_ls_iv.update),
-            executor.submit(memory_atr.update),
-            executor.submit(memory_surface_scan_iv.update),
-
-        ]
-
-        for task in tasks:
-            task.result()
+async def update_atm_iv_data_async():
+    """
+    The scheduled tick on the event loop: every upstream fetch the due
+    stages need goes out at once on the async client, then the stages
+    compute on the stage pool from what was fetched.
+    """
+    loop = asyncio.get_running_loop()
+    # shared with the push subscriber and catch-up ticks, wait for it off the loop
+    held = loop.run_in_executor(None, tick_lock.acquire)
+    try:
+        await asyncio.shield(held)
+        active = demand.active()
+        defer = governor.plan(active)
+        _begin_tick()
+        runnable = runner.runnable(active, defer)
+        fetches = [prefetch(*FETCHES[name]) for name in runnable if name in FETCHES]
+        if runnable & set(memory_chain.requests):
+            fetches.append(memory_chain.prefetch())
+        await asyncio.gather(*fetches)
+        held = loop.run_in_executor(None, runner.run, settings.TICK_DEADLINE, active, defer)
+        await asyncio.shield(held)
+        snapshots.publish()
+    finally:
+        if held.done():
+            tick_lock.release()
+        else:
+            # cancelled while a thread acquires the lock or runs the stages,
+            # which goes on regardless: let go of the lock once it is done
+            held.add_done_callback(lambda _: tick_lock.release())
+
+
+def reads(name: str):
+    """
+    Dependency for endpoints serving screener `name`: records the read and
+    catches up a suspended screener before it is served. When the catch-up
+    cannot run in time the last snapshot is served with an X-Stale header.
+    """
+
+    def track(request: Request) -> None:
+        suspended = demand.touch(name)
+        if suspended and settings.LAZY_CATCHUP == "sync" and tick_lock.acquire(timeout=settings.LAZY_CATCHUP_WAIT):
+            try:
+                # an early tick, now that this screener is wanted again; the
+                # reader waits on it, so nothing is deferred
+                _run_tick(demand.active(), governed=False)
+            finally:
+                tick_lock.release()
+        # not recomputed since it was suspended, the next tick picks it up
+        if runner.stats[name].last_status == SUSPENDED:
+            request.state.stale = True
+
+    return Depends(track)
+
+
+def edit(name: str, change: Callable[[], None]) -> None:
+    """
+    Applies a user edit of screener `name` (benchmarks, settings), `change`
+    recomputing it, and publishes its outputs right away: its next tick may
+    be late or never come while the session is paused, the screener is
+    suspended or deferred. Under the tick lock, so it never races a tick.
+    """
+    with tick_lock:
+        change()
+        snapshots.capture(name)
+        snapshots.publish()
+
+
+def warm_up():
+    """Before the open: start the CPU workers and prime every screener with a tick."""
+    cpu_pool.warm()
+    update_atm_iv_data(everything=True)
+
+
+def end_of_day():
+    """After the close: one last tick on the closing data, then the daily files."""
+    update_atm_iv_data(everything=True)
+    memory_bcrs.save_ratio_spreads()
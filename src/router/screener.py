@@ -1,32 +1,84 @@
-import json
-from typing import Optional
+import asyncio
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import pandas as pd
 from pydantic import BaseModel
-from fastapi import APIRouter, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from config.manager import settings
 from contants.dates import EXPIRY
 from memory.metadata import metadata_map
-from memory.skew import memory_skew
-from memory.atmiv import memory_atm_iv
 from memory.vol import memory_vol
-from memory.correlation import memory_correlation
 from memory.skew_benchmark import memory_skew_benchmark
-from memory.fwd_scan import memory_fwd_scan_iv
-from memory.price_up_down import memory_price_change
-from memory.strike_ls import memory_strike_ls
 from memory.calendars import memory_calendars
-from memory.bcrs_scan import memory_bcrs
-from memory.intra_long_short import memory_intra_long_short
-from memory.long_short import memory_ls_iv
-from memory.iv_surface import memory_surface_scan_iv
-from memory.atr_scan import memory_atr
-import concurrent.futures
-import asyncio
+from router.events import demand, edit, reads, responses, snapshots
+from utils.snapshot import Snapshot
+from utils.response_cache import validators
+from utils.broadcast import Broadcaster, Feed, Subscriber
+from utils.paging import Page, PageError, apply, parse
+from utils.filters import compile_filter
 from datetime import datetime
 
 router = APIRouter(prefix="/screener", tags=["screener"])
 
 
+# endpoint payloads by path, shared by the GET endpoints and the stream
+FEEDS: Dict[str, Feed] = {}
+
+# diffs of the subscribed feeds, on every publish
+broadcaster = Broadcaster(FEEDS, snapshots, settings.STREAM_QUEUE_SIZE, demand.touch)
+snapshots.on_publish(broadcaster.publish)
+
+
+def _feed(path: str, screener: str, msg: str):
+    def register(build: Callable[[Snapshot], Any]):
+        FEEDS[path] = Feed(screener, msg, build)
+        return build
+
+    return register
+
+
+def _page(
+    limit: Optional[int] = Query(None, ge=0, description="Rows per table"),
+    offset: int = Query(0, ge=0, description="Rows to skip per table"),
+    fields: Optional[str] = Query(None, description="Comma separated columns to return"),
+    sort: Optional[str] = Query(None, description="Comma separated columns, -column for descending"),
+    where: Optional[str] = Query(None, alias="filter", description='Row filter, e.g. ivp > 60 and symbol in ["INFY", "TCS"]'),
+) -> Page:
+    return parse(limit, offset, fields, sort, where)
+
+
+async def _serve(request: Request, path: str, page: Page) -> Response:
+    """
+    The body of endpoint `path`, built from the current snapshot only when
+    its screener published a new version since it was last built, or a
+    304 when the client's copy is still current. Each distinct page is
+    built and cached on its own. A 503 while the screener has not been
+    captured yet.
+    """
+    feed = FEEDS[path]
+    snapshot = snapshots.current
+    output = snapshot.screeners.get(feed.screener)
+    if output is None:
+        # suspended or deferred since startup, or failed its first run
+        request.state.stale = True
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"{feed.msg} not available yet")
+    current = validators(output.fingerprint, output.updated)
+    not_modified = responses.revalidate(request.headers, current, output.updated)
+    if not_modified is not None:
+        return not_modified
+
+    def build():
+        data = feed.build(snapshot)
+        return {"success": True, "msg": feed.msg, "data": data if page.everything else apply(data, page)}
+
+    try:
+        body = await responses.get(path if page.everything else f"{path}?{page.key()}", output.version, build, current)
+    except PageError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+    return body.response(request.headers.get("accept-encoding", ""))
+
+
 @router.get(path="/metadata", name="screeners:metadata")
 async def get_metadata():
     metadata_values = metadata_map.get_metadata_values()
@@ -36,91 +88,49 @@ async def get_metadata():
     )
 
 
-@router.get(path="/atmiv", name="screeners:atmiv")
-async def get_atm_iv():
-    expiry_1, expiry_2, expiry_3 = memory_atm_iv.expiry(-1)
+@_feed("atmiv", "atm_iv", "ATM IV Data")
+def _atmiv(snapshot: Snapshot):
+    expiry_1, expiry_2, expiry_3 = snapshot.view("atm_iv", "expiries")
     combined_df = pd.concat([expiry_1, expiry_2, expiry_3])
-    grouped_df = combined_df.groupby("symbol").agg(list).reset_index()
-    data = json.loads(grouped_df.to_json(orient="records"))
-    return JSONResponse(
-        {"success": True, "msg": "ATM IV Data", "data": data},
-        status.HTTP_200_OK,
-    )
+    return combined_df.groupby("symbol").agg(list).reset_index()
+
+
+@router.get(path="/atmiv", name="screeners:atmiv", dependencies=[reads("atm_iv")])
+async def get_atm_iv(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "atmiv", page)
 
 
-@router.get(path="/vol", name="screeners:vol")
-async def get_vol():
-    expiry_1_up, expiry_1_down, expiry_2_up, expiry_2_down = memory_vol.expiry_with_atm_display(-1)
-    data = {
-        "expiry_1_up": json.loads(expiry_1_up.to_json(orient="records")),
-        "expiry_1_down": json.loads(expiry_1_down.to_json(orient="records")),
-        "expiry_2_up": json.loads(expiry_2_up.to_json(orient="records")),
-        "expiry_2_down": json.loads(expiry_2_down.to_json(orient="records")),
+@_feed("vol", "vol", "All Vol Data")
+def _vol(snapshot: Snapshot):
+    expiry_1_up, expiry_1_down, expiry_2_up, expiry_2_down = snapshot.view("vol", "display")
+    return {
+        "expiry_1_up": expiry_1_up,
+        "expiry_1_down": expiry_1_down,
+        "expiry_2_up": expiry_2_up,
+        "expiry_2_down": expiry_2_down,
     }
-    return JSONResponse(
-        {"success": True, "msg": "All Vol Data", "data": data},
-        status.HTTP_200_OK,
-    )
 
 
-@router.get(path="/filtered-vol", name="screeners:filtered-vol")
-async def get_filtered_vol():
-    expiry_1, expiry_2 = memory_vol.expiry_with_atm(-1)
-
-    # Use concurrent futures to parallelize filtering
-    loop = asyncio.get_event_loop()
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        tasks = [
-            loop.run_in_executor(
-                executor,
-                lambda: json.loads(
-                    expiry_1[
-                        expiry_1["atm_iv"] >= expiry_1["vol_up_benchmark"]
-                    ].to_json(orient="records")
-                ),
-            ),
-            loop.run_in_executor(
-                executor,
-                lambda: json.loads(
-                    expiry_1[
-                        expiry_1["atm_iv"] <= expiry_1["vol_down_benchmark"]
-                    ].to_json(orient="records")
-                ),
-            ),
-            loop.run_in_executor(
-                executor,
-                lambda: json.loads(
-                    expiry_2[
-                        expiry_2["atm_iv"] >= expiry_2["vol_up_benchmark"]
-                    ].to_json(orient="records")
-                ),
-            ),
-            loop.run_in_executor(
-                executor,
-                lambda: json.loads(
-                    expiry_2[
-                        expiry_2["atm_iv"] <= expiry_2["vol_down_benchmark"]
-                    ].to_json(orient="records")
-                ),
-            ),
-        ]
-        filter_exp1_up, filter_exp1_down, filter_exp2_up, filter_exp2_down = (
-            await asyncio.gather(*tasks)
-        )
+@router.get(path="/vol", name="screeners:vol", dependencies=[reads("vol")])
+async def get_vol(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "vol", page)
 
-    return JSONResponse(
-        {
-            "success": True,
-            "msg": "Filtered Vol Data",
-            "data": {
-                "expiry1_up": filter_exp1_up,
-                "expiry1_down": filter_exp1_down,
-                "expiry2_up": filter_exp2_up,
-                "expiry2_down": filter_exp2_down,
-            },
-        },
-        status.HTTP_200_OK,
-    )
+
+@_feed("filtered-vol", "vol", "Filtered Vol Data")
+def _filtered_vol(snapshot: Snapshot):
+    expiry_1, expiry_2 = snapshot.view("vol", "with_atm")
+    up, down = compile_filter("atm_iv >= vol_up_benchmark"), compile_filter("atm_iv <= vol_down_benchmark")
+    return {
+        "expiry1_up": expiry_1[up.mask(expiry_1)],
+        "expiry1_down": expiry_1[down.mask(expiry_1)],
+        "expiry2_up": expiry_2[up.mask(expiry_2)],
+        "expiry2_down": expiry_2[down.mask(expiry_2)],
+    }
+
+
+@router.get(path="/filtered-vol", name="screeners:filtered-vol", dependencies=[reads("vol")])
+async def get_filtered_vol(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "filtered-vol", page)
 
 
 class VolUpdateItem(BaseModel):
@@ -141,7 +151,8 @@ async def volUpdate(body: VolUpdateItem):
     else:
         expiry = 2
 
-    memory_vol.update_ticker_benchmark(
+    change = partial(
+        memory_vol.update_ticker_benchmark,
         expiry=expiry,
         ticker=body.ticker,
         vol_up_benchmark=body.benchmark,
@@ -149,6 +160,8 @@ async def volUpdate(body: VolUpdateItem):
         vol_up_threshold_percentage=body.change,
         vol_down_threshold_percentage=body.change,
     )
+    # served by the next GET, not the next tick
+    await asyncio.get_running_loop().run_in_executor(None, edit, "vol", change)
     return JSONResponse(
         {
             "success": True,
@@ -159,80 +172,51 @@ async def volUpdate(body: VolUpdateItem):
     )
 
 
-@router.get(path="/correlation", name="screeners:correlation")
-async def get_correlation():
-    expiry_1, expiry_2 = memory_correlation.expiry_with_atm(-1)
-    data = {
-        "expiry_1": json.loads(expiry_1.to_json(orient="records")),
-        "expiry_2": json.loads(expiry_2.to_json(orient="records")),
+@_feed("correlation", "correlation", "All Correlation Data")
+def _correlation(snapshot: Snapshot):
+    expiry_1, expiry_2 = snapshot.view("correlation", "with_atm")
+    return {"expiry_1": expiry_1, "expiry_2": expiry_2}
+
+
+@router.get(path="/correlation", name="screeners:correlation", dependencies=[reads("correlation")])
+async def get_correlation(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "correlation", page)
+
+
+@_feed("filtered-correlation", "correlation", "Filtered Correlation Data")
+def _filtered_correlation(snapshot: Snapshot):
+    expiry_1, expiry_2 = snapshot.view("correlation", "with_atm")
+    above = compile_filter("ratio > avg_ratio")
+    return {
+        "expiry1": expiry_1[above.mask(expiry_1)],
+        "expiry2": expiry_2[above.mask(expiry_2)],
     }
-    return JSONResponse(
-        {"success": True, "msg": "All Correlation Data", "data": data},
-        status.HTTP_200_OK,
-    )
 
 
-@router.get(path="/filtered-correlation", name="screeners:filtered-correlation")
-async def get_filtered_correlation():
-    expiry_1, expiry_2 = memory_correlation.expiry_with_atm(-1)
-
-    # Use concurrent futures to parallelize filtering
-    loop = asyncio.get_event_loop()
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        tasks = [
-            loop.run_in_executor(
-                executor,
-                lambda: json.loads(
-                    expiry_1[expiry_1["ratio"] > expiry_1["avg_ratio"]].to_json(
-                        orient="records"
-                    )
-                ),
-            ),
-            loop.run_in_executor(
-                executor,
-                lambda: json.loads(
-                    expiry_2[expiry_2["ratio"] > expiry_2["avg_ratio"]].to_json(
-                        orient="records"
-                    )
-                ),
-            ),
-        ]
-        filtered_data_ratio_expiry_1, filtered_data_ratio_expiry_2 = (
-            await asyncio.gather(*tasks)
-        )
+@router.get(path="/filtered-correlation", name="screeners:filtered-correlation", dependencies=[reads("correlation")])
+async def get_filtered_correlation(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "filtered-correlation", page)
 
-    return JSONResponse(
-        {
-            "success": True,
-            "msg": "Filtered Correlation Data",
-            "data": {
-                "expiry1": filtered_data_ratio_expiry_1,
-                "expiry2": filtered_data_ratio_expiry_2,
-            },
-        },
-        status.HTTP_200_OK,
-    )
 
+@_feed("skew", "skew", "Skew Data")
+def _skew(snapshot: Snapshot):
+    return snapshot.view("skew", "sorted")
 
-@router.get(path="/skew", name="screeners:skew")
-async def get_skew_data():
-    return JSONResponse(
-        {"success": True, "msg": "Skew Data", "data": memory_skew.get_data()},
-        status.HTTP_200_OK,
-    )
 
+@router.get(path="/skew", name="screeners:skew", dependencies=[reads("skew")])
+async def get_skew_data(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "skew", page)
 
-@router.get(path="/skew-benchamrk", name="screeners:skew-benchamrk")
-async def get_skew_benchmark_data():
-    expiry_1, expiry_2 = memory_skew_benchmark.expiry_with_skew(-1)
-    data = {
-        "expiry_1": json.loads(expiry_1.to_json(orient="records")),
-        "expiry_2": json.loads(expiry_2.to_json(orient="records")),
-    }
-    return JSONResponse(
-        {"success": True, "msg": "All Skew Benchmark Data", "data": data},
-        status.HTTP_200_OK,
-    )
+
+@_feed("skew-benchamrk", "skew_benchmark", "All Skew Benchmark Data")
+def _skew_benchamrk(snapshot: Snapshot):
+    expiry_1, expiry_2 = snapshot.view("skew_benchmark", "with_skew")
+    return {"expiry_1": expiry_1, "expiry_2": expiry_2}
+
+
+@router.get(path="/skew-benchamrk", name="screeners:skew-benchamrk", dependencies=[reads("skew_benchmark")])
+async def get_skew_benchmark_data(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "skew-benchamrk", page)
 
 
 class SkewUpdateItem(BaseModel):
@@ -255,7 +239,8 @@ async def skewUpdate(body: SkewUpdateItem):
     else:
         expiry = 2
 
-    memory_skew_benchmark.update_ticker_benchmark(
+    change = partial(
+        memory_skew_benchmark.update_ticker_benchmark,
         expiry=expiry,
         ticker=body.ticker,
         pcf=body.pcf,
@@ -263,6 +248,7 @@ async def skewUpdate(body: SkewUpdateItem):
         ccb=body.ccb,
         fourL_F=body.fourL_F,
     )
+    await asyncio.get_running_loop().run_in_executor(None, edit, "skew_benchmark", change)
     return JSONResponse(
         {
             "success": True,
@@ -272,93 +258,91 @@ async def skewUpdate(body: SkewUpdateItem):
         status.HTTP_200_OK,
     )
 
-@router.get(path="/fwd_scan", name="screeners:fwd_scan")
-async def get_fwd_scan():
-    (expiry_1_abv_fwd, 
-     expiry_1_blw_fwd, 
-     expiry_2_abv_fwd, 
-     expiry_2_blw_fwd) = memory_fwd_scan_iv.expiry(-1)
-
-    # print(f"expiry_2_abv_fwd, {expiry_2_abv_fwd.isnull().sum()}")
-    
-    data = {
-        "expiry_1_abv_fwd": json.loads(expiry_1_abv_fwd.to_json(orient="records")),
-        "expiry_1_blw_fwd": json.loads(expiry_1_blw_fwd.to_json(orient="records")),
-        "expiry_2_abv_fwd": json.loads(expiry_2_abv_fwd.to_json(orient="records")),
-        "expiry_2_blw_fwd": json.loads(expiry_2_blw_fwd.to_json(orient="records")),
+@_feed("fwd_scan", "fwd_scan", "All Fwd Data")
+def _fwd_scan(snapshot: Snapshot):
+    (expiry_1_abv_fwd,
+     expiry_1_blw_fwd,
+     expiry_2_abv_fwd,
+     expiry_2_blw_fwd) = snapshot.view("fwd_scan", "expiries")
+    return {
+        "expiry_1_abv_fwd": expiry_1_abv_fwd,
+        "expiry_1_blw_fwd": expiry_1_blw_fwd,
+        "expiry_2_abv_fwd": expiry_2_abv_fwd,
+        "expiry_2_blw_fwd": expiry_2_blw_fwd,
     }
-    return JSONResponse(
-        {"success": True, "msg": "All Fwd Data", "data": data},
-        status.HTTP_200_OK,
-    )
+
+
+@router.get(path="/fwd_scan", name="screeners:fwd_scan", dependencies=[reads("fwd_scan")])
+async def get_fwd_scan(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "fwd_scan", page)
     
-@router.get(path="/price_scan", name="screeners:price_scan")
-async def get_price_scan():
-    (expiry_1_abv_price, 
-     expiry_1_blw_price, 
-     expiry_2_abv_price, 
+@_feed("price_scan", "price_change", "All Price Data")
+def _price_scan(snapshot: Snapshot):
+    (expiry_1_abv_price,
+     expiry_1_blw_price,
+     expiry_2_abv_price,
      expiry_2_blw_price,
-     move_track) = memory_price_change.expiry(-1)
-    
-    data = {
-        "expiry_1_abv_price": json.loads(expiry_1_abv_price.to_json(orient="records")),
-        "expiry_1_blw_price": json.loads(expiry_1_blw_price.to_json(orient="records")),
-        "expiry_2_abv_price": json.loads(expiry_2_abv_price.to_json(orient="records")),
-        "expiry_2_blw_price": json.loads(expiry_2_blw_price.to_json(orient="records")),
-        "move_track": json.loads(move_track.to_json(orient="records")),
+     move_track) = snapshot.view("price_change", "expiries")
+    return {
+        "expiry_1_abv_price": expiry_1_abv_price,
+        "expiry_1_blw_price": expiry_1_blw_price,
+        "expiry_2_abv_price": expiry_2_abv_price,
+        "expiry_2_blw_price": expiry_2_blw_price,
+        "move_track": move_track,
     }
-    return JSONResponse(
-        {"success": True, "msg": "All Price Data", "data": data},
-        status.HTTP_200_OK,
-    )
+
+
+@router.get(path="/price_scan", name="screeners:price_scan", dependencies=[reads("price_change")])
+async def get_price_scan(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "price_scan", page)
     
-@router.get(path="/strike_ls", name="screeners:strike_ls")
-async def get_strike_ls_scan():
-    (compare_df_1, 
+@_feed("strike_ls", "strike_ls", "All strike ls Data")
+def _strike_ls(snapshot: Snapshot):
+    (compare_df_1,
      compare_df_2,
      display_df_1,
      vol_morn,
      skew_morn, skew_morn_fair, long_df_1, short_df_1,
-     intra_long_df_1, intra_short_df_1) = memory_strike_ls.expiry(1)
-    
-    data = {
-        "compare_df_1": json.loads(compare_df_1.to_json(orient="records")),
-        "compare_df_2": json.loads(compare_df_2.to_json(orient="records")),
-        "display_df": json.loads(display_df_1.to_json(orient="records")),
-        "vol_morn": json.loads(vol_morn.to_json(orient="records")),
-        "skew_morn": json.loads(skew_morn.to_json(orient="records")),
-        "skew_morn_fair": json.loads(skew_morn_fair.to_json(orient="records")),
-        "long_df": json.loads(long_df_1.to_json(orient="records")),
-        "short_df": json.loads(short_df_1.to_json(orient="records")),
-        "intra_long_df_1": json.loads(intra_long_df_1.to_json(orient="records")),
-        "intra_short_df_1": json.loads(intra_short_df_1.to_json(orient="records")),
+     intra_long_df_1, intra_short_df_1) = snapshot.view("strike_ls", "expiry_1")
+    return {
+        "compare_df_1": compare_df_1,
+        "compare_df_2": compare_df_2,
+        "display_df": display_df_1,
+        "vol_morn": vol_morn,
+        "skew_morn": skew_morn,
+        "skew_morn_fair": skew_morn_fair,
+        "long_df": long_df_1,
+        "short_df": short_df_1,
+        "intra_long_df_1": intra_long_df_1,
+        "intra_short_df_1": intra_short_df_1,
     }
-    return JSONResponse(
-        {"success": True, "msg": "All strike ls Data", "data": data},
-        status.HTTP_200_OK,
-    )
 
-@router.get(path="/calendars", name="screeners:calendars")
-async def get_calendar_scan():
+
+@router.get(path="/strike_ls", name="screeners:strike_ls", dependencies=[reads("strike_ls")])
+async def get_strike_ls_scan(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "strike_ls", page)
+
+@_feed("calendars", "calendars", "All Calendar Data")
+def _calendars(snapshot: Snapshot):
     (calendar_1, calendar_1_low_ivp_pos, calendar_1_low_ivp_neg, calendar_1_high_ivp_pos, calendar_1_high_ivp_neg,
-    calendar_2, calendar_2_low_ivp_pos, calendar_2_low_ivp_neg, calendar_2_high_ivp_pos, calendar_2_high_ivp_neg) = memory_calendars.get_data(3)
-    
-    data = {
-        "calendar_1": json.loads(calendar_1.to_json(orient="records")),
-        "calendar_1_low_ivp_pos": json.loads(calendar_1_low_ivp_pos.to_json(orient="records")),
-        "calendar_1_low_ivp_neg": json.loads(calendar_1_low_ivp_neg.to_json(orient="records")),
-        "calendar_1_high_ivp_pos": json.loads(calendar_1_high_ivp_pos.to_json(orient="records")),
-        "calendar_1_high_ivp_neg": json.loads(calendar_1_high_ivp_neg.to_json(orient="records")),
-        "calendar_2": json.loads(calendar_2.to_json(orient="records")),
-        "calendar_2_low_ivp_pos": json.loads(calendar_2_low_ivp_pos.to_json(orient="records")),
-        "calendar_2_low_ivp_neg": json.loads(calendar_2_low_ivp_neg.to_json(orient="records")),
-        "calendar_2_high_ivp_pos": json.loads(calendar_2_high_ivp_pos.to_json(orient="records")),
-        "calendar_2_high_ivp_neg": json.loads(calendar_2_high_ivp_neg.to_json(orient="records")),
+    calendar_2, calendar_2_low_ivp_pos, calendar_2_low_ivp_neg, calendar_2_high_ivp_pos, calendar_2_high_ivp_neg) = snapshot.view("calendars", "all")
+    return {
+        "calendar_1": calendar_1,
+        "calendar_1_low_ivp_pos": calendar_1_low_ivp_pos,
+        "calendar_1_low_ivp_neg": calendar_1_low_ivp_neg,
+        "calendar_1_high_ivp_pos": calendar_1_high_ivp_pos,
+        "calendar_1_high_ivp_neg": calendar_1_high_ivp_neg,
+        "calendar_2": calendar_2,
+        "calendar_2_low_ivp_pos": calendar_2_low_ivp_pos,
+        "calendar_2_low_ivp_neg": calendar_2_low_ivp_neg,
+        "calendar_2_high_ivp_pos": calendar_2_high_ivp_pos,
+        "calendar_2_high_ivp_neg": calendar_2_high_ivp_neg,
     }
-    return JSONResponse(
-        {"success": True, "msg": "All Calendar Data", "data": data},
-        status.HTTP_200_OK,
-    )
+
+
+@router.get(path="/calendars", name="screeners:calendars", dependencies=[reads("calendars")])
+async def get_calendar_scan(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "calendars", page)
 
 class CalendarUpdateItem(BaseModel):
     lowIVP: float
@@ -367,10 +351,13 @@ class CalendarUpdateItem(BaseModel):
 @router.post(path="/cal-update", name="screeners:cal-update")
 async def calendarUpdate(body: CalendarUpdateItem):
 
-    memory_calendars.update_calendar_settings(
+    change = partial(
+        memory_calendars.update_calendar_settings,
         low_ivp=body.lowIVP,
         high_ivp=body.highIVP,
     )
+    # recomputes with a chain fetch and the CPU pool, off the loop
+    await asyncio.get_running_loop().run_in_executor(None, edit, "calendars", change)
     return JSONResponse(
         {
             "success": True,
@@ -380,110 +367,179 @@ async def calendarUpdate(body: CalendarUpdateItem):
         status.HTTP_200_OK,
     )
 
-@router.get(path="/bcrs", name="screeners:bcrs")
-async def get_bcrs_scan():
-    (bcrs_df, bprs_df, strad_df) = memory_bcrs.get_data(1)
-    
-    data = {
-        "bcrs_df": json.loads(bcrs_df.to_json(orient="records")),
-        "bprs_df": json.loads(bprs_df.to_json(orient="records")),
-        "strad_df": json.loads(strad_df.to_json(orient="records")),
+@_feed("bcrs", "bcrs", "All BCRS Data")
+def _bcrs(snapshot: Snapshot):
+    (bcrs_df, bprs_df, strad_df) = snapshot.view("bcrs", "expiry_1")
+    return {
+        "bcrs_df": bcrs_df,
+        "bprs_df": bprs_df,
+        "strad_df": strad_df,
     }
-    return JSONResponse(
-        {"success": True, "msg": "All BCRS Data", "data": data},
-        status.HTTP_200_OK,
-    )
 
-@router.get(path="/intra_long_short", name="screeners:intra_long_short")
-async def get_intra_long_short_scan():
-    (short_df, long_df) = memory_intra_long_short.expiry(1)
-    
-    data = {
-        "short_df": json.loads(short_df.to_json(orient="records")),
-        "long_df": json.loads(long_df.to_json(orient="records")),
+
+@router.get(path="/bcrs", name="screeners:bcrs", dependencies=[reads("bcrs")])
+async def get_bcrs_scan(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "bcrs", page)
+
+@_feed("intra_long_short", "intra_long_short", "All Intra Data")
+def _intra_long_short(snapshot: Snapshot):
+    (short_df, long_df) = snapshot.view("intra_long_short", "expiry_1")
+    return {
+        "short_df": short_df,
+        "long_df": long_df,
     }
-    return JSONResponse(
-        {"success": True, "msg": "All Intra Data", "data": data},
-        status.HTTP_200_OK,
-    )
 
-@router.get(path="/lsiv_scan", name="screeners:lsiv_scan")
-async def get_ls_iv():
-    (expiry_1_short, 
-     expiry_1_long, 
-     expiry_2_short, 
+
+@router.get(path="/intra_long_short", name="screeners:intra_long_short", dependencies=[reads("intra_long_short")])
+async def get_intra_long_short_scan(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "intra_long_short", page)
+
+@_feed("lsiv_scan", "long_short", "All ls_iv Data")
+def _lsiv_scan(snapshot: Snapshot):
+    (expiry_1_short,
+     expiry_1_long,
+     expiry_2_short,
      expiry_2_long,
-     expiry_1_short_result, 
-     expiry_1_long_result, 
-     expiry_2_short_result, 
-     expiry_2_long_result) = memory_ls_iv.expiry(-1)
-    
-    data = {
-        "expiry_1_short": json.loads(expiry_1_short.to_json(orient="records")),
-        "expiry_1_long": json.loads(expiry_1_long.to_json(orient="records")),
-        "expiry_2_short": json.loads(expiry_2_short.to_json(orient="records")),
-        "expiry_2_long": json.loads(expiry_2_long.to_json(orient="records")),
-        "expiry_1_short_result": json.loads(expiry_1_short_result.to_json(orient="records")),
-        "expiry_1_long_result": json.loads(expiry_1_long_result.to_json(orient="records")),
-        "expiry_2_short_result": json.loads(expiry_2_short_result.to_json(orient="records")),
-        "expiry_2_long_result": json.loads(expiry_2_long_result.to_json(orient="records")),
+     expiry_1_short_result,
+     expiry_1_long_result,
+     expiry_2_short_result,
+     expiry_2_long_result) = snapshot.view("long_short", "expiries")
+    return {
+        "expiry_1_short": expiry_1_short,
+        "expiry_1_long": expiry_1_long,
+        "expiry_2_short": expiry_2_short,
+        "expiry_2_long": expiry_2_long,
+        "expiry_1_short_result": expiry_1_short_result,
+        "expiry_1_long_result": expiry_1_long_result,
+        "expiry_2_short_result": expiry_2_short_result,
+        "expiry_2_long_result": expiry_2_long_result,
     }
-    return JSONResponse(
-        {"success": True, "msg": "All ls_iv Data", "data": data},
-        status.HTTP_200_OK,
-    )
 
 
+@router.get(path="/lsiv_scan", name="screeners:lsiv_scan", dependencies=[reads("long_short")])
+async def get_ls_iv(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "lsiv_scan", page)
 
-@router.get(path="/atr_scan", name="screeners:atr_scan")
-async def get_ls_iv():
-    (expiry_1_short, 
-     expiry_1_long, 
-     expiry_2_short, 
-     expiry_2_long) = memory_atr.expiry(-1)
-    
-    data = {
-        "expiry_1_short": json.loads(expiry_1_short.to_json(orient="records")),
-        "expiry_1_long": json.loads(expiry_1_long.to_json(orient="records")),
-        "expiry_2_short": json.loads(expiry_2_short.to_json(orient="records")),
-        "expiry_2_long": json.loads(expiry_2_long.to_json(orient="records")),
+
+
+@_feed("atr_scan", "atr", "All atr Data")
+def _atr_scan(snapshot: Snapshot):
+    (expiry_1_short,
+     expiry_1_long,
+     expiry_2_short,
+     expiry_2_long) = snapshot.view("atr", "expiries")
+    return {
+        "expiry_1_short": expiry_1_short,
+        "expiry_1_long": expiry_1_long,
+        "expiry_2_short": expiry_2_short,
+        "expiry_2_long": expiry_2_long,
     }
-    return JSONResponse(
-        {"success": True, "msg": "All atr Data", "data": data},
-        status.HTTP_200_OK,
-    )
+
+
+@router.get(path="/atr_scan", name="screeners:atr_scan", dependencies=[reads("atr")])
+async def get_atr_scan(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "atr_scan", page)
 
 
 
 
-@router.get(path="/surface_scan", name="screeners:surface_scan")
-async def get_surface_scan():
-    (intraday_short, 
-     intraday_long, 
-     eod_short, 
+@_feed("surface_scan", "surface_iv", "All Surface Data")
+def _surface_scan(snapshot: Snapshot):
+    (intraday_short,
+     intraday_long,
+     eod_short,
      eod_long,
      intraday_short_avg,
      intraday_long_avg,
      eod_short_avg,
-     eod_long_avg) = memory_surface_scan_iv.expiry(-1)
-   
-    data = {
-        "intraday_short": json.loads(intraday_short.to_json(orient="records")),
-        "intraday_long": json.loads(intraday_long.to_json(orient="records")),
-        "eod_short": json.loads(eod_short.to_json(orient="records")),
-        "eod_long": json.loads(eod_long.to_json(orient="records")),
-        "intraday_short_avg": json.loads(intraday_short_avg.to_json(orient="records")),
-        "intraday_long_avg": json.loads(intraday_long_avg.to_json(orient="records")),
-        "eod_short_avg": json.loads(eod_short_avg.to_json(orient="records")),
-        "eod_long_avg": json.loads(eod_long_avg.to_json(orient="records")),
-
+     eod_long_avg) = snapshot.view("surface_iv", "expiries")
+    return {
+        "intraday_short": intraday_short,
+        "intraday_long": intraday_long,
+        "eod_short": eod_short,
+        "eod_long": eod_long,
+        "intraday_short_avg": intraday_short_avg,
+        "intraday_long_avg": intraday_long_avg,
+        "eod_short_avg": eod_short_avg,
+        "eod_long_avg": eod_long_avg,
     }
-    return JSONResponse(
-        {"success": True, "msg": "All Surface Data", "data": data},
-        status.HTTP_200_OK,
-    )
 
 
+@router.get(path="/surface_scan", name="screeners:surface_scan", dependencies=[reads("surface_iv")])
+async def get_surface_scan(request: Request, page: Page = Depends(_page)):
+    return await _serve(request, "surface_scan", page)
 
 
+def _subscribed(screeners: str) -> List[str]:
+    feeds = [name.strip() for name in screeners.split(",") if name.strip()]
+    unknown = sorted(set(feeds) - set(FEEDS))
+    if not feeds or unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown screeners: {unknown}, expected some of {sorted(FEEDS)}",
+        )
+    return list(dict.fromkeys(feeds))
+
+
+async def _subscribe(feeds: List[str]) -> Tuple[Subscriber, List[bytes]]:
+    loop = asyncio.get_running_loop()
+    # building a feed nobody streams yet is CPU work, keep it off the loop
+    return await loop.run_in_executor(None, broadcaster.subscribe, feeds, loop)
+
+
+@router.get(path="/stream", name="screeners:stream")
+async def stream(screeners: str = Query(..., description="Comma separated endpoint names, e.g. vol,skew")):
+    """
+    Server-sent events: a `snapshot` message per feed, then a `diff`
+    message each time one of them changes.
+    """
+    subscriber, frames = await _subscribe(_subscribed(screeners))
+
+    async def events():
+        try:
+            for frame in frames:
+                yield b"data: " + frame + b"\n\n"
+            async for message in broadcaster.listen(subscriber, settings.STREAM_HEARTBEAT):
+                yield b"data: " + message + b"\n\n"
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
+@router.websocket(path="/ws", name="screeners:ws")
+async def stream_ws(websocket: WebSocket, screeners: str = ""):
+    """The same messages as /stream, over a WebSocket."""
+    try:
+        feeds = _subscribed(screeners)
+    except HTTPException as error:
+        await websocket.close(code=1008, reason=str(error.detail))
+        return
+    await websocket.accept()
+    subscriber, frames = await _subscribe(feeds)
+
+    async def send():
+        for frame in frames:
+            await websocket.send_text(frame.decode())
+        async for message in broadcaster.listen(subscriber, settings.STREAM_HEARTBEAT):
+            await websocket.send_text(message.decode())
+        # dropped as a slow consumer
+        await websocket.close(code=1013)
+
+    async def closed():
+        # anything the client sends is ignored, this only notices it leaving
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(send()), asyncio.create_task(closed())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        broadcaster.unsubscribe(subscriber)
@@ -0,0 +1,99 @@
+"""
+Times the tick pipeline against a running upstream (normally the stub).
+
+    python -m stub.server --universe 2000 --port 5000 &
+    ATHENA_SERVER_URL=http://127.0.0.1:5000 PYTHONPATH=src python -m stub.bench --ticks 20
+
+Run from the repository root (scan_config.json and assets/ are read from
+the working directory). Reports p50 / p95 / max per screener `update` and
+per upstream request key, so runs at different --universe sizes show how
+each part scales.
+"""
+import argparse
+import statistics
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+
+class Timings:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                with self.lock:
+                    self.errors[name] += 1
+                raise
+            finally:
+                with self.lock:
+                    self.samples[name].append(time.perf_counter() - start)
+
+        return timed
+
+    def report(self, title: str) -> None:
+        print(f"\n{title:<40} {'n':>5} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+        for name in sorted(self.samples):
+            values = sorted(self.samples[name])
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            print(
+                f"{name:<40} {len(values):>5} {self.errors[name]:>5} "
+                f"{statistics.median(values) * 1000:>9.1f} {p95 * 1000:>9.1f} {values[-1] * 1000:>9.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticks", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1, help="ticks run before timing starts")
+    parser.add_argument("--interval-ms", type=int, default=0, help="pause between ticks")
+    args = parser.parse_args()
+
+    import utils.api as api
+    import router.events as events
+    from config.events import execute_backend_server_event_handler
+    import asyncio
+
+    asyncio.run(execute_backend_server_event_handler(None)())
+
+    screeners = Timings()
+    requests = Timings()
+    ticks = Timings()
+
+    for name, stage in events.runner.stages.items():
+        stage.func = screeners.wrap(name, stage.func)
+
+    incremental = api._incremental_request
+    api._incremental_request = lambda method, endpoint, key, **kwargs: requests.wrap(
+        key.split(":")[0], incremental
+    )(method, endpoint, key, **kwargs)
+
+    for i in range(args.warmup + args.ticks):
+        if i == args.warmup:
+            screeners.samples.clear()
+            screeners.errors.clear()
+            requests.samples.clear()
+            requests.errors.clear()
+        start = time.perf_counter()
+        events.update_atm_iv_data()
+        # time the whole tick, not just the part inside TICK_DEADLINE
+        events.runner.wait_idle()
+        if i >= args.warmup:
+            ticks.samples["tick"].append(time.perf_counter() - start)
+        if args.interval_ms:
+            time.sleep(args.interval_ms / 1000)
+
+    ticks.report("tick")
+    screeners.report("screener update")
+    requests.report("upstream request")
+
+
+if __name__ == "__main__":
+    main()
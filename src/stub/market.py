@@ -0,0 +1,263 @@
+import csv
+import math
+import os
+import random
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+INDEX_SYMBOLS = ["NIFTY", "BANKNIFTY"]
+
+
+def _norm_cdf(x: float) -> float:
+    return 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
+
+
+def _last_thursday(year: int, month: int) -> date:
+    if month == 12:
+        last = date(year, 12, 31)
+    else:
+        last = date(year, month + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - 3) % 7)
+
+
+def default_expiries(count: int = 3) -> List[str]:
+    if "EXPIRY_DATES" in os.environ:
+        return [d.strip() for d in os.environ["EXPIRY_DATES"].split(";")][:count]
+    today = date.today()
+    year, month = today.year, today.month
+    expiries = []
+    while len(expiries) < count:
+        expiry = _last_thursday(year, month)
+        if expiry >= today:
+            expiries.append(expiry.isoformat())
+        month += 1
+        if month > 12:
+            month, year = 1, year + 1
+    return expiries
+
+
+def load_symbols(path: str) -> List[str]:
+    with open(path, "r", encoding="utf8") as handle:
+        return [row["symbol"] for row in csv.DictReader(handle) if row.get("symbol")]
+
+
+def universe(symbols: List[str], size: Optional[int] = None) -> List[str]:
+    """
+    Exactly `size` unique symbols: the given ones first (indices always kept),
+    padded with synthetic SYN0001... names when there are not enough.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if size is None:
+        return symbols
+    if size <= len(symbols):
+        return symbols[:size]
+    taken = set(symbols)
+    padding = (f"SYN{i:04d}" for i in range(1, size * 2))
+    return symbols + [s for s in padding if s not in taken][: size - len(symbols)]
+
+
+class SymbolState:
+    def __init__(self, index: int, symbol: str, rng: random.Random):
+        self.index = index
+        self.symbol = symbol
+        self.spot = rng.uniform(100, 5000) if symbol not in INDEX_SYMBOLS else rng.uniform(20000, 50000)
+        self.prev_close = self.spot
+        self.strike_step = max(1, round(self.spot * 0.01 / 5) * 5) if self.spot > 500 else 2.5
+        self.base_iv = rng.uniform(15, 45)
+        self.iv = self.base_iv
+        self.updated_at = datetime.now()
+
+
+class SyntheticMarket:
+    """
+    In-memory stand-in for the upstream market data server. Every `step` moves
+    a random slice of the universe and bumps the sequence number, which is
+    what the incremental (`since` / ETag) protocol is keyed on.
+    """
+
+    def __init__(
+        self,
+        symbols: Iterable[str],
+        expiries: Optional[List[str]] = None,
+        strikes: int = 20,
+        churn: float = 0.05,
+        seed: Optional[int] = None,
+    ):
+        self.rng = random.Random(seed)
+        self.expiries = expiries or default_expiries()
+        self.strikes = strikes
+        self.churn = churn
+        self.state: Dict[str, SymbolState] = {
+            s: SymbolState(i, s, self.rng) for i, s in enumerate(dict.fromkeys(symbols))
+        }
+        self.sequence = 0
+        self.changed_at: Dict[str, int] = {s: 0 for s in self.state}
+        self.lock = threading.Lock()
+
+    def step(self) -> List[str]:
+        with self.lock:
+            count = max(1, int(len(self.state) * self.churn))
+            moved = self.rng.sample(list(self.state), min(count, len(self.state)))
+            self.sequence += 1
+            now = datetime.now()
+            for symbol in moved:
+                st = self.state[symbol]
+                st.spot *= math.exp(self.rng.gauss(0, 0.002))
+                st.iv = max(5.0, st.iv + self.rng.gauss(0, 0.2))
+                st.updated_at = now
+                self.changed_at[symbol] = self.sequence
+            return moved
+
+    def symbols(self, since: Optional[int] = None) -> List[str]:
+        if since is None:
+            return list(self.state)
+        return [s for s, seq in self.changed_at.items() if seq > since]
+
+    def _days(self, expiry: str) -> float:
+        return max((date.fromisoformat(expiry) - date.today()).days, 0) + 1
+
+    def _atm_strike(self, st: SymbolState) -> float:
+        return round(st.spot / st.strike_step) * st.strike_step
+
+    def _delta(self, st: SymbolState, strike: float, expiry: str, call: bool) -> float:
+        t = self._days(expiry) / 365.0
+        vol = st.iv / 100.0
+        d1 = (math.log(st.spot / strike) + 0.5 * vol * vol * t) / (vol * math.sqrt(t))
+        return round(_norm_cdf(d1) if call else _norm_cdf(d1) - 1.0, 4)
+
+    def _pct_change(self, st: SymbolState) -> float:
+        return round((st.spot - st.prev_close) / st.prev_close * 100, 4)
+
+    def atm_iv(self, symbols: List[str]) -> List[Dict[str, Any]]:
+        rows = []
+        for symbol in symbols:
+            st = self.state[symbol]
+            n = len(self.expiries)
+            atm = self._atm_strike(st)
+            ivs = [round(st.iv + j * 0.3, 4) for j in range(n)]
+            rows.append({
+                "pk": st.index,
+                "atm_iv_pk": st.index,
+                "errors": None,
+                "symbol": symbol,
+                "expiry": list(self.expiries),
+                "atm_strike": [atm] * n,
+                "type": ["CE"] * n,
+                "delta": [0.5] * n,
+                "ltp": [round(st.spot, 2)] * n,
+                "atm_iv": ivs,
+                "iv_stats": [{
+                    "avg_normal_iv": st.base_iv,
+                    "higest_normal_iv": st.base_iv * 1.4,
+                    "lowest_normal_iv": st.base_iv * 0.7,
+                }] * n,
+                "percent_change": [{"fut": self._pct_change(st)}] * n,
+                "ivp": [round(min(max((st.iv - st.base_iv) / st.base_iv + 0.5, 0), 1), 4)] * n,
+                "z_score": round((st.iv - st.base_iv) / 3, 4),
+                "hv": round(st.base_iv * 0.9, 4),
+                "fair_price": round(st.spot, 2),
+                "fwd_iv": round(st.base_iv, 4),
+                "pe_pe_z_score": 0.0,
+                "ce_ce_z_score": 0.0,
+                "pe_ce_z_score": 0.0,
+                "four_leg_z_score": 0.0,
+                "pe_pe_ivp": 0.5,
+                "ce_ce_ivp": 0.5,
+                "pe_ce_ivp": 0.5,
+                "four_leg_ivp": 0.5,
+            })
+        return rows
+
+    def _rng(self, st: SymbolState) -> random.Random:
+        # payloads only change when the symbol moves, so an unchanged symbol
+        # always renders the same bytes
+        return random.Random(f"{st.symbol}:{self.changed_at[st.symbol]}")
+
+    def _skew_leg(self, rng: random.Random) -> Dict[str, Any]:
+        skew = round(rng.gauss(0, 1.5), 4)
+        return {
+            "z_score": round(rng.gauss(0, 1), 4),
+            "ivp": round(rng.random(), 4),
+            "skew": skew,
+            "skew_avg": round(skew * 0.8, 4),
+            "skew_std": 1.0,
+            "skew_avg_yest": round(skew * 0.9, 4),
+            "elements": [],
+        }
+
+    def skew(self, symbols: List[str]) -> List[Dict[str, Any]]:
+        rows = []
+        for symbol in symbols:
+            st = self.state[symbol]
+            rng = self._rng(st)
+            rows.append({
+                "symbol": symbol,
+                "individual": [
+                    {
+                        "expiry": expiry,
+                        "atm_data": {"strike_price": self._atm_strike(st), "iv": round(st.iv, 4)},
+                        "pe_pe": self._skew_leg(rng),
+                        "pe_ce": self._skew_leg(rng),
+                        "ce_ce": self._skew_leg(rng),
+                        "four_leg": self._skew_leg(rng),
+                    }
+                    for expiry in self.expiries
+                ],
+            })
+        return rows
+
+    def _option(
+        self, st: SymbolState, rng: random.Random, strike: float, expiry: str, call: bool
+    ) -> Dict[str, Any]:
+        delta = self._delta(st, strike, expiry, call)
+        mid = max(0.05, abs(delta) * st.spot * st.iv / 100 * math.sqrt(self._days(expiry) / 365.0))
+        spread = mid * rng.uniform(0.005, 0.2)
+        return {
+            "strike_price": str(strike),
+            "pk": {
+                "symbol": st.symbol,
+                "expiry": expiry,
+                "asset_type": "CallOption" if call else "PutOption",
+            },
+            "params": {
+                "delta": delta,
+                "last_iv": round(st.iv / 100, 6),
+                "liquidity": round(spread / mid, 6),
+                "ltt": st.updated_at.isoformat(sep=" ", timespec="seconds"),
+                "bid": round(mid - spread / 2, 2),
+                "ask": round(mid + spread / 2, 2),
+            },
+        }
+
+    def token_set(
+        self,
+        symbols: List[str],
+        delta: Optional[Dict[str, List[str]]] = None,
+        expiry: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        expiries = [e for e in self.expiries if expiry is None or e in expiry]
+
+        def keep(item, side):
+            if delta is None or side not in delta:
+                return True
+            low, high = (float(x) for x in delta[side])
+            return low <= item["params"]["delta"] <= high
+
+        rows = []
+        for symbol in symbols:
+            st = self.state[symbol]
+            rng = self._rng(st)
+            atm = self._atm_strike(st)
+            strikes = [atm + (k - self.strikes // 2) * st.strike_step for k in range(self.strikes)]
+            markers = []
+            for e in expiries:
+                ce = [self._option(st, rng, k, e, True) for k in strikes if k > 0]
+                pe = [self._option(st, rng, k, e, False) for k in strikes if k > 0]
+                markers.append({
+                    "expiry": e,
+                    "ce_data": [i for i in ce if keep(i, "ce")],
+                    "pe_data": [i for i in pe if keep(i, "pe")],
+                })
+            rows.append({"symbol": symbol, "markers": markers})
+        return rows
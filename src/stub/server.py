@@ -0,0 +1,252 @@
+"""
+Local stand-in for the upstream (Athena) server.
+
+    cd src && python -m stub.server --port 5000
+
+Implements /auth/login, /auth/refresh, /expiries, atm_iv, skew and
+filtered-token-set with the incremental polling protocol: every response
+carries an `ETag` and an `X-Sequence` watermark, a request whose
+`If-None-Match` matches the current state gets `304 Not Modified`, and a
+request with `?since=<sequence>` only gets the symbols that moved after that
+sequence (flagged with `X-Delta: true`).
+
+/stream is a server-sent events feed with one `update` event per market
+step, used by the push ingestion mode.
+
+Universe size (--universe, padded with synthetic symbols), expiries and
+strikes are configurable. Latency, jitter and failures can be injected with
+the --latency-ms / --jitter-ms / --error-rate / --hang-rate flags and changed
+at runtime through GET/POST /_stub/faults, e.g.
+
+    python -m stub.server --universe 2000 --expiries 3 --strikes 40 --latency-ms 80 --error-rate 0.02
+    curl -X POST localhost:5000/_stub/faults -d '{"latency_ms": 300, "endpoints": ["/skew"]}'
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from stub.market import SyntheticMarket, default_expiries, load_symbols, universe, INDEX_SYMBOLS
+
+DEFAULT_SYMBOLS_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "assets", "iv_stats.csv")
+
+
+@dataclass
+class Faults:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    # answer 503 for this fraction of requests
+    error_rate: float = 0.0
+    # stall this fraction of requests for hang_ms before answering, to
+    # exercise client timeouts
+    hang_rate: float = 0.0
+    hang_ms: float = 30000.0
+    # only these paths are affected, all of them when empty
+    endpoints: List[str] = field(default_factory=list)
+
+    def applies(self, path: str) -> bool:
+        return not self.endpoints or path in self.endpoints
+
+    async def inject(self) -> Optional[Response]:
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if self.hang_rate and random.random() < self.hang_rate:
+            delay = self.hang_ms
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            return JSONResponse({"detail": "injected failure"}, status_code=503)
+        return None
+
+
+class FaultInjection:
+    """
+    Plain ASGI middleware (not BaseHTTPMiddleware, which would buffer the
+    /stream response) applying the current `Faults` before each request.
+    """
+
+    def __init__(self, app, faults: Callable[[], Faults]):
+        self.app = app
+        self.faults = faults
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] == "http" and not path.startswith("/_stub"):
+            faults = self.faults()
+            if faults.applies(path):
+                failure = await faults.inject()
+                if failure is not None:
+                    await failure(scope, receive, send)
+                    return
+        await self.app(scope, receive, send)
+
+
+def _etag(endpoint: str, sequence: int, extra: str = "") -> str:
+    return f'"{endpoint}-{sequence}-{extra}"' if extra else f'"{endpoint}-{sequence}"'
+
+
+def _incremental(
+    request: Request,
+    market: SyntheticMarket,
+    endpoint: str,
+    render: Callable[[List[str]], List[Dict[str, Any]]],
+    extra: str = "",
+) -> Response:
+    with market.lock:
+        etag = _etag(endpoint, market.sequence, extra)
+        headers = {"ETag": etag, "X-Sequence": str(market.sequence)}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+
+        since = request.query_params.get("since")
+        if since is not None and since.isdigit():
+            symbols = market.symbols(since=int(since))
+            headers["X-Delta"] = "true"
+        else:
+            symbols = market.symbols()
+        body = render(symbols)
+    return JSONResponse(body, headers=headers)
+
+
+def create_app(market: SyntheticMarket, tick_ms: int = 1000, faults: Optional[Faults] = None) -> FastAPI:
+    app = FastAPI(title="Upstream stand-in")
+    app.state.faults = faults or Faults()
+    subscribers: List[asyncio.Queue] = []
+
+    app.add_middleware(FaultInjection, faults=lambda: app.state.faults)
+
+    @app.get("/_stub/faults")
+    async def get_faults():
+        return asdict(app.state.faults)
+
+    @app.post("/_stub/faults")
+    async def set_faults(payload: Dict[str, Any]):
+        app.state.faults = Faults(**{**asdict(app.state.faults), **payload})
+        return asdict(app.state.faults)
+
+    async def run_market():
+        while True:
+            await asyncio.sleep(tick_ms / 1000)
+            moved = market.step()
+            event = {"sequence": market.sequence, "symbols": moved}
+            for queue in list(subscribers):
+                if queue.full():
+                    # slow reader, it only needs the latest sequence anyway
+                    queue.get_nowait()
+                queue.put_nowait(event)
+
+    @app.on_event("startup")
+    async def start_market():
+        app.state.market_task = asyncio.create_task(run_market())
+
+    @app.on_event("shutdown")
+    async def stop_market():
+        app.state.market_task.cancel()
+
+    @app.post("/auth/login")
+    async def login(payload: Dict[str, Any]):
+        return {"data": {"access_token": uuid.uuid4().hex, "refresh_token": uuid.uuid4().hex}}
+
+    @app.post("/auth/refresh")
+    async def refresh(payload: Dict[str, Any]):
+        return {"data": {"access_token": uuid.uuid4().hex}}
+
+    @app.get("/expiries")
+    async def expiries():
+        return {"expiries": market.expiries}
+
+    @app.get("/atm_iv")
+    async def atm_iv(request: Request):
+        return _incremental(request, market, "atm_iv", market.atm_iv)
+
+    @app.get("/skew")
+    async def skew(request: Request):
+        return _incremental(request, market, "skew", market.skew)
+
+    @app.get("/stream")
+    async def stream(request: Request):
+        queue: asyncio.Queue = asyncio.Queue(maxsize=16)
+        subscribers.append(queue)
+
+        async def events():
+            try:
+                yield ": connected\n\n"
+                while not await request.is_disconnected():
+                    try:
+                        event = await asyncio.wait_for(queue.get(), timeout=15)
+                    except asyncio.TimeoutError:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield f"event: update\nid: {event['sequence']}\ndata: {json.dumps(event)}\n\n"
+            finally:
+                subscribers.remove(queue)
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/filtered-token-set")
+    async def token_set(request: Request):
+        body = await request.json()
+        wanted: Optional[List[str]] = body.get("symbols")
+        key = hashlib.md5(json.dumps(body, sort_keys=True).encode()).hexdigest()[:12]
+
+        def render(symbols: List[str]):
+            if wanted is not None:
+                symbols = [s for s in symbols if s in wanted]
+            return market.token_set(symbols, delta=body.get("delta"), expiry=body.get("expiry"))
+
+        return _incremental(request, market, "token-set", render, extra=key)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--symbols-file", default=DEFAULT_SYMBOLS_FILE)
+    parser.add_argument("--universe", type=int, default=None, help="number of symbols, padded with synthetic ones")
+    parser.add_argument("--expiries", type=int, default=3)
+    parser.add_argument("--strikes", type=int, default=20)
+    parser.add_argument("--churn", type=float, default=0.05, help="fraction of symbols moving per tick")
+    parser.add_argument("--tick-ms", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-ms", type=float, default=30000.0)
+    parser.add_argument("--fault-endpoints", nargs="*", default=[], help="paths to inject faults on, all when omitted")
+    args = parser.parse_args()
+
+    symbols = list(INDEX_SYMBOLS)
+    if os.path.exists(args.symbols_file):
+        symbols += load_symbols(args.symbols_file)
+
+    market = SyntheticMarket(
+        universe(symbols, args.universe),
+        expiries=default_expiries(args.expiries),
+        strikes=args.strikes,
+        churn=args.churn,
+        seed=args.seed,
+    )
+    faults = Faults(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        hang_rate=args.hang_rate,
+        hang_ms=args.hang_ms,
+        endpoints=args.fault_endpoints,
+    )
+    uvicorn.run(create_app(market, tick_ms=args.tick_ms, faults=faults), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import os
+import sys
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT = os.path.dirname(SRC)
+
+sys.path.insert(0, SRC)
+# the app reads scan_config.json and assets/ from the working directory
+os.chdir(ROOT)
+# no upstream to ask for the expiries
+os.environ.setdefault("EXPIRY_DATES", "2025-06-26;2025-07-31;2025-08-28")
+
+import utils.common  # noqa: E402
+
+if not hasattr(utils.common, "convert_filter_token_set"):
+    # memory.iv_surface imports a helper utils.common does not define yet;
+    # the surface screener is not exercised by the tests
+    def convert_filter_token_set(*args, **kwargs):
+        raise NotImplementedError("convert_filter_token_set")
+
+    utils.common.convert_filter_token_set = convert_filter_token_set
@@ -0,0 +1,179 @@
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+
+from utils.broadcast import DROPPED, KEY_COLUMNS, Broadcaster, Feed, Table
+from utils.snapshot import SnapshotStore
+
+
+def _apply(data, message):
+    """A stream client: `data`, the tables of a snapshot frame, with a diff message applied."""
+    data = dict(data)
+    for name, change in message["tables"].items():
+        if "replace" in change:
+            data[name] = change["replace"]
+            continue
+        rows = data[name]
+        # an empty table has no key, it is replaced
+        keys = [column for column in KEY_COLUMNS if column in rows[0]]
+        key = lambda row: tuple(row.get(column) for column in keys)  # noqa: E731
+        by_key = {key(row): row for row in rows}
+        for row in change["delete"]:
+            del by_key[key(row)]
+        for row in change["update"]:
+            assert key(row) in by_key
+            by_key[key(row)] = row
+        for row in change["insert"]:
+            assert key(row) not in by_key
+            by_key[key(row)] = row
+        data[name] = list(by_key.values())
+    return data
+
+
+def _sorted(rows):
+    return sorted(rows, key=lambda row: json.dumps(row, sort_keys=True)) if isinstance(rows, list) else rows
+
+
+def _same(data, expected):
+    assert data.keys() == expected.keys()
+    for name in expected:
+        assert _sorted(data[name]) == _sorted(expected[name]), name
+
+
+def _records(value):
+    return json.loads(value.to_json(orient="records")) if isinstance(value, pd.DataFrame) else value
+
+
+def test_keyed_diff_inserts_updates_and_deletes():
+    before = pd.DataFrame({"symbol": ["A", "B", "C"], "expiry": ["x", "x", "y"], "iv": [1.0, 2.0, 3.0]})
+    after = pd.DataFrame({"symbol": ["A", "C", "D"], "expiry": ["x", "y", "x"], "iv": [1.0, 3.5, 4.0]})
+    change = Table(after).diff(Table(before))
+    assert change == {
+        "insert": [{"symbol": "D", "expiry": "x", "iv": 4.0}],
+        "update": [{"symbol": "C", "expiry": "y", "iv": 3.5}],
+        "delete": [{"symbol": "B", "expiry": "x"}],
+    }
+    _same(_apply({"t": _records(before)}, {"tables": {"t": change}}), {"t": _records(after)})
+
+
+def test_unchanged_table_has_no_diff():
+    frame = pd.DataFrame({"symbol": ["A", "B"], "iv": [1.0, 2.0]})
+    assert Table(frame.copy()).diff(Table(frame)) is None
+    assert Table([1, 2]).diff(Table([1, 2])) is None
+
+
+@pytest.mark.parametrize("before, after", [
+    # duplicate keys, no row identity
+    (
+        pd.DataFrame({"symbol": ["A", "A"], "iv": [1.0, 2.0]}),
+        pd.DataFrame({"symbol": ["A", "A"], "iv": [1.0, 3.0]}),
+    ),
+    # no key columns at all
+    (pd.DataFrame({"iv": [1.0]}), pd.DataFrame({"iv": [2.0]})),
+    # the key changes with the columns
+    (pd.DataFrame({"symbol": ["A"], "iv": [1.0]}), pd.DataFrame({"symbol": ["A"], "expiry": ["x"], "iv": [1.0]})),
+    # not a table
+    ({"ratio": 1.0}, {"ratio": 2.0}),
+])
+def test_tables_without_a_usable_key_are_replaced(before, after):
+    change = Table(after).diff(Table(before))
+    assert change == {"replace": _records(after)}
+
+
+class Screener:
+    def __init__(self):
+        self.tables = {}
+
+
+@pytest.fixture
+def stream():
+    screener = Screener()
+    store = SnapshotStore({"scr": {"tables": lambda: dict(screener.tables)}})
+    feeds = {"feed": Feed("scr", "Feed", lambda snapshot: snapshot.view("scr", "tables"))}
+    touched = []
+    broadcaster = Broadcaster(feeds, store, queue_size=8, touch=touched.append)
+    store.on_publish(broadcaster.publish)
+
+    def publish(**tables):
+        screener.tables = tables
+        store.capture("scr")
+        store.publish()
+
+    return broadcaster, publish
+
+
+async def _next(subscriber):
+    return json.loads(await asyncio.wait_for(subscriber.queue.get(), 5))
+
+
+def test_diffs_applied_to_the_snapshot_give_the_new_snapshot(stream):
+    broadcaster, publish = stream
+    versions = [
+        {
+            "keyed": pd.DataFrame({"symbol": ["A", "B", "C"], "expiry": ["x", "x", "x"], "iv": [1.0, 2.0, 3.0]}),
+            "dupes": pd.DataFrame({"symbol": ["A", "A"], "iv": [1.0, 2.0]}),
+        },
+        {
+            "keyed": pd.DataFrame({"symbol": ["A", "C", "D"], "expiry": ["x", "x", "x"], "iv": [1.5, 3.0, 4.0]}),
+            "dupes": pd.DataFrame({"symbol": ["A", "A"], "iv": [1.0, 2.5]}),
+        },
+        {
+            # only the duplicate keyed table changes, and is sent whole
+            "keyed": pd.DataFrame({"symbol": ["A", "C", "D"], "expiry": ["x", "x", "x"], "iv": [1.5, 3.0, 4.0]}),
+            "dupes": pd.DataFrame({"symbol": ["B", "B", "B"], "iv": [0.0, 0.0, 0.0]}),
+        },
+        {
+            "keyed": pd.DataFrame({"symbol": [], "expiry": [], "iv": []}),
+            "dupes": pd.DataFrame({"symbol": ["B", "B", "B"], "iv": [0.0, 0.0, 0.0]}),
+        },
+    ]
+
+    async def main():
+        publish(**versions[0])
+        subscriber, frames = broadcaster.subscribe(["feed"], asyncio.get_running_loop())
+        snapshot = json.loads(frames[0])
+        assert snapshot["type"] == "snapshot"
+        data = snapshot["data"]
+        _same(data, {name: _records(table) for name, table in versions[0].items()})
+        try:
+            for version in versions[1:]:
+                publish(**version)
+                message = await _next(subscriber)
+                assert message["type"] == "diff" and message["feed"] == "feed"
+                data = _apply(data, message)
+                _same(data, {name: _records(table) for name, table in version.items()})
+            assert message["tables"] == {"keyed": {"replace": []}}
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    asyncio.run(main())
+    assert broadcaster.report()["subscribers"] == {}
+
+
+def test_a_full_queue_drops_the_subscriber(stream):
+    broadcaster, publish = stream
+    broadcaster.queue_size = 2
+
+    async def main():
+        publish(keyed=pd.DataFrame({"symbol": ["A"], "iv": [0.0]}))
+        subscriber, _ = broadcaster.subscribe(["feed"], asyncio.get_running_loop())
+        # never read: every version queues a diff
+        for iv in range(1, 6):
+            publish(keyed=pd.DataFrame({"symbol": ["A"], "iv": [float(iv)]}))
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if broadcaster.states["feed"].version == iv + 1:
+                    break
+        await asyncio.sleep(0.05)
+        assert subscriber.dropped
+        # the backlog is gone, only the last word is left
+        assert subscriber.queue.qsize() == 1
+        messages = [message async for message in broadcaster.listen(subscriber, heartbeat=5)]
+        assert messages == [DROPPED]
+        assert json.loads(DROPPED)["type"] == "dropped"
+        broadcaster.unsubscribe(subscriber)
+
+    asyncio.run(main())
+    assert broadcaster.report()["dropped"] == 1
@@ -0,0 +1,132 @@
+import threading
+
+import pytest
+
+from utils.dag import (
+    BLOCKED, BUSY, DEFERRED, FAILED, IDLE, OK, SUSPENDED, TIMEOUT, DagRunner, Stage,
+)
+
+
+class Screener:
+    """A stage computing from its inputs' last results, like the memory objects."""
+
+    def __init__(self, name, inputs=(), fail=False, gate=None):
+        self.name = name
+        self.inputs = inputs
+        self.fail = fail
+        # blocks the run until set
+        self.gate = gate
+        self.runs = 0
+        self.value = None
+        self.read = None
+
+    def update(self, screeners):
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.fail:
+            raise RuntimeError(f"{self.name} failed")
+        self.runs += 1
+        self.read = {name: screeners[name].value for name in self.inputs}
+        self.value = f"{self.name}#{self.runs}"
+
+
+def _runner(*screeners, **stage_options):
+    by_name = {screener.name: screener for screener in screeners}
+    return DagRunner([
+        Stage(
+            screener.name,
+            lambda screener=screener: screener.update(by_name),
+            inputs=screener.inputs,
+            **stage_options.get(screener.name, {}),
+        )
+        for screener in screeners
+    ])
+
+
+def test_all_ok_in_dependency_order():
+    source, derived = Screener("source"), Screener("derived", ("source",))
+    runner = _runner(source, derived)
+    assert runner.run(5) == {"source": OK, "derived": OK}
+    assert derived.read == {"source": "source#1"}
+
+
+def test_failed_input_blocks_its_dependents():
+    source = Screener("source", fail=True)
+    derived = Screener("derived", ("source",))
+    further = Screener("further", ("derived",))
+    other = Screener("other")
+    runner = _runner(source, derived, further, other)
+    assert runner.run(5) == {"source": FAILED, "derived": BLOCKED, "further": BLOCKED, "other": OK}
+    assert derived.runs == 0 and further.runs == 0
+    assert runner.stats["derived"].last_status == BLOCKED
+
+
+def test_timeout_blocks_dependents_and_busy_next_tick():
+    gate = threading.Event()
+    slow = Screener("slow", gate=gate)
+    derived = Screener("derived", ("slow",))
+    runner = _runner(slow, derived, slow={"timeout": 0.05})
+    try:
+        assert runner.run(5) == {"slow": TIMEOUT, "derived": BLOCKED}
+        # still running from the previous tick: busy, and blocks again
+        assert runner.run(5) == {"slow": BUSY, "derived": BLOCKED}
+    finally:
+        gate.set()
+    runner.wait_idle()
+    assert slow.runs == 1
+    assert runner.run(5) == {"slow": OK, "derived": OK}
+    assert derived.read == {"slow": "slow#2"}
+
+
+def test_tick_deadline_times_out_running_stages():
+    gate = threading.Event()
+    runner = _runner(Screener("slow", gate=gate))
+    try:
+        assert runner.run(0.05) == {"slow": TIMEOUT}
+    finally:
+        gate.set()
+        runner.wait_idle()
+
+
+@pytest.mark.parametrize("status", [IDLE, SUSPENDED, DEFERRED])
+def test_skipped_input_leaves_dependents_reading_its_last_result(status):
+    source, derived = Screener("source"), Screener("derived", ("source",))
+    runner = _runner(source, derived, source={"interval": 3600})
+    assert runner.run(5) == {"source": OK, "derived": OK}
+
+    if status == IDLE:
+        # not due for another hour
+        statuses = runner.run(5)
+    elif status == SUSPENDED:
+        runner.stages["source"].interval = 0
+        statuses = runner.run(5, active={"derived"})
+    else:
+        runner.stages["source"].interval = 0
+        statuses = runner.run(5, defer={"source"})
+
+    assert statuses == {"source": status, "derived": OK}
+    assert source.runs == 1
+    assert derived.runs == 2
+    assert derived.read == {"source": "source#1"}
+    assert runner.stats["source"].counts[status] == 1
+
+
+def test_runnable_leaves_out_skipped_and_busy_stages():
+    gate = threading.Event()
+    slow = Screener("slow", gate=gate)
+    runner = _runner(slow, Screener("hourly"), Screener("other"), slow={"timeout": 0.05}, hourly={"interval": 3600})
+    try:
+        runner.run(5)
+        assert runner.runnable() == {"other"}
+        assert runner.runnable(defer={"other"}) == set()
+    finally:
+        gate.set()
+        runner.wait_idle()
+    assert runner.runnable(active={"slow", "hourly"}) == {"slow"}
+
+
+def test_cycles_and_unknown_inputs_are_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        _runner(Screener("a", ("b",)), Screener("b", ("a",)))
+    with pytest.raises(ValueError, match="unknown"):
+        _runner(Screener("a", ("missing",)))
@@ -0,0 +1,75 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stub.market import SyntheticMarket, load_symbols, universe
+from stub.server import DEFAULT_SYMBOLS_FILE
+from utils.decode import ATM_IV_FLOAT_COLUMNS, atm_iv_frame, loads, normalize
+
+
+@pytest.fixture(scope="module")
+def market():
+    market = SyntheticMarket(universe(load_symbols(DEFAULT_SYMBOLS_FILE), 60), seed=3)
+    market.step()
+    return market
+
+
+def _wire(payload):
+    """As fetched: encoded by upstream, decoded by utils.decode.loads."""
+    return loads(json.dumps(payload).encode())
+
+
+def _baseline_atm_iv(rows):
+    # the DataFrame -> explode -> apply -> astype path atm_iv_frame replaced
+    df = pd.DataFrame(rows)
+    df = df.drop(columns=["pk", "atm_iv_pk", "errors"])
+    df = df.explode(["expiry", "atm_strike", "type", "delta", "ltp", "atm_iv", "iv_stats", "percent_change", "ivp"])
+    df["pct_change"] = df["percent_change"].apply(lambda x: x["fut"])
+    df["delta"] = df["delta"].astype(float)
+    df["atm_iv"] = df["atm_iv"].astype(float)
+    df["ltp"] = df["ltp"].astype(float)
+    return df
+
+
+def test_loads_matches_json(market):
+    for payload in (market.atm_iv(market.symbols()), market.skew(market.symbols()), market.token_set(market.symbols())):
+        body = json.dumps({"data": payload}).encode()
+        assert loads(body) == json.loads(body)
+
+
+def test_atm_iv_frame_matches_the_baseline(market):
+    rows = _wire(market.atm_iv(market.symbols()))
+    frame = atm_iv_frame(rows)
+    expected = _baseline_atm_iv(rows)
+    assert list(frame.columns) == list(expected.columns)
+    # the other numeric columns come out typed too, the baseline left them as objects
+    for column in ATM_IV_FLOAT_COLUMNS:
+        expected[column] = expected[column].astype(float)
+    pd.testing.assert_frame_equal(frame, expected, check_dtype=False)
+    assert all(frame[column].dtype == np.float64 for column in ATM_IV_FLOAT_COLUMNS | {"pct_change"})
+
+
+def test_atm_iv_frame_empty():
+    assert atm_iv_frame([]).empty
+
+
+@pytest.mark.parametrize("record_path, meta", [
+    (["markers", "pe_data"], [["symbol"], ["markers", "expiry"]]),
+    (["markers", "ce_data"], [["symbol"], ["markers", "expiry"]]),
+])
+def test_normalize_matches_json_normalize_on_the_chain(market, record_path, meta):
+    data = _wire(market.token_set(market.symbols()))
+    expected = pd.json_normalize(data, record_path=record_path, meta=meta)
+    pd.testing.assert_frame_equal(normalize(data, record_path, meta), expected)
+
+
+def test_normalize_matches_json_normalize_on_the_skew(market):
+    data = _wire(market.skew(market.symbols()))
+    expected = pd.json_normalize(data, "individual", ["symbol"])
+    pd.testing.assert_frame_equal(normalize(data, ["individual"], [["symbol"]]), expected)
+
+
+def test_normalize_empty():
+    assert normalize([], ["individual"], [["symbol"]]).empty
@@ -0,0 +1,101 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import memory.skew_benchmark as skew_benchmark_module
+from contants.dates import EXPIRY
+from memory.skew import memory_skew
+from memory.skew_benchmark import memory_skew_benchmark
+from memory.vol import memory_vol
+from router import events
+from router.screener import router
+
+
+def _benchmarks():
+    return pd.DataFrame({
+        "symbol": ["INFY", "TCS"],
+        "ppf": [1.0, 2.0],
+        "pcf": [1.0, 2.0],
+        "ccb": [1.0, 2.0],
+        "4l_f": [1.0, 2.0],
+    })
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    # benchmark edits are saved to the asset files
+    monkeypatch.setattr(skew_benchmark_module, "ASSET_DIR", str(tmp_path))
+    dump = pd.DataFrame({
+        "symbol": ["INFY", "TCS", "INFY", "TCS"],
+        "expiry": [EXPIRY[0], EXPIRY[0], EXPIRY[1], EXPIRY[1]],
+        "pe_pe.skew": [0.1, 0.2, 0.3, 0.4],
+        "pe_ce.skew": [0.1, 0.2, 0.3, 0.4],
+        "ce_ce.skew": [0.1, 0.2, 0.3, 0.4],
+        "four_leg.skew": [0.1, 0.2, 0.3, 0.4],
+    })
+    monkeypatch.setattr(memory_skew, "get_dump", lambda: dump)
+    memory_skew_benchmark.expiry_1 = _benchmarks()
+    memory_skew_benchmark.expiry_2 = _benchmarks()
+    events.edit("skew_benchmark", memory_skew_benchmark.update)
+
+    return _client()
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def _expiry(index: int) -> str:
+    return date.fromisoformat(EXPIRY[index]).strftime("%a %b %d %Y")
+
+
+def test_get_serves_the_edited_skew_benchmark(client):
+    before = client.get("/screener/skew-benchamrk")
+    assert before.status_code == 200
+    infy = next(row for row in before.json()["data"]["expiry_1"] if row["symbol"] == "INFY")
+    assert infy["ppf"] == 1.0
+
+    posted = client.post("/screener/skew-update", json={
+        "expiry": _expiry(0), "ticker": "INFY", "ppf": 5.5, "pcf": None, "ccb": None, "fourL_F": None,
+    })
+    assert posted.status_code == 200
+
+    # no tick in between
+    after = client.get("/screener/skew-benchamrk", headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != before.headers["ETag"]
+    rows = {row["symbol"]: row for row in after.json()["data"]["expiry_1"]}
+    assert rows["INFY"]["ppf"] == 5.5
+    assert rows["TCS"]["ppf"] == 2.0
+
+
+def test_vol_benchmark_edit_is_published():
+    frame = pd.DataFrame({
+        "symbol": ["INFY", "TCS"],
+        "forward_vol": [20.0, 30.0],
+        "vol_benchmark": [20.0, 30.0],
+        "vol_threshold_percentage": [0.1, 0.1],
+        "vol_threshold_val": [2.0, 3.0],
+    })
+    memory_vol.expiry_1 = frame.copy()
+    memory_vol.expiry_1_with_atm = frame.copy()
+    memory_vol.expiry_2 = frame.copy()
+    memory_vol.expiry_2_with_atm = frame.copy()
+    memory_vol.expiry_1_up_display_df = memory_vol.expiry_1_down_display_df = pd.DataFrame()
+    memory_vol.expiry_2_up_display_df = memory_vol.expiry_2_down_display_df = pd.DataFrame()
+
+    posted = _client().post("/screener/vol-update", json={
+        "expiry": _expiry(0), "ticker": "TCS", "benchmark": 25.0, "change": 20.0,
+    })
+    assert posted.status_code == 200
+
+    expiry_1, _ = events.snapshots.current.view("vol", "with_atm")
+    tcs = expiry_1.set_index("symbol").loc["TCS"]
+    assert tcs["vol_benchmark"] == 25.0
+    assert tcs["vol_threshold_percentage"] == pytest.approx(0.2)
+    assert tcs["vol_threshold_val"] == pytest.approx(5.0)
@@ -0,0 +1,138 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from memory.correlation import memory_correlation
+from router import events
+from router.screener import _filtered_correlation, _filtered_vol, router
+from utils.filters import FilterError, compile_filter
+from utils.paging import PageError, apply, parse
+from utils.snapshot import ScreenerOutput, Snapshot
+
+
+@pytest.mark.parametrize("text", [
+    "-" * 1500 + "atm_iv > 0",
+    "not " * 400 + "atm_iv > 0",
+    " + ".join(["atm_iv"] * 600) + " > 0",
+])
+def test_deeply_nested_filter_is_rejected(text):
+    with pytest.raises(FilterError):
+        compile_filter(text)
+
+
+def test_deeply_nested_filter_is_a_page_error():
+    frame = pd.DataFrame({"atm_iv": [10.0, 20.0]})
+    with pytest.raises(PageError):
+        apply(frame, parse(None, 0, None, None, "-" * 1500 + "atm_iv > 0"))
+
+
+def test_nested_filter_within_limit():
+    frame = pd.DataFrame({"atm_iv": [10.0, 20.0]})
+    where = compile_filter("-" * 20 + "atm_iv > 0")
+    assert where.mask(frame).tolist() == [True, True]
+
+
+def _frame():
+    return pd.DataFrame({
+        "symbol": ["INFY", "TCS", "SBIN", "ITC", "HDFC"],
+        "ivp": [70.0, 50.0, 65.0, np.nan, 90.0],
+        "atm_iv": [20.0, 25.0, 30.0, 35.0, 40.0],
+        "vol_up_benchmark": [18.0, 26.0, 30.0, np.nan, 41.0],
+        "vol_down_benchmark": [22.0, 24.0, 29.0, 36.0, np.nan],
+        "params.delta": [0.1, 0.3, 0.5, 0.7, 0.9],
+        "4l_f": [1.0, None, 3.0, None, 5.0],
+        "percent_change": [{"fut": 1.0}, {"fut": -2.0}, {"fut": 0.5}, {}, None],
+    })
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("ivp > 60", lambda f: f["ivp"] > 60),
+    ("60 < ivp <= 90", lambda f: (f["ivp"] > 60) & (f["ivp"] <= 90)),
+    ("20 <= atm_iv < 35 != ivp", lambda f: (f["atm_iv"] >= 20) & (f["atm_iv"] < 35) & (f["atm_iv"] != f["ivp"])),
+    ('symbol in ["INFY", "TCS"]', lambda f: f["symbol"].isin(["INFY", "TCS"])),
+    ('symbol not in ("INFY", "TCS")', lambda f: ~f["symbol"].isin(["INFY", "TCS"])),
+    ("atm_iv - ivp / 10 > -20", lambda f: f["atm_iv"] - f["ivp"] / 10 > -20),
+    ("not (ivp > 60) or atm_iv * 2 >= 80", lambda f: ~(f["ivp"] > 60) | (f["atm_iv"] * 2 >= 80)),
+    ("params.delta >= 0.5", lambda f: f["params.delta"] >= 0.5),
+    ("`4l_f` == None", lambda f: f["4l_f"].isna()),
+    ("`4l_f` != None and `4l_f` > 2", lambda f: f["4l_f"].notna() & (f["4l_f"] > 2)),
+    ("percent_change.fut < 1", lambda f: f["percent_change"].map(lambda c: (c or {}).get("fut")).astype(float) < 1),
+])
+def test_mask_matches_pandas(text, expected):
+    frame = _frame()
+    assert compile_filter(text).mask(frame).tolist() == expected(frame).tolist()
+
+
+def test_columns_read():
+    where = compile_filter("`4l_f` > 1 and percent_change.fut < 0 or params.delta == 0.5")
+    assert where.columns == {"4l_f", "percent_change.fut", "params.delta"}
+    assert where.missing(_frame().columns) == set()
+    assert where.missing(["4l_f"]) == {"percent_change.fut", "params.delta"}
+
+
+@pytest.mark.parametrize("text", [
+    "len(symbol) > 3",
+    "__import__('os')",
+    "symbol[0] == 'I'",
+    "(ivp + 1).real > 3",
+    "'INFY'.lower == symbol",
+    "[x for x in ivp]",
+    "lambda: 1",
+    "ivp if atm_iv else 1",
+    "ivp ** 2 > 1",
+    "symbol in ivp",
+    "symbol in [atm_iv]",
+    "ivp is None",
+    "ivp >",
+    "",
+])
+def test_rejected(text):
+    with pytest.raises(FilterError):
+        compile_filter(text)
+
+
+def test_unknown_column_is_a_page_error():
+    with pytest.raises(PageError, match="nope"):
+        apply({"expiry_1": _frame()}, parse(None, 0, None, None, "nope > 1"))
+
+
+def test_unknown_column_is_a_400():
+    def change():
+        frame = pd.DataFrame({"symbol": ["INFY", "TCS"], "ratio": [1.0, 2.0], "avg_ratio": [1.5, 1.5]})
+        memory_correlation.expiry_1_with_atm = frame
+        memory_correlation.expiry_2_with_atm = frame
+
+    events.edit("correlation", change)
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    assert client.get("/screener/correlation", params={"filter": "ratio > 1"}).status_code == 200
+    response = client.get("/screener/correlation", params={"filter": "nope > 1"})
+    assert response.status_code == 400
+    assert "nope" in response.json()["detail"]
+    assert client.get("/screener/correlation", params={"filter": "len(symbol) > 1"}).status_code == 400
+
+
+def _snapshot(screener, view, frames):
+    return Snapshot(1, datetime.now(), {screener: ScreenerOutput(1, None, None, {view: frames})})
+
+
+def test_filtered_vol_matches_the_baseline_masks():
+    expiry_1, expiry_2 = _frame(), _frame().iloc[::-1].reset_index(drop=True)
+    data = _filtered_vol(_snapshot("vol", "with_atm", (expiry_1, expiry_2)))
+    pd.testing.assert_frame_equal(data["expiry1_up"], expiry_1[expiry_1["atm_iv"] >= expiry_1["vol_up_benchmark"]])
+    pd.testing.assert_frame_equal(data["expiry1_down"], expiry_1[expiry_1["atm_iv"] <= expiry_1["vol_down_benchmark"]])
+    pd.testing.assert_frame_equal(data["expiry2_up"], expiry_2[expiry_2["atm_iv"] >= expiry_2["vol_up_benchmark"]])
+    pd.testing.assert_frame_equal(data["expiry2_down"], expiry_2[expiry_2["atm_iv"] <= expiry_2["vol_down_benchmark"]])
+
+
+def test_filtered_correlation_matches_the_baseline_masks():
+    expiry_1 = pd.DataFrame({"stock_1": ["A", "B", "C", "D"], "ratio": [1.0, 2.0, np.nan, 4.0], "avg_ratio": [1.5, 1.5, 1.0, np.nan]})
+    expiry_2 = pd.DataFrame({"stock_1": ["E", "F"], "ratio": [3.0, 1.0], "avg_ratio": [2.0, 1.0]})
+    data = _filtered_correlation(_snapshot("correlation", "with_atm", (expiry_1, expiry_2)))
+    pd.testing.assert_frame_equal(data["expiry1"], expiry_1[expiry_1["ratio"] > expiry_1["avg_ratio"]])
+    pd.testing.assert_frame_equal(data["expiry2"], expiry_2[expiry_2["ratio"] > expiry_2["avg_ratio"]])
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from utils.offload import CpuPool, _run_shared, _share
+
+
+def _double(arrays, factor=2):
+    return {"out": arrays["x"] * factor}
+
+
+def _fails(arrays):
+    x = arrays["x"]
+    raise ValueError(f"kernel failed on {len(x)} rows")
+
+
+def test_run_shared_raises_the_kernel_error():
+    block, spec = _share({"x": np.arange(5, dtype=np.float64)})
+    try:
+        with pytest.raises(ValueError, match="kernel failed on 5 rows") as raised:
+            _run_shared(_fails, spec, {})
+        # not masked by a BufferError from closing the block under live views
+        assert raised.value.__context__ is None
+    finally:
+        block.close()
+        block.unlink()
+
+
+def test_pool_raises_the_kernel_error():
+    pool = CpuPool(1)
+    try:
+        with pytest.raises(ValueError, match="kernel failed"):
+            pool.run(_fails, {"x": np.arange(5, dtype=np.float64)})
+        # the pool survives a failing kernel
+        result = pool.run(_double, {"x": np.arange(3, dtype=np.float64)}, factor=3)
+        assert result["out"].tolist() == [0.0, 3.0, 6.0]
+    finally:
+        pool.shutdown()
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.paging import Page, PageError, apply, parse
+
+
+def _frame():
+    return pd.DataFrame({
+        "symbol": ["INFY", "TCS", "SBIN", "ITC", "HDFC", "WIPRO"],
+        "ivp": [70.0, 50.0, 65.0, np.nan, 90.0, 50.0],
+        "atm_iv": [20.0, 25.0, 30.0, 35.0, 40.0, 45.0],
+        "PPF": [{"a": 1}, {"a": 2}, {"a": 3}, {"a": 4}, {"a": 5}, {"a": 6}],
+    }, index=[10, 11, 12, 13, 14, 15])
+
+
+def test_parse():
+    page = parse(5, 2, " symbol, ivp ,,symbol", "-ivp, symbol,,-", None)
+    assert page == Page(5, 2, ("symbol", "ivp"), (("ivp", True), ("symbol", False)), "")
+    assert not page.everything
+    assert parse(None, 0, None, None).everything
+    assert parse(None, 0, None, None, "ivp > 1").key() != parse(None, 0, None, None).key()
+
+
+def test_limit_and_offset_keep_the_screener_order():
+    frame = _frame()
+    pd.testing.assert_frame_equal(apply(frame, parse(2, 0, None, None)), frame.iloc[:2])
+    pd.testing.assert_frame_equal(apply(frame, parse(2, 3, None, None)), frame.iloc[3:5])
+    pd.testing.assert_frame_equal(apply(frame, parse(None, 4, None, None)), frame.iloc[4:])
+    assert apply(frame, parse(0, 0, None, None)).empty
+    assert apply(frame, parse(3, 10, None, None)).empty
+
+
+def test_fields():
+    frame = _frame()
+    pd.testing.assert_frame_equal(apply(frame, parse(None, 0, "atm_iv,symbol", None)), frame[["atm_iv", "symbol"]])
+
+
+@pytest.mark.parametrize("sort", ["ivp", "-ivp", "-ivp,symbol", "ivp,-atm_iv", "symbol"])
+def test_sort_matches_pandas(sort):
+    frame = _frame()
+    page = parse(4, 1, None, sort)
+    columns = [column.lstrip("-") for column in sort.split(",")]
+    ascending = [not column.startswith("-") for column in sort.split(",")]
+    expected = frame.sort_values(columns, ascending=ascending, kind="stable", na_position="last").iloc[1:5]
+    pd.testing.assert_frame_equal(apply(frame, page), expected)
+
+
+def test_tables_of_a_payload_are_paged_alike():
+    frame = _frame()
+    records = frame.drop(columns="PPF").to_dict(orient="records")
+    payload = {"expiry_1": frame, "expiry_2": records, "note": "kept"}
+    paged = apply(payload, parse(2, 0, "symbol,ivp", "-ivp"))
+    assert paged["expiry_1"]["symbol"].tolist() == ["HDFC", "INFY"]
+    assert paged["expiry_2"] == [{"symbol": "HDFC", "ivp": 90.0}, {"symbol": "INFY", "ivp": 70.0}]
+    assert paged["note"] == "kept"
+
+
+def test_records_sort_missing_last():
+    rows = [
+        {"symbol": "A", "ivp": None}, {"symbol": "B", "ivp": 2.0}, {"symbol": "N", "ivp": float("nan")},
+        {"symbol": "C", "ivp": 3.0}, {"symbol": "D"},
+    ]
+    assert [row["symbol"] for row in apply(rows, parse(None, 0, None, "-ivp"))] == ["C", "B", "A", "N", "D"]
+    assert [row["symbol"] for row in apply(rows, parse(None, 0, None, "ivp"))] == ["B", "C", "A", "N", "D"]
+
+
+def test_filter_then_sort_then_window():
+    frame = _frame()
+    paged = apply(frame, parse(2, 0, "symbol", "-atm_iv", "ivp >= 50"))
+    assert paged["symbol"].tolist() == ["WIPRO", "HDFC"]
+
+
+@pytest.mark.parametrize("fields, sort", [("symbol,nope", None), (None, "-nope"), ("symbol", "symbol,nope")])
+def test_unknown_columns_are_rejected(fields, sort):
+    with pytest.raises(PageError, match="nope"):
+        apply({"expiry_1": _frame()}, parse(None, 0, fields, sort))
+
+
+def test_a_column_of_any_table_is_known():
+    payload = {"expiry_1": _frame(), "expiry_2": pd.DataFrame({"other": [1, 2]})}
+    paged = apply(payload, parse(None, 0, None, "-other"))
+    assert paged["expiry_2"]["other"].tolist() == [2, 1]
+    # sorted only where the column exists
+    pd.testing.assert_frame_equal(paged["expiry_1"], payload["expiry_1"])
+
+
+def test_sorting_dict_cells_is_rejected():
+    with pytest.raises(PageError, match="Cannot sort"):
+        apply(_frame(), parse(None, 0, None, "PPF"))
+    rows = _frame().to_dict(orient="records")
+    with pytest.raises(PageError, match="Cannot sort"):
+        apply(rows, parse(None, 0, None, "PPF"))
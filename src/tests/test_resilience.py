@@ -0,0 +1,207 @@
+import asyncio
+from datetime import datetime, timedelta
+import random
+import threading
+import time
+
+import httpx
+import pytest
+
+import utils.api as api
+import utils.resilience as resilience
+from config.manager import settings
+from utils.clock import ManualClock
+from utils.resilience import CircuitBreaker, CircuitOpen, backoff_delay, hedged, hedged_async
+
+
+class ManualTime:
+    """Stands in for the `time` module, on a ManualClock."""
+
+    def __init__(self):
+        self.clock = ManualClock(datetime(2025, 6, 2, 9, 15))
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.clock().timestamp()
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.clock.set(self.clock() + timedelta(seconds=seconds))
+
+
+@pytest.fixture
+def manual_time(monkeypatch):
+    manual = ManualTime()
+    monkeypatch.setattr(resilience, "time", manual)
+    monkeypatch.setattr(api, "time", manual)
+    return manual
+
+
+def test_breaker_opens_after_threshold_failures(manual_time):
+    breaker = CircuitBreaker("ATM_IV", threshold=3, cooldown=10)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    assert breaker.snapshot() == {"state": "open", "consecutive_failures": 3}
+
+
+def test_breaker_success_resets_the_count(manual_time):
+    breaker = CircuitBreaker("ATM_IV", threshold=2, cooldown=10)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_breaker_half_open_lets_one_trial_through(manual_time):
+    breaker = CircuitBreaker("ATM_IV", threshold=1, cooldown=10)
+    breaker.record_failure()
+    manual_time.sleep(9.9)
+    assert breaker.state == "open"
+    manual_time.sleep(0.1)
+    assert breaker.state == "half-open"
+
+    breaker.before_call()
+    # only one trial at a time
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    # a failed trial opens it again for a full cooldown
+    breaker.record_failure()
+    assert breaker.state == "open"
+    manual_time.sleep(10)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.snapshot() == {"state": "closed", "consecutive_failures": 0}
+    breaker.before_call()
+
+
+def test_hedged_disabled_calls_once():
+    calls = []
+    assert hedged(lambda: calls.append(1) or "ok", 0) == "ok"
+    assert calls == [1]
+
+
+def test_hedged_second_copy_wins():
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) == 1:
+            # the first copy hangs until the test is done
+            release.wait(5)
+            return "slow"
+        return "fast"
+
+    try:
+        assert hedged(call, 0.05) == "fast"
+        assert len(calls) == 2
+    finally:
+        release.set()
+
+
+def test_hedged_raises_once_both_copies_failed():
+    def call():
+        time.sleep(0.1)
+        raise httpx.ConnectError("down")
+
+    with pytest.raises(httpx.ConnectError):
+        hedged(call, 0.01)
+
+
+def test_hedged_async_cancels_the_loser():
+    cancelled = []
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+            return "slow"
+        return "fast"
+
+    async def main():
+        result = await hedged_async(call, 0.01)
+        # let the cancellation land
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == "fast"
+    assert cancelled == [1]
+
+
+def test_hedged_async_no_second_copy_when_fast():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return "ok"
+
+    assert asyncio.run(hedged_async(call, 1)) == "ok"
+    assert calls == [1]
+
+
+def test_backoff_delay_is_capped_full_jitter():
+    random.seed(7)
+    for attempt in range(10):
+        delay = backoff_delay(attempt, 0.2, 2.0)
+        assert 0 <= delay <= min(2.0, 0.2 * 2 ** attempt)
+
+
+@pytest.fixture
+def failing_upstream(monkeypatch, manual_time):
+    calls = []
+
+    def send(method, endpoint, key, timeout, **kwargs):
+        calls.append(manual_time.monotonic())
+        raise httpx.ConnectError("down")
+
+    monkeypatch.setattr(api, "_send", send)
+    monkeypatch.setattr(api, "backoff_delay", lambda attempt, base, cap: 2.0)
+    monkeypatch.setitem(api.UPSTREAM_POLICY, "ATM_IV", {"timeout": 1.0, "hedge_after": 0})
+    monkeypatch.setattr(settings, "UPSTREAM_RETRIES", 10)
+    monkeypatch.setattr(settings, "TICK_DEADLINE", 5.0)
+    return calls
+
+
+def test_retries_stop_at_the_tick_deadline(failing_upstream, manual_time):
+    with pytest.raises(httpx.ConnectError):
+        api._send_with_retries("GET", "atm_iv", "ATM_IV")
+    # at 0s and 2s; a third retry would land at 6s, past the 5s deadline
+    assert len(failing_upstream) == 3
+    assert manual_time.sleeps == [2.0, 2.0]
+
+
+def test_retries_stop_at_the_retry_limit(failing_upstream, manual_time, monkeypatch):
+    monkeypatch.setattr(settings, "UPSTREAM_RETRIES", 1)
+    monkeypatch.setattr(settings, "TICK_DEADLINE", 60.0)
+    with pytest.raises(httpx.ConnectError):
+        api._send_with_retries("GET", "atm_iv", "ATM_IV")
+    assert len(failing_upstream) == 2
+
+
+def test_client_errors_are_not_retried(monkeypatch, manual_time):
+    calls = []
+
+    def send(method, endpoint, key, timeout, **kwargs):
+        calls.append(1)
+        request = httpx.Request("GET", "http://upstream/atm_iv")
+        raise httpx.HTTPStatusError("bad", request=request, response=httpx.Response(400, request=request))
+
+    monkeypatch.setattr(api, "_send", send)
+    monkeypatch.setitem(api.UPSTREAM_POLICY, "ATM_IV", {"timeout": 1.0, "hedge_after": 0})
+    with pytest.raises(httpx.HTTPStatusError):
+        api._send_with_retries("GET", "atm_iv", "ATM_IV")
+    assert calls == [1]
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone
+
+from utils.response_cache import ResponseCache, validators
+
+HELD = datetime(2025, 6, 2, 10, 15, 30, 200000, tzinfo=timezone.utc)
+
+
+def test_if_none_match_hit():
+    current = validators("abc", HELD)
+    response = ResponseCache().revalidate({"if-none-match": '"abc"'}, current, HELD)
+    assert response is not None
+    assert response.status_code == 304
+    assert response.headers["ETag"] == 'W/"abc"'
+
+
+def test_if_none_match_miss():
+    current = validators("def", HELD)
+    # If-None-Match wins over a matching If-Modified-Since
+    headers = {"if-none-match": 'W/"abc"', "if-modified-since": current["Last-Modified"]}
+    assert ResponseCache().revalidate(headers, current, HELD) is None
+
+
+def test_if_modified_since_newer_version_in_the_same_second():
+    held = validators("abc", HELD)
+    newer = HELD + timedelta(milliseconds=500)
+    current = validators("def", newer)
+    # both versions carry the same whole second as Last-Modified
+    assert current["Last-Modified"] == held["Last-Modified"]
+    assert ResponseCache().revalidate({"if-modified-since": held["Last-Modified"]}, current, newer) is None
+
+
+def test_if_modified_since_unchanged():
+    current = validators("abc", HELD)
+    later = "Mon, 02 Jun 2025 10:15:31 GMT"
+    response = ResponseCache().revalidate({"if-modified-since": later}, current, HELD)
+    assert response is not None and response.status_code == 304
+    assert ResponseCache().revalidate({"if-modified-since": "not a date"}, current, HELD) is None
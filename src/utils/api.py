@@ -1,14 +1,18 @@
+import asyncio
 from dataclasses import dataclass
+import threading
+import time
+import hashlib
 import json
-import sys
-from typing import List, Literal, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional, Tuple
 from contextlib import contextmanager
 import httpx
-import requests
 import logging
-from cachetools import cached, TTLCache
 from config.manager import settings
 from .authentication import get_creds, Credentials
+from .decode import loads
+from .journal import recorder, player
+from .resilience import CircuitBreaker, backoff_delay, hedged, hedged_async
 
 BACKEND_URL = settings.BACKEND_URL
 API_ENDPOINT = {
@@ -18,17 +22,115 @@ API_ENDPOINT = {
     "Z_SCORE": "z-score",
 }
 
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+# used by the async tick on the event loop, the sync client by everything else
+_async_client: Optional[httpx.AsyncClient] = None
 
-def raise_for_status(response: httpx.Response | requests.Response):
+
+class _NotModified:
+    def __repr__(self):
+        return "NOT_MODIFIED"
+
+
+# Returned by the fetchers when upstream answers 304, callers keep their state
+NOT_MODIFIED = _NotModified()
+
+# Last ETag / sequence seen per endpoint for the incremental polling protocol
+_watermarks: Dict[str, Dict[str, Optional[str]]] = {}
+
+# read timeout and hedging delay per upstream source, in seconds
+UPSTREAM_POLICY = {
+    "ATM_IV": {"timeout": settings.ATM_IV_TIMEOUT, "hedge_after": settings.ATM_IV_HEDGE_AFTER},
+    "SKEW": {"timeout": settings.SKEW_TIMEOUT, "hedge_after": settings.SKEW_HEDGE_AFTER},
+    "TOKEN_SET": {"timeout": settings.TOKEN_SET_TIMEOUT, "hedge_after": settings.TOKEN_SET_HEDGE_AFTER},
+}
+
+_breakers: Dict[str, CircuitBreaker] = {
+    name: CircuitBreaker(name, settings.BREAKER_THRESHOLD, settings.BREAKER_COOLDOWN)
+    for name in UPSTREAM_POLICY
+}
+
+# monotonic time of the last good answer (data or 304) per source
+_last_success: Dict[str, float] = {}
+
+_MISSING = object()
+
+# answers the async tick fetched ahead of its stages, per request key; the
+# next fetcher call for the key takes its answer from here
+_inbox: Dict[str, Any] = {}
+_inbox_lock = threading.Lock()
+
+
+def raise_for_status(response: httpx.Response):
     try:
         response.raise_for_status()
-    except (httpx.HTTPStatusError, requests.HTTPError) as e:
+    except httpx.HTTPStatusError as e:
         logging.exception(
             "HTTP error occurred: %r with response body: %r", e, response.text
         )
         raise
 
 
+def _client_options() -> Dict[str, Any]:
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        settings.HTTP_READ_TIMEOUT,
+        connect=settings.HTTP_CONNECT_TIMEOUT,
+        pool=settings.HTTP_POOL_TIMEOUT,
+    )
+    return {"base_url": BACKEND_URL, "limits": limits, "timeout": timeout}
+
+
+def _build_client(client_class=httpx.Client):
+    try:
+        return client_class(http2=settings.HTTP2_ENABLED, **_client_options())
+    except ImportError:
+        # http2 needs the optional `h2` package
+        logging.warning("HTTP/2 requested but h2 is not installed, using HTTP/1.1")
+        return client_class(**_client_options())
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Process wide keep-alive client shared by the scheduler jobs and the admin
+    login path. Created lazily on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_client()
+    return _client
+
+
+def close_http_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Keep-alive client of the async tick, only used on the event loop."""
+    global _async_client
+    if _async_client is None:
+        _async_client = _build_client(httpx.AsyncClient)
+    return _async_client
+
+
+async def close_async_http_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
 @dataclass
 class DeltaRange:
     pe: List[str]
@@ -40,65 +142,360 @@ class sym_strike:
     sym: {DeltaRange}
 
 
-@cached(TTLCache(maxsize=1, ttl=settings.RT_VALIDITY))
-def login():
-    creds = get_creds()
-    try:
-        response = login_inner(creds)
-        return response.json()["data"]
-    except requests.RequestException as error:
-        logging.error("Error during login: %s", error)
-        sys.exit(1)
-
-
 def login_inner(creds: "Credentials"):
-    endpoint = f"{BACKEND_URL}/auth/login"
+    endpoint = "/auth/login"
     payload = {"username": creds.username, "password": creds.password}
-    response = requests.post(endpoint, json=payload)
+    response = get_http_client().post(endpoint, json=payload)
     raise_for_status(response)
     return response
 
 
-@cached(TTLCache(maxsize=1, ttl=settings.AT_VALIDITY))
-def get_auth_token():
+class TokenUnavailable(httpx.RequestError):
+    """Raised when no access token could be obtained yet."""
 
-    res = login()
-    endpoint = f"{BACKEND_URL}/auth/refresh"
-    payload = {"refresh_token": res["refresh_token"]}
-    try:
-        response = requests.post(endpoint, json=payload)
+    pass
+
+
+class TokenManager:
+    """
+    Keeps an access token fresh from a background thread, refreshing it
+    TOKEN_REFRESH_MARGIN seconds before it lapses and logging in again when
+    the refresh token is close to expiry or rejected. Readers only load an
+    attribute, they never wait on a refresh once the first token exists.
+    Failures are retried with capped exponential backoff while the last
+    token keeps being served.
+    """
+
+    def __init__(self):
+        self.access_token: Optional[str] = None
+        self.refresh_token: Optional[str] = None
+        self.access_expires_at: float = 0.0
+        self.refresh_expires_at: float = 0.0
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def token(self) -> str:
+        token = self.access_token
+        if token is None:
+            # only the very first caller(s) block, before the thread has run
+            self.refresh()
+            token = self.access_token
+            if token is None:
+                raise TokenUnavailable("No access token available")
+        return token
+
+    def _login(self) -> None:
+        creds = get_creds()
+        data = login_inner(creds).json()["data"]
+        self.refresh_token = data["refresh_token"]
+        self.refresh_expires_at = time.monotonic() + settings.RT_VALIDITY
+
+    def _refresh_access(self) -> None:
+        response = get_http_client().post("/auth/refresh", json={"refresh_token": self.refresh_token})
         raise_for_status(response)
-        res = response.json()
-    except requests.RequestException as error:
-        login.cache.clear()
-        logging.warning("Error during token refresh: %s", error)
-        return get_auth_token()
+        self.access_token = response.json()["data"]["access_token"]
+        self.access_expires_at = time.monotonic() + settings.AT_VALIDITY
+
+    def refresh(self) -> bool:
+        with self.lock:
+            try:
+                margin = settings.TOKEN_REFRESH_MARGIN
+                if self.refresh_token is None or time.monotonic() >= self.refresh_expires_at - margin:
+                    self._login()
+                try:
+                    self._refresh_access()
+                except httpx.HTTPStatusError:
+                    # refresh token rejected, start over from credentials
+                    self._login()
+                    self._refresh_access()
+                return True
+            except (httpx.HTTPError, OSError, KeyError, ValueError) as error:
+                logging.warning("Token refresh failed: %s", error)
+                return False
+
+    def invalidate(self) -> None:
+        """Drop the refresh token (e.g. new credentials) and refresh now."""
+        self.refresh_token = None
+        self.wakeup.set()
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self.stopped.is_set():
+            if self.access_token is not None and self.refresh_token is not None:
+                wait = self.access_expires_at - settings.TOKEN_REFRESH_MARGIN - time.monotonic()
+                if wait > 0:
+                    # woken early by invalidate() or stop(), re-evaluate
+                    self.wakeup.wait(wait)
+                    self.wakeup.clear()
+                    continue
+            if self.refresh():
+                backoff = 1.0
+            else:
+                self.stopped.wait(backoff)
+                backoff = min(backoff * 2, settings.TOKEN_MAX_BACKOFF)
 
-    return res["data"]["access_token"]
+    def start(self) -> None:
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name="token-manager", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.wakeup.set()
+
+
+token_manager = TokenManager()
+
+
+def get_auth_token():
+    return token_manager.token()
+
+
+def get_auth_headers():
+    return {"Authorization": f"Bearer {get_auth_token()}"}
 
 
 @contextmanager
 def get_session():
-    authorization = f"Bearer {get_auth_token()}"
-    with httpx.Client(
-        base_url=BACKEND_URL, headers={"Authorization": authorization}
-    ) as session:
-        yield session
+    """
+    Yields the shared client. Requests made through it must pass
+    `headers=get_auth_headers()`, the client itself carries no credentials.
+    """
+    yield get_http_client()
 
 
 @contextmanager
 def get_unauthenticated_session():
-    with httpx.Client(base_url=BACKEND_URL) as session:
-        yield session
+    yield get_http_client()
+
+
+def reset_watermark(key: Optional[str] = None):
+    """Forget the stored ETag/sequence so the next poll is a full download."""
+    if key is None:
+        _watermarks.clear()
+    else:
+        _watermarks.pop(key, None)
+
+
+def _source(key: str) -> str:
+    # TOKEN_SET:<body hash> -> TOKEN_SET
+    return key.split(":", 1)[0]
+
+
+def upstream_age(name: str) -> Optional[float]:
+    """Seconds since `name` last answered, None if it never has."""
+    last = _last_success.get(name)
+    return None if last is None else time.monotonic() - last
+
+
+def upstream_status() -> Dict[str, Dict[str, Any]]:
+    return {
+        name: {**breaker.snapshot(), "age": upstream_age(name)}
+        for name, breaker in _breakers.items()
+    }
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        code = error.response.status_code
+        return code >= 500 or code == httpx.codes.TOO_MANY_REQUESTS
+    return isinstance(error, httpx.TransportError)
+
+
+def _conditional(key: str, headers: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    params = {}
+    mark = _watermarks.get(key) if settings.UPSTREAM_INCREMENTAL else None
+    if mark:
+        if mark["etag"]:
+            headers["If-None-Match"] = mark["etag"]
+        if mark["sequence"]:
+            params["since"] = mark["sequence"]
+    return headers, params
+
+
+def _timeout(timeout: float) -> httpx.Timeout:
+    return httpx.Timeout(timeout, connect=settings.HTTP_CONNECT_TIMEOUT, pool=settings.HTTP_POOL_TIMEOUT)
+
+
+def _send(method: str, endpoint: str, key: str, timeout: float, **kwargs) -> httpx.Response:
+    headers, params = _conditional(key, get_auth_headers())
+    response = get_http_client().request(
+        method, endpoint, headers=headers, params=params, timeout=_timeout(timeout), **kwargs
+    )
+    if response.status_code != httpx.codes.NOT_MODIFIED:
+        raise_for_status(response)
+    return response
+
+
+async def _send_async(method: str, endpoint: str, key: str, timeout: float, **kwargs) -> httpx.Response:
+    if token_manager.access_token is None:
+        # only before the first token: the login is blocking I/O, keep it off the loop
+        await asyncio.get_running_loop().run_in_executor(None, token_manager.token)
+    headers, params = _conditional(key, get_auth_headers())
+    response = await get_async_http_client().request(
+        method, endpoint, headers=headers, params=params, timeout=_timeout(timeout), **kwargs
+    )
+    if response.status_code != httpx.codes.NOT_MODIFIED:
+        raise_for_status(response)
+    return response
+
+
+def _send_with_retries(method: str, endpoint: str, key: str, **kwargs) -> httpx.Response:
+    policy = UPSTREAM_POLICY[_source(key)]
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            return hedged(
+                lambda: _send(method, endpoint, key, policy["timeout"], **kwargs),
+                policy["hedge_after"],
+            )
+        except httpx.HTTPError as error:
+            delay = backoff_delay(attempt, settings.UPSTREAM_RETRY_BASE, settings.UPSTREAM_RETRY_CAP)
+            # a retry landing after the tick deadline is of no use to anyone
+            out_of_budget = time.monotonic() - started + delay > settings.TICK_DEADLINE
+            if not _retryable(error) or attempt >= settings.UPSTREAM_RETRIES or out_of_budget:
+                raise
+            logging.warning("Retrying %s in %.2fs after: %s", key, delay, error)
+            attempt += 1
+            time.sleep(delay)
+
+
+async def _send_with_retries_async(method: str, endpoint: str, key: str, **kwargs) -> httpx.Response:
+    policy = UPSTREAM_POLICY[_source(key)]
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            return await hedged_async(
+                lambda: _send_async(method, endpoint, key, policy["timeout"], **kwargs),
+                policy["hedge_after"],
+            )
+        except httpx.HTTPError as error:
+            delay = backoff_delay(attempt, settings.UPSTREAM_RETRY_BASE, settings.UPSTREAM_RETRY_CAP)
+            out_of_budget = time.monotonic() - started + delay > settings.TICK_DEADLINE
+            if not _retryable(error) or attempt >= settings.UPSTREAM_RETRIES or out_of_budget:
+                raise
+            logging.warning("Retrying %s in %.2fs after: %s", key, delay, error)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+def _incremental_request(method: str, endpoint: str, key: str, **kwargs) -> Any:
+    """
+    Issue a request using the ETag / since-sequence protocol. Returns
+    NOT_MODIFIED on 304, otherwise the decoded body which may only hold the
+    rows that changed since the last watermark when upstream flags X-Delta.
+
+    Calls are bounded by the source's timeout, hedged, retried with jitter
+    and go through the source's circuit breaker, which raises CircuitOpen
+    while upstream is considered down.
+    """
+    if player.active:
+        recorded = player.next(key)
+        if recorded is None:
+            return NOT_MODIFIED
+        return _handle_response(key, recorded)
+
+    name = _source(key)
+    breaker = _breakers[name]
+    breaker.before_call()
+    try:
+        response = _send_with_retries(method, endpoint, key, **kwargs)
+    except Exception as error:
+        _record_failure(breaker, error)
+        raise
+    return _record_success(name, key, response)
+
+
+async def _incremental_request_async(method: str, endpoint: str, key: str, **kwargs) -> Any:
+    """_incremental_request() on the async client."""
+    if player.active:
+        recorded = player.next(key)
+        if recorded is None:
+            return NOT_MODIFIED
+        return _handle_response(key, recorded)
+
+    name = _source(key)
+    breaker = _breakers[name]
+    breaker.before_call()
+    try:
+        response = await _send_with_retries_async(method, endpoint, key, **kwargs)
+    except Exception as error:
+        _record_failure(breaker, error)
+        raise
+    return _record_success(name, key, response)
+
+
+def _record_failure(breaker: CircuitBreaker, error: Exception) -> None:
+    if _retryable(error) or not isinstance(error, httpx.HTTPStatusError):
+        breaker.record_failure()
+    else:
+        # upstream answered, the request itself was wrong
+        breaker.record_success()
+
+
+def _record_success(name: str, key: str, response: httpx.Response) -> Any:
+    _breakers[name].record_success()
+    _last_success[name] = time.monotonic()
+
+    if recorder.enabled:
+        recorder.response(key, response.status_code, response.headers, response.content)
+    return _handle_response(key, response)
+
+
+def _handle_response(key: str, response: Any) -> Any:
+    # shared by live responses and the ones played back from a journal
+    if response.status_code == httpx.codes.NOT_MODIFIED:
+        return NOT_MODIFIED
+
+    data = loads(response.content)
+    etag = response.headers.get("ETag")
+    sequence = response.headers.get("X-Sequence")
+    if etag or sequence:
+        _watermarks[key] = {"etag": etag, "sequence": sequence}
+    if response.headers.get("X-Delta") == "true" and not data:
+        return NOT_MODIFIED
+    return data
+
+
+async def prefetch(key: str, fetch: Callable[[], Awaitable[Any]]) -> None:
+    """
+    Fetch `key` ahead of the stage that reads it. Skipped while an earlier
+    answer is still unread: with deltas, replacing it would lose rows.
+    """
+    with _inbox_lock:
+        if key in _inbox:
+            return
+    answer = await fetch()
+    with _inbox_lock:
+        _inbox[key] = answer
+
+
+def _take(key: str) -> Any:
+    with _inbox_lock:
+        return _inbox.pop(key, _MISSING)
 
 
 def get_atm_iv_from_api():
+    prefetched = _take("ATM_IV")
+    if prefetched is not _MISSING:
+        return prefetched
     try:
-        with get_session() as session:
-            response = session.get(API_ENDPOINT["ATM_IV"])
-            raise_for_status(response)
-            return response.json()
-    except httpx.RequestError as error:
+        return _incremental_request("GET", API_ENDPOINT["ATM_IV"], "ATM_IV")
+    except httpx.HTTPError as error:
+        logging.error("Error fetching atm iv: %s", error)
+        return None
+
+
+async def fetch_atm_iv():
+    try:
+        return await _incremental_request_async("GET", API_ENDPOINT["ATM_IV"], "ATM_IV")
+    except httpx.HTTPError as error:
         logging.error("Error fetching atm iv: %s", error)
         return None
 
@@ -106,7 +503,7 @@ def get_atm_iv_from_api():
 def get_z_score_from_api():
     try:
         with get_session() as session:
-            response = session.get(API_ENDPOINT["Z_SCORE"])
+            response = session.get(API_ENDPOINT["Z_SCORE"], headers=get_auth_headers())
             raise_for_status(response)
             return response.json()
     except httpx.RequestError as error:
@@ -115,24 +512,33 @@ def get_z_score_from_api():
 
 
 def get_skew_from_api():
+    prefetched = _take("SKEW")
+    if prefetched is not _MISSING:
+        return prefetched
     try:
-        with get_session() as session:
-            response = session.get(API_ENDPOINT["SKEW"])
-            raise_for_status(response)
-            return response.json()
-    except httpx.RequestError as error:
+        return _incremental_request("GET", API_ENDPOINT["SKEW"], "SKEW")
+    except httpx.HTTPError as error:
         logging.error("Error fetching skew: %s", error)
         return None
 
 
-def get_all_token_set(
+async def fetch_skew():
+    try:
+        return await _incremental_request_async("GET", API_ENDPOINT["SKEW"], "SKEW")
+    except httpx.HTTPError as error:
+        logging.error("Error fetching skew: %s", error)
+        return None
+
+
+def _token_set_request(
     oi: Optional[Literal["Max", "Min"]] = None,
     delta: Optional[DeltaRange] = None,
     expiry: Optional[List[str]] = None,
     symbols: Optional[List[str]] = None,
     strike_diff: Optional[List[str]] = None,
     strikes: Optional[sym_strike] = None,
-):
+    watermark_key: Optional[str] = None,
+) -> Tuple[Dict[str, Any], str]:
     body = {
         "oi": oi,
         "delta": delta,
@@ -142,11 +548,34 @@ def get_all_token_set(
         "strikes": strikes,
     }
 
+    # each distinct filter body is its own stream of watermarks, unless the
+    # caller keeps one stream across bodies (see OptionChain tiers)
+    key = "TOKEN_SET:" + (watermark_key or hashlib.md5(json.dumps(body, sort_keys=True).encode()).hexdigest())
+    return body, key
+
+
+def get_all_token_set(
+    oi: Optional[Literal["Max", "Min"]] = None,
+    delta: Optional[DeltaRange] = None,
+    expiry: Optional[List[str]] = None,
+    symbols: Optional[List[str]] = None,
+    strike_diff: Optional[List[str]] = None,
+    strikes: Optional[sym_strike] = None,
+    watermark_key: Optional[str] = None,
+):
+    body, key = _token_set_request(oi, delta, expiry, symbols, strike_diff, strikes, watermark_key)
     try:
-        with get_session() as session:
-            response = session.post(API_ENDPOINT["TOKEN_SET"], json=body)
-            raise_for_status(response)
-            return response.json()
-    except httpx.RequestError as error:
+        return _incremental_request("POST", API_ENDPOINT["TOKEN_SET"], key, json=body)
+    except httpx.HTTPError as error:
+        logging.error("Error fetching token set: %s", error)
+        return None
+
+
+async def fetch_token_set(**filters):
+    """get_all_token_set() on the async client, same arguments."""
+    body, key = _token_set_request(**filters)
+    try:
+        return await _incremental_request_async("POST", API_ENDPOINT["TOKEN_SET"], key, json=body)
+    except httpx.HTTPError as error:
         logging.error("Error fetching token set: %s", error)
         return None
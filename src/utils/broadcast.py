@@ -0,0 +1,257 @@
+"""
+Pushes screener updates to stream subscribers as row level diffs.
+
+Subscribers name the feeds they want, the payloads of the /screener GET
+endpoints by path. They get each feed in full on subscribing, then every
+time its screener publishes a new version only the rows inserted, updated
+or deleted since, keyed by the identifying columns of each table (symbol,
+expiry, strike ...). A table whose rows have no unique key is sent whole.
+
+Diffs are computed once per feed and version on the broadcaster's thread,
+and the same encoded message is queued to every subscriber of the feed. A
+subscriber whose queue fills up is dropped with a last "dropped" message
+instead of holding back the others; it reconnects for a fresh full frame.
+"""
+import asyncio
+from collections import defaultdict
+import json
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import pandas as pd
+
+from utils.logger import logger
+from utils.response_cache import encode
+from utils.snapshot import Snapshot, SnapshotStore
+
+# columns identifying a row, those a table has form its key
+KEY_COLUMNS = (
+    "symbol", "stock_1", "stock_2", "expiry",
+    "strike", "strike_price", "strike_price_current", "strike_price_next", "opt_type",
+)
+
+DROPPED = encode({"type": "dropped", "reason": "slow consumer"})
+HEARTBEAT = encode({"type": "heartbeat"})
+
+
+class Feed(NamedTuple):
+    screener: str
+    msg: str
+    build: Callable[[Snapshot], Any]
+
+
+class Table:
+    __slots__ = ("keys", "rows")
+
+    def __init__(self, value: Any):
+        if isinstance(value, pd.DataFrame):
+            value = json.loads(value.to_json(orient="records"))
+        else:
+            # as the GET endpoints serialise it
+            value = json.loads(json.dumps(value, default=str))
+        self.keys: List[str] = []
+        self.rows: Any = value
+        if isinstance(value, list) and value and all(isinstance(row, dict) for row in value):
+            keys = [column for column in KEY_COLUMNS if column in value[0]]
+            rows = {self._key(row, keys): row for row in value} if keys else {}
+            if keys and len(rows) == len(value):
+                self.keys, self.rows = keys, rows
+
+    @staticmethod
+    def _key(row: Dict[str, Any], keys: List[str]) -> str:
+        return json.dumps([row.get(column) for column in keys])
+
+    def records(self) -> Any:
+        return list(self.rows.values()) if self.keys else self.rows
+
+    def diff(self, previous: Optional["Table"]) -> Optional[Dict[str, Any]]:
+        """Changes from `previous`, None if there are none."""
+        if previous is None or not self.keys or self.keys != previous.keys:
+            if previous is not None and previous.records() == self.records():
+                return None
+            return {"replace": self.records()}
+        insert, update = [], []
+        for key, row in self.rows.items():
+            before = previous.rows.get(key)
+            if before is None:
+                insert.append(row)
+            elif before != row:
+                update.append(row)
+        delete = [
+            {column: row.get(column) for column in self.keys}
+            for key, row in previous.rows.items() if key not in self.rows
+        ]
+        if not (insert or update or delete):
+            return None
+        return {"insert": insert, "update": update, "delete": delete}
+
+
+class FeedState:
+    __slots__ = ("version", "tables", "whole", "frame")
+
+    def __init__(self, version: int, payload: Any = None):
+        # screener output version the tables were built from, 0 for none yet
+        self.version = version
+        # a payload that is not a dict of tables is one table under ""
+        self.whole = not isinstance(payload, dict)
+        items = payload.items() if isinstance(payload, dict) else ([("", payload)] if payload is not None else [])
+        self.tables: Dict[str, Table] = {name: Table(value) for name, value in items}
+        self.frame: Optional[bytes] = None
+
+    def full(self, name: str) -> bytes:
+        if self.frame is None:
+            data = {table_name: table.records() for table_name, table in self.tables.items()}
+            if self.whole:
+                data = data.get("")
+            self.frame = encode({"type": "snapshot", "feed": name, "version": self.version, "data": data})
+        return self.frame
+
+
+class Subscriber:
+    def __init__(self, feeds: List[str], loop: asyncio.AbstractEventLoop, size: int):
+        self.feeds = feeds
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(size)
+        self.dropped = False
+
+    def offer(self, message: bytes) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # loop closed, the connection is gone
+            pass
+
+    def _put(self, message: bytes) -> None:
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(DROPPED)
+
+
+class Broadcaster:
+    def __init__(self, feeds: Dict[str, Feed], store: SnapshotStore, queue_size: int, touch: Callable[[str], Any]):
+        self.feeds = feeds
+        self.store = store
+        # messages a subscriber may fall behind before it is dropped
+        self.queue_size = queue_size
+        # keeps streamed screeners from being suspended as unread
+        self.touch = touch
+        self.lock = threading.Lock()
+        self.wake = threading.Condition(self.lock)
+        # only for feeds somebody subscribes to
+        self.states: Dict[str, FeedState] = {}
+        self.subscribers: Dict[str, Set[Subscriber]] = defaultdict(set)
+        self.pending: Optional[Snapshot] = None
+        self.thread: Optional[threading.Thread] = None
+        self.counts = {"subscribed": 0, "dropped": 0, "messages": 0}
+
+    def subscribe(self, feeds: List[str], loop: asyncio.AbstractEventLoop) -> Tuple[Subscriber, List[bytes]]:
+        """Registers a subscriber, returns it with the full frames of its feeds."""
+        subscriber = Subscriber(feeds, loop, self.queue_size)
+        snapshot = self.store.current
+        frames = []
+        for name in feeds:
+            feed = self.feeds[name]
+            self.touch(feed.screener)
+            with self.lock:
+                state = self.states.get(name)
+            if state is None:
+                output = snapshot.screeners.get(feed.screener)
+                state = FeedState(output.version, feed.build(snapshot)) if output is not None else FeedState(0)
+            with self.lock:
+                # a concurrent subscribe or a publish may have got there first
+                state = self.states.setdefault(name, state)
+                self.subscribers[name].add(subscriber)
+                frames.append(state.full(name))
+        with self.lock:
+            self.counts["subscribed"] += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="broadcaster", daemon=True)
+                self.thread.start()
+        return subscriber, frames
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self.lock:
+            for name in subscriber.feeds:
+                self.subscribers[name].discard(subscriber)
+                if not self.subscribers[name]:
+                    del self.subscribers[name]
+                    self.states.pop(name, None)
+            if subscriber.dropped:
+                self.counts["dropped"] += 1
+
+    async def listen(self, subscriber: Subscriber, heartbeat: float) -> AsyncIterator[bytes]:
+        """Messages for `subscriber`, a heartbeat after `heartbeat` seconds of silence; ends once it is dropped."""
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                for name in subscriber.feeds:
+                    self.touch(self.feeds[name].screener)
+                message = HEARTBEAT
+            yield message
+            if message is DROPPED:
+                return
+
+    def publish(self, snapshot: Snapshot) -> None:
+        """Listener of the snapshot store, the diffing happens on the broadcaster thread."""
+        with self.wake:
+            self.pending = snapshot
+            self.wake.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self.wake:
+                while self.pending is None:
+                    self.wake.wait()
+                snapshot, self.pending = self.pending, None
+            try:
+                self._fan_out(snapshot)
+            except Exception:
+                logger.exception("Could not broadcast the screener updates")
+
+    def _fan_out(self, snapshot: Snapshot) -> None:
+        with self.lock:
+            names = list(self.subscribers)
+        for name in names:
+            feed = self.feeds[name]
+            self.touch(feed.screener)
+            output = snapshot.screeners.get(feed.screener)
+            with self.lock:
+                state = self.states.get(name)
+            if output is None or state is None or output.version <= state.version:
+                continue
+            try:
+                updated = FeedState(output.version, feed.build(snapshot))
+            except Exception:
+                logger.exception(f"Could not build feed {name} for the stream")
+                continue
+            changes = {}
+            for table_name, table in updated.tables.items():
+                change = table.diff(state.tables.get(table_name))
+                if change is not None:
+                    changes[table_name] = change
+            message = encode({"type": "diff", "feed": name, "version": output.version, "tables": changes}) if changes else None
+            with self.lock:
+                if self.states.get(name) is not state:
+                    # unsubscribed meanwhile
+                    continue
+                self.states[name] = updated
+                if message is None:
+                    continue
+                for subscriber in self.subscribers[name]:
+                    subscriber.offer(message)
+                self.counts["messages"] += len(self.subscribers[name])
+
+    def report(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "subscribers": {name: len(subscribers) for name, subscribers in self.subscribers.items()},
+                "versions": {name: state.version for name, state in self.states.items()},
+                **self.counts,
+            }
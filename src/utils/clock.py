@@ -0,0 +1,37 @@
+"""
+Injectable wall clock for the memory layer.
+
+Live runs read the system time; the replay driver swaps in the recorded
+tick time so time-of-day logic behaves as it did when the journal was
+written.
+"""
+from datetime import datetime
+from typing import Callable
+
+_source: Callable[[], datetime] = datetime.now
+
+
+def now() -> datetime:
+    return _source()
+
+
+def set_source(source: Callable[[], datetime]) -> None:
+    global _source
+    _source = source
+
+
+def reset() -> None:
+    set_source(datetime.now)
+
+
+class ManualClock:
+    """Clock that only moves when told to, used during replay."""
+
+    def __init__(self, start: datetime):
+        self.current = start
+
+    def set(self, value: datetime) -> None:
+        self.current = value
+
+    def __call__(self) -> datetime:
+        return self.current
@@ -0,0 +1,255 @@
+"""
+Runs the screener updates of a tick as a dependency graph.
+
+A stage starts as soon as every stage it reads from has finished
+successfully in the same tick, so it never computes on half-updated inputs.
+Independent stages run in parallel on a persistent pool. A stage that
+fails, passes its timeout or is still busy from an earlier tick blocks its
+dependents for this tick; they keep serving their last good data.
+
+A stage with an `interval` only runs on ticks where that much time has
+passed since it last ran. On other ticks it is idle, and its dependents
+read its last result, which is complete. Stages left out of the `active`
+set of a run are suspended the same way, and stages in its `defer` set
+(see utils.governor) are deferred to a later tick.
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set
+
+from utils.logger import logger
+
+OK = "ok"
+FAILED = "failed"
+TIMEOUT = "timeout"
+BUSY = "busy"
+BLOCKED = "blocked"
+IDLE = "idle"
+SUSPENDED = "suspended"
+DEFERRED = "deferred"
+
+# statuses after which the stage's last result is complete
+SETTLED = (OK, IDLE, SUSPENDED, DEFERRED)
+
+CRITICAL = "critical"
+BEST_EFFORT = "best_effort"
+PRIORITIES = (CRITICAL, BEST_EFFORT)
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Any],
+        inputs: Iterable[str] = (),
+        timeout: float = 0.0,
+        interval: float = 0.0,
+        priority: str = CRITICAL,
+    ):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Stage {name} has unknown priority {priority!r}")
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        # 0 means only the tick deadline applies
+        self.timeout = timeout
+        # seconds between runs, 0 runs on every tick
+        self.interval = interval
+        # best effort stages give way to critical ones when a tick is over budget
+        self.priority = priority
+        self.last_run: Optional[float] = None
+
+    def due(self, now: float) -> bool:
+        if self.interval <= 0 or self.last_run is None:
+            return True
+        # ticks jitter a little, do not push a stage back a whole tick for it
+        return now - self.last_run >= self.interval * 0.95
+
+
+class StageStats:
+    def __init__(self, window: int = 200):
+        self.durations: Deque[float] = deque(maxlen=window)
+        # CPU seconds of the stage thread per run, what the tick budget is spent on
+        self.cpu_times: Deque[float] = deque(maxlen=window)
+        self.counts: Dict[str, int] = {
+            OK: 0, FAILED: 0, TIMEOUT: 0, BUSY: 0, BLOCKED: 0, IDLE: 0, SUSPENDED: 0, DEFERRED: 0,
+        }
+        self.last_status: Optional[str] = None
+        self.last_ok: Optional[float] = None
+
+    def _percentile(self, q: float, samples: Optional[Deque[float]] = None) -> Optional[float]:
+        samples = self.durations if samples is None else samples
+        if not samples:
+            return None
+        values = sorted(samples)
+        return values[min(len(values) - 1, int(len(values) * q))]
+
+    def cpu_estimate(self, recent: int = 5) -> float:
+        """Expected CPU seconds of the next run, 0 until the stage has run."""
+        values = sorted(list(self.cpu_times)[-recent:])
+        return values[len(values) // 2] if values else 0.0
+
+    def report(self) -> Dict[str, Any]:
+        ms = lambda v: None if v is None else round(v * 1000, 1)  # noqa: E731
+        return {
+            "last_status": self.last_status,
+            "last_ms": ms(self.durations[-1] if self.durations else None),
+            "p50_ms": ms(self._percentile(0.5)),
+            "p95_ms": ms(self._percentile(0.95)),
+            "max_ms": ms(max(self.durations) if self.durations else None),
+            "cpu_p50_ms": ms(self._percentile(0.5, self.cpu_times)),
+            "age": None if self.last_ok is None else round(time.monotonic() - self.last_ok, 1),
+            **self.counts,
+        }
+
+
+class DagRunner:
+    def __init__(self, stages: List[Stage]):
+        self.stages: Dict[str, Stage] = {stage.name: stage for stage in stages}
+        self._check()
+        self.pool = ThreadPoolExecutor(max_workers=len(self.stages), thread_name_prefix="stage")
+        # last submitted run of every stage, possibly from an earlier tick
+        self.in_flight: Dict[str, Future] = {}
+        self.stats: Dict[str, StageStats] = {name: StageStats() for name in self.stages}
+        self.lock = threading.Lock()
+
+    def _check(self) -> None:
+        for stage in self.stages.values():
+            unknown = [i for i in stage.inputs if i not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} reads unknown stages {unknown}")
+        # Kahn's algorithm, anything left over sits on a cycle
+        remaining = {name: set(stage.inputs) for name, stage in self.stages.items()}
+        while remaining:
+            ready = [name for name, inputs in remaining.items() if not inputs]
+            if not ready:
+                raise ValueError(f"Stage dependencies form a cycle: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for inputs in remaining.values():
+                inputs.difference_update(ready)
+
+    def _execute(self, stage: Stage) -> bool:
+        started = time.monotonic()
+        cpu_started = time.thread_time()
+        try:
+            stage.func()
+            ok = True
+        except Exception:
+            logger.exception(f"Stage {stage.name} failed, serving last good data")
+            ok = False
+        with self.lock:
+            stats = self.stats[stage.name]
+            stats.durations.append(time.monotonic() - started)
+            stats.cpu_times.append(time.thread_time() - cpu_started)
+            if ok:
+                stats.last_ok = time.monotonic()
+        return ok
+
+    def _settle(self, name: str, status: str, statuses: Dict[str, str]) -> None:
+        statuses[name] = status
+        with self.lock:
+            self.stats[name].counts[status] += 1
+            self.stats[name].last_status = status
+
+    def run(
+        self,
+        deadline: float,
+        active: Optional[Set[str]] = None,
+        defer: Optional[Set[str]] = None,
+    ) -> Dict[str, str]:
+        """
+        Run one tick, waiting at most `deadline` seconds, over the `active`
+        stages (all when None) except the ones to `defer`. Returns the status of every stage; stages
+        still running are reported as timeout and keep running in the
+        background.
+        """
+        started = time.monotonic()
+        end = started + deadline
+        statuses: Dict[str, str] = {}
+        pending = set(self.stages)
+        running: Dict[Future, tuple] = {}
+
+        while True:
+            changed = True
+            while changed:
+                changed = False
+                for name in sorted(pending):
+                    inputs = [statuses.get(i) for i in self.stages[name].inputs]
+                    if any(s is not None and s not in SETTLED for s in inputs):
+                        self._settle(name, BLOCKED, statuses)
+                    elif all(s in SETTLED for s in inputs):
+                        stage = self.stages[name]
+                        previous = self.in_flight.get(name)
+                        if previous is not None and not previous.done():
+                            self._settle(name, BUSY, statuses)
+                        elif active is not None and name not in active:
+                            self._settle(name, SUSPENDED, statuses)
+                        elif not stage.due(started):
+                            self._settle(name, IDLE, statuses)
+                        elif defer and name in defer:
+                            self._settle(name, DEFERRED, statuses)
+                        else:
+                            stage.last_run = started
+                            future = self.pool.submit(self._execute, self.stages[name])
+                            self.in_flight[name] = future
+                            running[future] = (name, time.monotonic())
+                    else:
+                        continue
+                    pending.discard(name)
+                    changed = True
+
+            if not running:
+                break
+
+            now = time.monotonic()
+            limits = [
+                since + self.stages[name].timeout
+                for name, since in running.values() if self.stages[name].timeout > 0
+            ]
+            wake = min(limits + [end])
+            done, _ = wait(list(running), timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                name, _ = running.pop(future)
+                self._settle(name, OK if future.result() else FAILED, statuses)
+
+            now = time.monotonic()
+            for future, (name, since) in list(running.items()):
+                stage_timeout = self.stages[name].timeout
+                if now >= end or (stage_timeout > 0 and now >= since + stage_timeout):
+                    running.pop(future)
+                    self._settle(name, TIMEOUT, statuses)
+
+        late = [name for name, status in statuses.items() if status in (TIMEOUT, BUSY)]
+        if late:
+            logger.warning(f"Stages not finished within their time this tick: {sorted(late)}")
+        return statuses
+
+    def runnable(self, active: Optional[Set[str]] = None, defer: Optional[Set[str]] = None) -> Set[str]:
+        """Stages a run started now would start, unless one of their inputs fails."""
+        now = time.monotonic()
+        return {
+            name for name, stage in self.stages.items()
+            if (active is None or name in active)
+            and not (defer and name in defer)
+            and stage.due(now)
+            and (name not in self.in_flight or self.in_flight[name].done())
+        }
+
+    def wait_idle(self) -> None:
+        """Block until every submitted stage has finished (replay, benchmarks)."""
+        wait(list(self.in_flight.values()))
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            return {
+                name: {
+                    "inputs": list(stage.inputs),
+                    "interval_ms": int(stage.interval * 1000),
+                    "priority": stage.priority,
+                    **self.stats[name].report(),
+                }
+                for name, stage in self.stages.items()
+            }
@@ -0,0 +1,155 @@
+"""
+Decoding of upstream payloads straight into columnar frames.
+
+Replaces the `response.json()` -> `pd.DataFrame` -> `explode` / `apply` and
+`pd.json_normalize` chains with a single pass that builds one typed NumPy
+array per column.
+
+Bodies are parsed without a schema, with msgspec when installed (orjson,
+then the stdlib otherwise), so rows are still decoded to dicts; what goes
+is the pandas work per row. Typed msgspec structs are left out on purpose:
+the upstream schema is not pinned anywhere, a Struct silently drops the
+fields it does not declare, and atm_iv_frame keeps every scalar column
+upstream sends.
+"""
+from typing import Any, Dict, Iterator, List, Tuple
+import json
+import numpy as np
+import pandas as pd
+
+try:
+    import msgspec
+
+    _decoder = msgspec.json.Decoder()
+
+    def loads(content: bytes) -> Any:
+        return _decoder.decode(content)
+
+except ImportError:
+    try:
+        import orjson
+
+        def loads(content: bytes) -> Any:
+            return orjson.loads(content)
+
+    except ImportError:
+
+        def loads(content: bytes) -> Any:
+            return json.loads(content)
+
+
+ATM_IV_LIST_COLUMNS = [
+    "expiry", "atm_strike", "type", "delta", "ltp", "atm_iv", "iv_stats", "percent_change", "ivp",
+]
+ATM_IV_FLOAT_COLUMNS = {"atm_strike", "delta", "ltp", "atm_iv", "ivp"}
+ATM_IV_DROP_COLUMNS = {"pk", "atm_iv_pk", "errors"}
+
+
+def _float_array(values: List[Any]) -> np.ndarray:
+    # None becomes NaN, same as astype(float) after explode
+    return np.array(values, dtype=float)
+
+
+def atm_iv_frame(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    One row per (symbol, expiry) from the atm_iv payload, equivalent to the
+    old drop -> explode -> pct_change apply -> astype chain.
+    """
+    if not rows:
+        return pd.DataFrame()
+
+    lengths = np.fromiter((len(r.get("expiry") or ()) for r in rows), dtype=np.int64, count=len(rows))
+    columns: Dict[str, Any] = {}
+
+    # upstream's key order, as explode kept it
+    keys = [k for k in rows[0] if k not in ATM_IV_DROP_COLUMNS]
+    keys += [k for k in ATM_IV_LIST_COLUMNS if k not in keys]
+    for key in keys:
+        if key not in ATM_IV_LIST_COLUMNS:
+            values = np.empty(len(rows), dtype=object)
+            values[:] = [r.get(key) for r in rows]
+            columns[key] = np.repeat(values, lengths)
+            continue
+        flat = [v for r in rows for v in (r.get(key) or ())]
+        if key in ATM_IV_FLOAT_COLUMNS:
+            columns[key] = _float_array(flat)
+        else:
+            values = np.empty(len(flat), dtype=object)
+            values[:] = flat
+            columns[key] = values
+
+    columns["pct_change"] = _float_array(
+        [(p or {}).get("fut") for p in columns["percent_change"]]
+    )
+
+    index = np.repeat(np.arange(len(rows)), lengths)
+    return pd.DataFrame(columns, index=index)
+
+
+def _iter_records(
+    data: Any, record_path: List[str], meta: List[List[str]], level: int = 0, carried=None
+) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    carried = carried or {}
+    for obj in data if isinstance(data, list) else [data]:
+        values = carried
+        for path in meta:
+            if len(path) == level + 1:
+                values = {**values, ".".join(path): obj.get(path[-1])}
+        children = obj.get(record_path[level]) or []
+        if level == len(record_path) - 1:
+            for record in children if isinstance(children, list) else [children]:
+                yield record, values
+        else:
+            yield from _iter_records(children, record_path, meta, level + 1, values)
+
+
+def _paths(record: Dict[str, Any], prefix: Tuple[str, ...] = ()) -> Iterator[Tuple[str, ...]]:
+    for key, value in record.items():
+        if isinstance(value, dict):
+            yield from _paths(value, prefix + (key,))
+        else:
+            yield prefix + (key,)
+
+
+def _column(records: List[Dict[str, Any]], path: Tuple[str, ...]) -> np.ndarray:
+    if len(path) == 1:
+        flat = [r.get(path[0]) for r in records]
+    elif len(path) == 2:
+        a, b = path
+        flat = [(r.get(a) or {}).get(b) for r in records]
+    else:
+        flat = []
+        for r in records:
+            for p in path:
+                r = r.get(p) if isinstance(r, dict) else None
+            flat.append(r)
+    values = np.empty(len(flat), dtype=object)
+    values[:] = flat
+    return values
+
+
+def normalize(data: Any, record_path: List[str], meta: List[List[str]]) -> pd.DataFrame:
+    """
+    Column-wise equivalent of `pd.json_normalize(data, record_path, meta)`:
+    nested dicts become dotted columns, lists stay as values, meta columns
+    are appended last.
+    """
+    pairs = list(_iter_records(data, record_path, meta))
+    if not pairs:
+        return pd.DataFrame()
+    records = [p[0] for p in pairs]
+
+    paths: Dict[Tuple[str, ...], None] = {}
+    for record in records:
+        for path in _paths(record):
+            paths.setdefault(path, None)
+
+    columns = {".".join(path): _column(records, path) for path in paths}
+    for path in meta:
+        key = ".".join(path)
+        values = np.empty(len(pairs), dtype=object)
+        values[:] = [p[1].get(key) for p in pairs]
+        columns[key] = values
+
+    # let pandas settle numeric columns to float/int dtypes in one go
+    return pd.DataFrame(columns).infer_objects()
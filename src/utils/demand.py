@@ -0,0 +1,73 @@
+"""
+Tracks which screeners are being read, so unread ones can stop recomputing.
+
+A screener is wanted while its endpoints were read within `idle_after`
+seconds, or while an admin forces it on. The stages a tick runs are the
+wanted screeners plus everything they read from. `idle_after <= 0` keeps
+every screener wanted.
+"""
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+
+
+class DemandTracker:
+    def __init__(self, idle_after: float, inputs: Dict[str, Iterable[str]]):
+        self.idle_after = idle_after
+        self.inputs = {name: tuple(names) for name, names in inputs.items()}
+        self.lock = threading.Lock()
+        # everything counts as just read at start, so the first window computes all
+        started = time.monotonic()
+        self.last_read: Dict[str, float] = {name: started for name in self.inputs}
+        self.forced: Dict[str, bool] = {}
+
+    def _wanted(self, name: str, now: float) -> bool:
+        if name in self.forced:
+            return self.forced[name]
+        return self.idle_after <= 0 or now - self.last_read[name] <= self.idle_after
+
+    def _closure(self, names: Iterable[str]) -> Set[str]:
+        found: Set[str] = set()
+        pending = list(names)
+        while pending:
+            name = pending.pop()
+            if name in found or self.forced.get(name) is False:
+                continue
+            found.add(name)
+            pending.extend(self.inputs[name])
+        return found
+
+    def active(self) -> Set[str]:
+        """Stages to run this tick."""
+        now = time.monotonic()
+        with self.lock:
+            return self._closure(name for name in self.inputs if self._wanted(name, now))
+
+    def touch(self, name: str) -> Set[str]:
+        """Record a read; returns the stages it needs that are currently suspended."""
+        now = time.monotonic()
+        with self.lock:
+            before = self._closure(n for n in self.inputs if self._wanted(n, now))
+            self.last_read[name] = now
+            return self._closure([name]) - before
+
+    def force(self, name: str, state: Optional[bool]) -> None:
+        """True keeps a screener running, False suspends it, None returns it to demand."""
+        with self.lock:
+            if state is None:
+                self.forced.pop(name, None)
+            else:
+                self.forced[name] = state
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        active = self.active()
+        now = time.monotonic()
+        with self.lock:
+            return {
+                name: {
+                    "active": name in active,
+                    "forced": self.forced.get(name),
+                    "last_read_age": round(now - self.last_read[name], 1),
+                }
+                for name in self.inputs
+            }
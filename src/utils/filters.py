@@ -0,0 +1,211 @@
+"""
+A small filter expression language over screener tables, e.g.
+
+    ivp > 60 and pct_change < 0 and symbol in ["INFY", "TCS"]
+    atm_iv >= vol_up_benchmark or not (`4l_f` == None)
+
+Expressions use Python syntax but only comparisons (chained too), `in` /
+`not in` against a literal list, `and` / `or` / `not`, + - * / and
+literals are allowed; anything else is rejected when parsing. Names are
+columns, dotted names (`params.delta`) included, and reach into columns of
+dicts (`percent_change.fut`); a column that is not a valid name goes in
+backticks.
+
+An expression compiles once, cached by its text, into a function of a
+frame returning a NumPy boolean mask of its rows, evaluated column wise.
+"""
+import ast
+from functools import lru_cache, reduce
+import operator
+import re
+from typing import Any, Callable, Dict, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+MAX_LENGTH = 2000
+# nesting, the compiled expression evaluates recursively
+MAX_DEPTH = 100
+
+_COMPARISONS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+_ARITHMETIC = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+_LITERALS = (int, float, str, bool, type(None))
+_QUOTED = re.compile(r"`([^`]+)`")
+
+Evaluate = Callable[[pd.DataFrame], Any]
+
+
+class FilterError(ValueError):
+    pass
+
+
+def _source(name: str, columns) -> Optional[str]:
+    """The column holding `name`: itself, or for a.b.c the column a.b or a of dicts holding the rest."""
+    parts = name.split(".")
+    for end in range(len(parts), 0, -1):
+        column = ".".join(parts[:end])
+        if column in columns:
+            return column
+    return None
+
+
+def _values(frame: pd.DataFrame, name: str) -> np.ndarray:
+    column = _source(name, frame.columns)
+    if column == name:
+        return frame[name].to_numpy()
+    keys = name[len(column) + 1:].split(".")
+
+    def dig(cell: Any) -> Any:
+        for key in keys:
+            cell = cell.get(key) if isinstance(cell, dict) else None
+        return cell
+
+    # a Series infers the dtype, floats with missing keys as NaN
+    return pd.Series([dig(cell) for cell in frame[column]]).to_numpy()
+
+
+class Filter:
+    __slots__ = ("text", "columns", "_evaluate")
+
+    def __init__(self, text: str, columns: Set[str], evaluate: Evaluate):
+        self.text = text
+        self.columns = frozenset(columns)
+        self._evaluate = evaluate
+
+    def missing(self, columns) -> Set[str]:
+        return {name for name in self.columns if _source(name, columns) is None}
+
+    def mask(self, frame: pd.DataFrame) -> np.ndarray:
+        """Rows of `frame` matching; none when it lacks a column the expression reads."""
+        if self.missing(frame.columns):
+            return np.zeros(len(frame), dtype=bool)
+        try:
+            with np.errstate(invalid="ignore"):
+                result = self._evaluate(frame)
+        except TypeError as error:
+            raise FilterError(f"Cannot evaluate {self.text!r}: {error}") from error
+        except RecursionError as error:
+            raise FilterError("Filter nested too deeply") from error
+        return np.broadcast_to(np.asarray(result).astype(bool), (len(frame),))
+
+
+def _literal(node: ast.AST) -> Any:
+    if isinstance(node, ast.Constant) and isinstance(node.value, _LITERALS):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and isinstance(node.operand, ast.Constant):
+        if isinstance(node.operand.value, (int, float)) and not isinstance(node.operand.value, bool):
+            return -node.operand.value
+    raise FilterError("`in` takes a list of literals")
+
+
+def _column(node: ast.AST) -> str:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return f"{_column(node.value)}.{node.attr}"
+    raise FilterError(f"Unsupported expression: {type(node).__name__}")
+
+
+def _compare(op: ast.cmpop, left: Evaluate, right_node: ast.AST, compile_node: Callable[[ast.AST], Evaluate]) -> Evaluate:
+    if isinstance(op, (ast.In, ast.NotIn)):
+        if not isinstance(right_node, (ast.List, ast.Tuple, ast.Set)):
+            raise FilterError("`in` takes a list of literals")
+        values = [_literal(element) for element in right_node.elts]
+        negate = isinstance(op, ast.NotIn)
+        return lambda frame: np.isin(left(frame), values, invert=negate)
+    if isinstance(op, (ast.Eq, ast.NotEq)) and isinstance(right_node, ast.Constant) and right_node.value is None:
+        if isinstance(op, ast.Eq):
+            return lambda frame: pd.isna(left(frame))
+        return lambda frame: pd.notna(left(frame))
+    if type(op) not in _COMPARISONS:
+        raise FilterError(f"Unsupported comparison: {type(op).__name__}")
+    compare = _COMPARISONS[type(op)]
+    right = compile_node(right_node)
+    return lambda frame: compare(left(frame), right(frame))
+
+
+def _compiler(columns: Set[str], quoted: Dict[str, str]) -> Callable[[ast.AST], Evaluate]:
+    def compile_node(node: ast.AST) -> Evaluate:
+        if isinstance(node, ast.BoolOp):
+            parts = [compile_node(value) for value in node.values]
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            return lambda frame: reduce(combine, (part(frame) for part in parts))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            operand = compile_node(node.operand)
+            return lambda frame: np.logical_not(operand(frame))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            operand = compile_node(node.operand)
+            return lambda frame: operator.neg(operand(frame))
+        if isinstance(node, ast.Compare):
+            # a < b < c is a < b and b < c
+            lefts = [node.left, *node.comparators[:-1]]
+            parts = [
+                _compare(op, compile_node(left), right, compile_node)
+                for left, op, right in zip(lefts, node.ops, node.comparators)
+            ]
+            return lambda frame: reduce(np.logical_and, (part(frame) for part in parts))
+        if isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC:
+            arithmetic = _ARITHMETIC[type(node.op)]
+            left, right = compile_node(node.left), compile_node(node.right)
+            return lambda frame: arithmetic(left(frame), right(frame))
+        if isinstance(node, ast.Constant) and isinstance(node.value, _LITERALS):
+            value = node.value
+            return lambda frame: value
+        if isinstance(node, (ast.Name, ast.Attribute)):
+            name = _column(node)
+            name = quoted.get(name, name)
+            columns.add(name)
+            return lambda frame: _values(frame, name)
+        raise FilterError(f"Unsupported expression: {type(node).__name__}")
+
+    return compile_node
+
+
+def _depth(tree: ast.AST) -> int:
+    """Nesting of `tree`, walked without recursion so any depth is measured."""
+    deepest, stack = 0, [(tree, 1)]
+    while stack:
+        node, depth = stack.pop()
+        deepest = max(deepest, depth)
+        stack.extend((child, depth + 1) for child in ast.iter_child_nodes(node))
+    return deepest
+
+
+@lru_cache(maxsize=256)
+def compile_filter(text: str) -> Filter:
+    if len(text) > MAX_LENGTH:
+        raise FilterError(f"Filter longer than {MAX_LENGTH} characters")
+    quoted: Dict[str, str] = {}
+
+    def placeholder(match: re.Match) -> str:
+        name = f"_quoted_{len(quoted)}"
+        quoted[name] = match.group(1)
+        return name
+
+    try:
+        tree = ast.parse(_QUOTED.sub(placeholder, text).strip(), mode="eval")
+    except SyntaxError as error:
+        raise FilterError(f"Invalid filter {text!r}: {error.msg}") from error
+    except (RecursionError, MemoryError) as error:
+        # the parser gives up on deep nesting with either
+        raise FilterError("Filter nested too deeply") from error
+    if _depth(tree.body) > MAX_DEPTH:
+        raise FilterError(f"Filter nested deeper than {MAX_DEPTH} levels")
+    columns: Set[str] = set()
+    try:
+        evaluate = _compiler(columns, quoted)(tree.body)
+    except (RecursionError, MemoryError) as error:
+        raise FilterError("Filter nested too deeply") from error
+    return Filter(text, columns, evaluate)
@@ -0,0 +1,81 @@
+"""
+Keeps the CPU a tick spends within a budget by deferring best effort
+screeners.
+
+Before each tick the governor estimates the CPU time of every stage that
+would run, from its recent runs. Critical stages always run. Best effort
+stages fill what is left of the budget, the one waiting longest first, and
+the rest are deferred to a later tick, so each of them still gets its turn.
+One deferred for `max_defer` seconds runs regardless of the budget. A
+budget of 0 turns the governor off.
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from utils.dag import BEST_EFFORT, CRITICAL, DEFERRED, DagRunner
+from utils.logger import logger
+
+
+class TickGovernor:
+    def __init__(self, runner: DagRunner, budget: float, max_defer: float):
+        self.runner = runner
+        # CPU seconds per tick
+        self.budget = budget
+        self.max_defer = max_defer
+        self.lock = threading.Lock()
+        self.planned = 0.0
+        self.last_deferred: List[str] = []
+        self.over_budget_ticks = 0
+        self.deferring = False
+
+    def plan(self, active: Optional[Set[str]] = None) -> Set[str]:
+        """The stages to defer this tick."""
+        if self.budget <= 0:
+            return set()
+
+        now = time.monotonic()
+        with self.runner.lock:
+            costs = {name: stats.cpu_estimate() for name, stats in self.runner.stats.items()}
+        due = [
+            stage for name, stage in self.runner.stages.items()
+            if (active is None or name in active) and stage.due(now)
+        ]
+
+        spent = sum(costs[stage.name] for stage in due if stage.priority == CRITICAL)
+        deferred: Set[str] = set()
+        best_effort = [stage for stage in due if stage.priority == BEST_EFFORT]
+        # never run ones first, then the longest waiting
+        for stage in sorted(best_effort, key=lambda s: (s.last_run is not None, s.last_run or 0.0)):
+            starved = stage.last_run is not None and now - stage.last_run >= self.max_defer
+            if starved or spent + costs[stage.name] <= self.budget:
+                spent += costs[stage.name]
+            else:
+                deferred.add(stage.name)
+
+        with self.lock:
+            self.planned = spent
+            self.last_deferred = sorted(deferred)
+            if deferred:
+                self.over_budget_ticks += 1
+            if bool(deferred) != self.deferring:
+                self.deferring = bool(deferred)
+                if deferred:
+                    logger.warning(f"Tick over its CPU budget, deferring {self.last_deferred}")
+                else:
+                    logger.info("Tick back within its CPU budget")
+        return deferred
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            report = {
+                "budget_ms": round(self.budget * 1000, 1),
+                "planned_ms": round(self.planned * 1000, 1),
+                "over_budget_ticks": self.over_budget_ticks,
+                "last_deferred": self.last_deferred,
+            }
+        with self.runner.lock:
+            report["deferrals"] = {
+                name: stats.counts[DEFERRED] for name, stats in self.runner.stats.items() if stats.counts[DEFERRED]
+            }
+        return report
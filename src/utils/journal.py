@@ -0,0 +1,157 @@
+"""
+On-disk journal of raw upstream responses, for replaying a live session.
+
+The journal is a gzip compressed JSON-lines file. It opens with a `session`
+record holding what the app fetched once at import time (the expiries), then
+a `tick` record is written at the start of every `update_atm_iv_data` run
+with the (injectable) clock time, followed by one `response` record per
+upstream call made during that tick:
+
+    {"type": "session", "ts": 1718000000.0, "expiries": ["2024-06-27", ...]}
+    {"type": "tick", "ts": 1718000000.25, "clock": "2024-06-10T10:13:20.250000"}
+    {"type": "response", "ts": ..., "key": "ATM_IV", "status": 200,
+     "headers": {"ETag": ..., "X-Sequence": ..., "X-Delta": ...}, "body": "..."}
+
+Bodies are stored exactly as received so replay goes through the same
+decoding path as a live run.
+"""
+from datetime import datetime
+import gzip
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils.logger import logger
+
+JOURNALED_HEADERS = ("ETag", "X-Sequence", "X-Delta")
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.file = None
+        self.path: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.file is not None
+
+    def open(self, directory: str, session: Dict[str, Any]) -> str:
+        os.makedirs(directory, exist_ok=True)
+        name = datetime.now().strftime("upstream-%Y%m%d-%H%M%S.jsonl.gz")
+        with self.lock:
+            self.path = os.path.join(directory, name)
+            self.file = gzip.open(self.path, "at", encoding="utf-8")
+        self._write({"type": "session", "ts": time.time(), **session}, flush=True)
+        logger.info(f"Recording upstream responses to {self.path}")
+        return self.path
+
+    def close(self) -> None:
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def _write(self, record: Dict[str, Any], flush: bool = False) -> None:
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(line)
+            if flush:
+                self.file.flush()
+
+    def tick(self, clock_time: datetime) -> None:
+        # flush the previous tick so a crash loses at most the current one
+        self._write({"type": "tick", "ts": time.time(), "clock": clock_time.isoformat()}, flush=True)
+
+    def response(self, key: str, status: int, headers: Dict[str, str], body: bytes) -> None:
+        self._write({
+            "type": "response",
+            "ts": time.time(),
+            "key": key,
+            "status": status,
+            "headers": {h: headers[h] for h in JOURNALED_HEADERS if h in headers},
+            "body": body.decode("utf-8"),
+        })
+
+
+class RecordedResponse:
+    def __init__(self, status: int, headers: Dict[str, str], body: str):
+        self.status_code = status
+        self.headers = headers
+        self.content = body.encode("utf-8")
+
+
+class Tick:
+    def __init__(self, ts: float, clock: datetime):
+        self.ts = ts
+        self.clock = clock
+        self.responses: Dict[str, List[RecordedResponse]] = {}
+
+
+def _lines(file) -> Iterator[str]:
+    try:
+        yield from file
+    except EOFError:
+        # gzip stream cut short by a crash, keep what was flushed
+        return
+
+
+def read_session(path: str) -> Dict[str, Any]:
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        record = json.loads(file.readline() or "{}")
+    return record if record.get("type") == "session" else {}
+
+
+def read_ticks(path: str) -> Iterator[Tick]:
+    """Group a journal back into ticks, responses keyed by request key."""
+    current: Optional[Tick] = None
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in _lines(file):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # torn last line of a journal that was not closed cleanly
+                break
+            if record["type"] == "tick":
+                if current is not None:
+                    yield current
+                current = Tick(record["ts"], datetime.fromisoformat(record["clock"]))
+            elif current is not None:
+                response = RecordedResponse(record["status"], record["headers"], record["body"])
+                current.responses.setdefault(record["key"], []).append(response)
+    if current is not None:
+        yield current
+
+
+class Player:
+    """
+    Serves the responses of one recorded tick in place of the network. A key
+    that was not requested during the recorded tick answers as not modified.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.responses: Dict[str, List[RecordedResponse]] = {}
+        self.active = False
+
+    def load(self, tick: Tick) -> None:
+        with self.lock:
+            self.active = True
+            self.responses = {key: list(items) for key, items in tick.responses.items()}
+
+    def next(self, key: str) -> Optional[RecordedResponse]:
+        with self.lock:
+            items = self.responses.get(key)
+            return items.pop(0) if items else None
+
+    def unused(self) -> List[Tuple[str, int]]:
+        with self.lock:
+            return [(key, len(items)) for key, items in self.responses.items() if items]
+
+
+recorder = Recorder()
+player = Player()
@@ -0,0 +1,64 @@
+"""
+Numeric kernels run by utils.offload, in a worker process or inline.
+
+Each kernel takes a dict of 1-d NumPy arrays and returns one, so inputs and
+outputs can travel through shared memory. Symbols arrive as integer codes.
+Keep this module free of app imports: worker processes import it on their
+own.
+"""
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+
+Arrays = Dict[str, np.ndarray]
+
+
+def _groups(query_symbol: np.ndarray, candidate_symbol: np.ndarray) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Query and candidate positions per symbol, candidates in their original order."""
+    query_order = np.argsort(query_symbol, kind="stable")
+    candidate_order = np.argsort(candidate_symbol, kind="stable")
+    query_sorted = query_symbol[query_order]
+    candidate_sorted = candidate_symbol[candidate_order]
+    for code in np.unique(query_sorted):
+        lo, hi = np.searchsorted(candidate_sorted, code, "left"), np.searchsorted(candidate_sorted, code, "right")
+        if lo == hi:
+            continue
+        q_lo, q_hi = np.searchsorted(query_sorted, code, "left"), np.searchsorted(query_sorted, code, "right")
+        yield query_order[q_lo:q_hi], candidate_order[lo:hi]
+
+
+def nearest_delta(arrays: Arrays) -> Arrays:
+    """
+    For every query row, the candidate of the same symbol whose delta is
+    closest (first one on ties), -1 when the symbol has no candidate.
+    """
+    query_symbol, query_delta = arrays["query_symbol"], arrays["query_delta"]
+    candidate_symbol, candidate_delta = arrays["candidate_symbol"], arrays["candidate_delta"]
+
+    index = np.full(len(query_symbol), -1, dtype=np.int64)
+    for queries, candidates in _groups(query_symbol, candidate_symbol):
+        distance = np.abs(candidate_delta[candidates][None, :] - query_delta[queries][:, None])
+        distance = np.where(np.isnan(distance), np.inf, distance)
+        best = distance.argmin(axis=1)
+        found = np.isfinite(distance[np.arange(len(queries)), best])
+        index[queries[found]] = candidates[best[found]]
+    return {"index": index}
+
+
+def min_delta_gap(arrays: Arrays, gap: float, sign: float) -> Arrays:
+    """
+    For every query row, the candidate of the same symbol with the smallest
+    `sign * (query delta - candidate delta)` that is still at least `gap`,
+    -1 when there is none.
+    """
+    query_symbol, query_delta = arrays["query_symbol"], arrays["query_delta"]
+    candidate_symbol, candidate_delta = arrays["candidate_symbol"], arrays["candidate_delta"]
+
+    index = np.full(len(query_symbol), -1, dtype=np.int64)
+    for queries, candidates in _groups(query_symbol, candidate_symbol):
+        diff = (query_delta[queries][:, None] - candidate_delta[candidates][None, :]) * sign
+        diff = np.where(diff >= gap, diff, np.inf)
+        best = diff.argmin(axis=1)
+        found = np.isfinite(diff[np.arange(len(queries)), best])
+        index[queries[found]] = candidates[best[found]]
+    return {"index": index}
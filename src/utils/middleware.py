@@ -0,0 +1,43 @@
+from typing import Optional
+
+from utils.api import upstream_status
+
+
+def data_age() -> Optional[float]:
+    """Age in seconds of the oldest upstream source screeners are built from."""
+    ages = [s["age"] for s in upstream_status().values() if s["age"] is not None]
+    return max(ages) if ages else None
+
+
+class DataAgeMiddleware:
+    """
+    Adds an `X-Data-Age` header (seconds since the stalest upstream source
+    last answered) to responses under `prefix`, so clients can tell a
+    screener served from the last good snapshot apart from a fresh one.
+    Responses of a suspended screener that could not catch up in time also
+    get `X-Stale: true`. Plain ASGI so streamed responses pass through
+    untouched.
+    """
+
+    def __init__(self, app, prefix: str):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope.get("path", "").startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_age(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                age = data_age()
+                if age is not None:
+                    headers.append((b"x-data-age", f"{age:.1f}".encode()))
+                # set by the router.events.reads dependency
+                if scope.get("state", {}).get("stale"):
+                    headers.append((b"x-stale", b"true"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_age)
@@ -0,0 +1,136 @@
+"""
+Runs CPU heavy screener kernels (utils.kernels) in worker processes, so
+they neither hold the GIL against each other nor against request handlers.
+
+Inputs and outputs are flat NumPy arrays laid out in one shared memory
+block each way; only the block name and the layout are pickled. With
+CPU_WORKERS=0 the kernels run inline in the calling thread.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+import threading
+import traceback
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.manager import settings
+from utils.logger import logger
+
+Arrays = Dict[str, np.ndarray]
+Layout = List[Tuple[str, str, Tuple[int, ...], int]]
+
+_ALIGN = 64
+
+
+def _share(arrays: Arrays) -> Tuple[SharedMemory, Dict[str, Any]]:
+    layout: Layout = []
+    offset = 0
+    for key, array in arrays.items():
+        layout.append((key, array.dtype.str, array.shape, offset))
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+    block = SharedMemory(create=True, size=max(offset, 1))
+    for key, dtype, shape, start in layout:
+        np.ndarray(shape, dtype, buffer=block.buf, offset=start)[...] = arrays[key]
+    return block, {"name": block.name, "layout": layout}
+
+
+def _views(block: SharedMemory, layout: Layout) -> Arrays:
+    return {key: np.ndarray(shape, dtype, buffer=block.buf, offset=start) for key, dtype, shape, start in layout}
+
+
+def _read(spec: Dict[str, Any]) -> Arrays:
+    block = SharedMemory(name=spec["name"])
+    try:
+        views = _views(block, spec["layout"])
+        arrays = {key: view.copy() for key, view in views.items()}
+        # views pin the buffer, the block cannot close while they live
+        del views
+    finally:
+        block.close()
+        block.unlink()
+    return arrays
+
+
+def _run_shared(kernel: Callable[..., Arrays], spec: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker side: read inputs in place, write outputs to a new block owned by the caller."""
+    block = SharedMemory(name=spec["name"])
+    try:
+        views = _views(block, spec["layout"])
+        try:
+            result = kernel(views, **params)
+        except Exception as error:
+            # the traceback keeps the kernel's locals alive, and with them views of the block
+            traceback.clear_frames(error.__traceback__)
+            raise
+        finally:
+            del views
+    finally:
+        block.close()
+    out, out_spec = _share(result)
+    out.close()
+    return out_spec
+
+
+def _context():
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        # forked from a clean server process, not from this threaded one
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["utils.kernels"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class CpuPool:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_context())
+            return self.pool
+
+    def run(self, kernel: Callable[..., Arrays], arrays: Arrays, **params: Any) -> Arrays:
+        if self.workers <= 0:
+            return kernel(arrays, **params)
+
+        block, spec = _share(arrays)
+        try:
+            out_spec = self._executor().submit(_run_shared, kernel, spec, params).result()
+        except BrokenProcessPool:
+            # a worker died, start a fresh pool on the next call
+            logger.error("CPU worker pool broke, restarting it")
+            with self.lock:
+                self.pool = None
+            raise
+        finally:
+            block.close()
+            block.unlink()
+        return _read(out_spec)
+
+    def warm(self) -> None:
+        """Start the worker processes ahead of the first kernel."""
+        if self.workers > 0:
+            list(self._executor().map(abs, range(self.workers)))
+
+    def shutdown(self) -> None:
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = None
+
+
+def symbol_codes(*columns: pd.Series) -> List[np.ndarray]:
+    """Integer codes for symbol columns, consistent across all of them."""
+    codes, _ = pd.factorize(pd.concat(columns, ignore_index=True))
+    bounds = np.cumsum([0] + [len(column) for column in columns])
+    return [codes[lo:hi].astype(np.int64) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+cpu_pool = CpuPool(settings.CPU_WORKERS)
@@ -0,0 +1,126 @@
+"""
+Overrun accounting for the interval tick job.
+
+The job runs with `coalesce` and `max_instances=1`, so at most one tick is
+pending and overlapping runs are dropped. This keeps count of what the
+scheduler dropped and of ticks that took longer than the interval, and can
+stretch the interval to the measured tick time so the refresh rate we
+report is the one we actually achieve.
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from apscheduler.triggers.interval import IntervalTrigger
+
+from utils.logger import logger
+
+
+class TickPacer:
+    def __init__(self, job_id: str, adaptive: bool, headroom: float, max_interval_ms: int, smoothing: float = 0.3):
+        self.job_id = job_id
+        self.adaptive = adaptive
+        self.headroom = headroom
+        self.max_interval_ms = max_interval_ms
+        self.smoothing = smoothing
+        self.lock = threading.Lock()
+        self.scheduler: Any = None
+        # interval asked for (config or /admin), and the one currently scheduled
+        self.base_ms = 0
+        self.interval_ms = 0
+        self.last_ms: Optional[float] = None
+        self.avg_ms: Optional[float] = None
+        self.overrunning = False
+        self.counts = {"run": 0, "late": 0, "skipped": 0, "missed": 0, "failed": 0}
+
+    def attach(self, scheduler: Any, interval_ms: int) -> None:
+        self.scheduler = scheduler
+        self.base_ms = self.interval_ms = interval_ms
+        scheduler.add_listener(self._on_event, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED | EVENT_JOB_ERROR)
+
+    def trigger(self) -> IntervalTrigger:
+        return IntervalTrigger(seconds=self.interval_ms / 1000)
+
+    def wrap(self, tick: Callable[[], Any]) -> Callable[[], Any]:
+        if asyncio.iscoroutinefunction(tick):
+
+            async def timed_async_tick() -> None:
+                started = time.monotonic()
+                try:
+                    await tick()
+                finally:
+                    self._record((time.monotonic() - started) * 1000)
+
+            return timed_async_tick
+
+        def timed_tick() -> None:
+            started = time.monotonic()
+            try:
+                tick()
+            finally:
+                self._record((time.monotonic() - started) * 1000)
+
+        return timed_tick
+
+    def set_base(self, interval_ms: int) -> None:
+        with self.lock:
+            self.base_ms = interval_ms
+        self._reschedule(interval_ms)
+
+    def _on_event(self, event: Any) -> None:
+        if event.job_id != self.job_id:
+            return
+        with self.lock:
+            if event.code == EVENT_JOB_MAX_INSTANCES:
+                # previous tick still running when this one was due
+                self.counts["skipped"] += 1
+            elif event.code == EVENT_JOB_MISSED:
+                # the scheduler itself could not start it in time
+                self.counts["missed"] += 1
+            else:
+                self.counts["failed"] += 1
+
+    def _record(self, duration_ms: float) -> None:
+        with self.lock:
+            self.counts["run"] += 1
+            self.last_ms = duration_ms
+            if self.avg_ms is None:
+                self.avg_ms = duration_ms
+            else:
+                self.avg_ms += self.smoothing * (duration_ms - self.avg_ms)
+            late = duration_ms > self.interval_ms
+            if late:
+                self.counts["late"] += 1
+            # log the transitions, not every tick of a sustained overrun
+            if late and not self.overrunning:
+                logger.warning(f"Tick took {duration_ms:.0f}ms, longer than the {self.interval_ms}ms interval")
+            elif self.overrunning and not late:
+                logger.info(f"Ticks back within the {self.interval_ms}ms interval")
+            self.overrunning = late
+            if not self.adaptive:
+                return
+            target = int(min(max(self.base_ms, self.avg_ms * self.headroom), max(self.base_ms, self.max_interval_ms)))
+            # only move on a real change, the average wobbles every tick
+            if abs(target - self.interval_ms) <= 0.1 * self.interval_ms:
+                return
+        logger.info(f"Tick interval adapted to {target}ms (average tick {self.avg_ms:.0f}ms)")
+        self._reschedule(target)
+
+    def _reschedule(self, interval_ms: int) -> None:
+        with self.lock:
+            self.interval_ms = interval_ms
+        if self.scheduler is not None and self.scheduler.get_job(self.job_id):
+            self.scheduler.reschedule_job(self.job_id, trigger=self.trigger())
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "interval_ms": self.interval_ms,
+                "configured_interval_ms": self.base_ms,
+                "adaptive": self.adaptive,
+                "last_tick_ms": None if self.last_ms is None else round(self.last_ms, 1),
+                "avg_tick_ms": None if self.avg_ms is None else round(self.avg_ms, 1),
+                **self.counts,
+            }
@@ -0,0 +1,129 @@
+"""
+`filter`, `limit`, `offset`, `fields` and `sort` for the screener endpoints.
+
+They apply to every table of a payload. Rows are picked by position on the
+snapshot frame, first those the filter expression (`utils.filters`) keeps, which keeps the order the screener sorted it in unless
+`sort` asks for another (only the sort columns are sorted). Then just the
+picked rows and the requested columns are copied out, so the cost follows
+the size of the page rather than of the frame.
+"""
+import math
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.filters import Filter, FilterError, compile_filter
+
+
+class PageError(ValueError):
+    pass
+
+
+class Page(NamedTuple):
+    limit: Optional[int]
+    offset: int
+    fields: Tuple[str, ...]
+    # (column, descending)
+    sort: Tuple[Tuple[str, bool], ...]
+    filter: str = ""
+
+    @property
+    def everything(self) -> bool:
+        return self.limit is None and not self.offset and not self.fields and not self.sort and not self.filter
+
+    def key(self) -> str:
+        """Canonical form, for cache keys."""
+        sort = ",".join(("-" if descending else "") + column for column, descending in self.sort)
+        return f"limit={self.limit}&offset={self.offset}&fields={','.join(self.fields)}&sort={sort}&filter={self.filter}"
+
+
+def parse(limit: Optional[int], offset: int, fields: Optional[str], sort: Optional[str], filter: Optional[str] = None) -> Page:
+    names = tuple(dict.fromkeys(name.strip() for name in (fields or "").split(",") if name.strip()))
+    order = tuple(
+        (column.strip().lstrip("-"), column.strip().startswith("-"))
+        for column in (sort or "").split(",") if column.strip().lstrip("-")
+    )
+    return Page(limit, offset, names, order, (filter or "").strip())
+
+
+def _is_records(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(row, dict) for row in value)
+
+
+def _columns(table: Any) -> Set[str]:
+    if isinstance(table, pd.DataFrame):
+        return set(map(str, table.columns))
+    if _is_records(table):
+        return set().union(*(row.keys() for row in table))
+    return set()
+
+
+def _frame(frame: pd.DataFrame, page: Page, where: Optional[Filter]) -> pd.DataFrame:
+    window = slice(page.offset, None if page.limit is None else page.offset + page.limit)
+    rows = np.arange(len(frame)) if where is None else np.flatnonzero(where.mask(frame))
+    sort = [(column, descending) for column, descending in page.sort if column in frame.columns]
+    if sort:
+        keys = [column for column, _ in sort]
+        order = (
+            frame[keys]
+            .iloc[rows]
+            .reset_index(drop=True)
+            .sort_values(keys, ascending=[not descending for _, descending in sort], kind="stable", na_position="last")
+            .index.to_numpy()
+        )
+        rows = rows[order]
+    rows = rows[window]
+    columns = [frame.columns.get_loc(column) for column in page.fields if column in frame.columns] if page.fields else slice(None)
+    return frame.iloc[rows, columns]
+
+
+def _missing(value: Any) -> bool:
+    # NaN too, as frames serialised to records carry it
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _records(rows: List[Dict[str, Any]], page: Page, where: Optional[Filter]) -> List[Dict[str, Any]]:
+    if where is not None:
+        rows = [row for row, keep in zip(rows, where.mask(pd.DataFrame.from_records(rows))) if keep]
+    for column, descending in reversed(page.sort):
+        # stable, so earlier sort columns take precedence; missing values go last
+        present = [row for row in rows if not _missing(row.get(column))]
+        missing = [row for row in rows if _missing(row.get(column))]
+        rows = sorted(present, key=lambda row: row[column], reverse=descending) + missing
+    rows = rows[page.offset:None if page.limit is None else page.offset + page.limit]
+    if page.fields:
+        rows = [{column: row[column] for column in page.fields if column in row} for row in rows]
+    return rows
+
+
+def _table(table: Any, page: Page, where: Optional[Filter]) -> Any:
+    if isinstance(table, pd.DataFrame):
+        return _frame(table, page, where)
+    if _is_records(table):
+        return _records(table, page, where)
+    return table
+
+
+def apply(payload: Any, page: Page) -> Any:
+    """
+    `payload` with the page applied to each of its tables. A table without
+    every column the filter reads has no matching rows. Raises PageError
+    for an invalid filter, and for columns none of its tables has.
+    """
+    try:
+        where = compile_filter(page.filter) if page.filter else None
+    except FilterError as error:
+        raise PageError(str(error)) from error
+    tables = payload if isinstance(payload, dict) else {"": payload}
+    known = set().union(*(_columns(table) for table in tables.values()))
+    unknown = sorted({*page.fields, *(column for column, _ in page.sort)} - known | (where.missing(known) if where else set()))
+    if unknown:
+        raise PageError(f"Unknown columns: {unknown}")
+    try:
+        paged = {name: _table(table, page, where) for name, table in tables.items()}
+    except FilterError as error:
+        raise PageError(str(error)) from error
+    except TypeError as error:
+        raise PageError(f"Cannot sort by {[column for column, _ in page.sort]}: {error}") from error
+    return paged if isinstance(payload, dict) else paged[""]
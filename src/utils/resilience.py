@@ -0,0 +1,129 @@
+"""
+Failure handling for upstream calls: circuit breaker, hedged requests and
+retry backoff with jitter.
+"""
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+
+class CircuitOpen(httpx.RequestError):
+    """Raised instead of calling upstream while a breaker is open."""
+
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and fails fast for
+    `cooldown` seconds. After that a single trial call is let through
+    (half-open): success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, name: str, threshold: int, cooldown: float):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> None:
+        with self.lock:
+            state = self.state
+            if state == "open" or (state == "half-open" and self.trial_running):
+                raise CircuitOpen(f"Circuit for {self.name} is open")
+            if state == "half-open":
+                self.trial_running = True
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
+# only used to run the second copy of a hedged request
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+
+def hedged(call: Callable[[], Any], hedge_after: float) -> Any:
+    """
+    Run `call`, and if it has not finished after `hedge_after` seconds run a
+    second copy in parallel. The first successful result wins; an exception
+    is only raised once both copies have failed. `hedge_after <= 0` disables
+    hedging.
+    """
+    if hedge_after <= 0:
+        return call()
+
+    first: Future = _hedge_pool.submit(call)
+    try:
+        return first.result(timeout=hedge_after)
+    except FutureTimeout:
+        pass
+
+    pending = {first, _hedge_pool.submit(call)}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+async def hedged_async(call: Callable[[], Awaitable[Any]], hedge_after: float) -> Any:
+    """hedged() for coroutines; the losing copy is cancelled."""
+    if hedge_after <= 0:
+        return await call()
+
+    first = asyncio.ensure_future(call())
+    done, _ = await asyncio.wait({first}, timeout=hedge_after)
+    if done:
+        return first.result()
+
+    pending = {first, asyncio.ensure_future(call())}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+    finally:
+        for task in pending:
+            task.cancel()
+    raise error
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full jitter exponential backoff, in seconds."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
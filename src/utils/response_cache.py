@@ -0,0 +1,207 @@
+"""
+Encoded response bodies, built once per screener version.
+
+An endpoint's payload is built and encoded on the first request after its
+screener publishes a new version, and compressed once per encoding the
+server supports (gzip, plus br and zstd when `brotli` / `zstandard` are
+installed). Later requests for that version are a dict lookup and a copy
+of the bytes. Requests arriving while a body is being built wait for that
+build instead of starting their own.
+
+Frames are written with `DataFrame.to_json` straight into the payload,
+without the round trip through Python objects.
+
+Bodies carry the validators of the screener output they were built from,
+an ETag from its content fingerprint and its capture time as
+Last-Modified, so a poller whose copy is current gets a bodiless 304.
+"""
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import gzip
+import json
+import threading
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import pandas as pd
+from fastapi.responses import Response
+
+try:
+    import orjson
+
+    def _dumps(value: Any) -> bytes:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS, default=str)
+
+except ImportError:
+
+    def _dumps(value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+
+
+def _compressors() -> Dict[str, Callable[[bytes], bytes]]:
+    compressors: Dict[str, Callable[[bytes], bytes]] = {}
+    try:
+        import zstandard
+
+        compressors["zstd"] = zstandard.ZstdCompressor(level=10).compress
+    except ImportError:
+        pass
+    try:
+        import brotli
+
+        compressors["br"] = lambda body: brotli.compress(body, quality=5)
+    except ImportError:
+        pass
+    compressors["gzip"] = lambda body: gzip.compress(body, compresslevel=6)
+    return compressors
+
+
+# in order of preference
+COMPRESSORS = _compressors()
+
+# same floor as the GZipMiddleware in main
+MIN_COMPRESS_SIZE = 1000
+
+
+def encode(value: Any) -> bytes:
+    if isinstance(value, pd.DataFrame):
+        return value.to_json(orient="records").encode()
+    if isinstance(value, dict):
+        return b"{" + b",".join(_dumps(str(key)) + b":" + encode(item) for key, item in value.items()) + b"}"
+    if isinstance(value, (list, tuple)) and any(isinstance(item, pd.DataFrame) for item in value):
+        return b"[" + b",".join(encode(item) for item in value) + b"]"
+    return _dumps(value)
+
+
+def _accepted(header: str) -> List[str]:
+    accepted = []
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q=") and quality[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.append(coding.strip().lower())
+    return accepted
+
+
+def validators(fingerprint: str, updated: Optional[datetime]) -> Dict[str, str]:
+    # weak, one tag covers every encoding of the body
+    headers = {"ETag": f'W/"{fingerprint}"'}
+    if updated is not None:
+        headers["Last-Modified"] = format_datetime(updated.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def _not_modified(request_headers: Mapping[str, str], validators: Dict[str, str], updated: Optional[datetime] = None) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        tag = validators["ETag"].removeprefix("W/")
+        return any(
+            candidate.strip() == "*" or candidate.strip().removeprefix("W/") == tag
+            for candidate in if_none_match.split(",")
+        )
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is None or updated is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # Last-Modified drops the fraction of a second, a version captured later
+    # in the second the client's copy was stamped with is newer all the same
+    return updated.astimezone(timezone.utc) <= since
+
+
+class CachedBody:
+    __slots__ = ("version", "validators", "variants")
+
+    def __init__(self, version: int, body: bytes, validators: Dict[str, str]):
+        self.version = version
+        self.validators = validators
+        self.variants: Dict[Optional[str], bytes] = {None: body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            for coding, compress in COMPRESSORS.items():
+                self.variants[coding] = compress(body)
+
+    def negotiate(self, accept_encoding: str) -> Tuple[Optional[str], bytes]:
+        accepted = _accepted(accept_encoding)
+        for coding in COMPRESSORS:
+            if coding in self.variants and (coding in accepted or "*" in accepted):
+                return coding, self.variants[coding]
+        return None, self.variants[None]
+
+    def response(self, accept_encoding: str) -> Response:
+        coding, body = self.negotiate(accept_encoding)
+        headers = {**self.validators, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+        if coding is not None:
+            # GZipMiddleware leaves responses that already carry an encoding alone
+            headers["Content-Encoding"] = coding
+        return Response(body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    def __init__(self, workers: int = 4, max_entries: int = 512):
+        self.lock = threading.Lock()
+        # latest build per key, done or still running, least recently used first
+        self.entries: "OrderedDict[str, Tuple[int, Future]]" = OrderedDict()
+        # paged requests add a key per distinct page
+        self.max_entries = max_entries
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="response-cache")
+        self.counts = {"hit": 0, "build": 0, "coalesced": 0, "failed": 0, "not_modified": 0}
+
+    def _build(self, version: int, build: Callable[[], Any], validators: Dict[str, str]) -> CachedBody:
+        return CachedBody(version, encode(build()), validators)
+
+    def revalidate(
+        self, request_headers: Mapping[str, str], validators: Dict[str, str], updated: Optional[datetime] = None
+    ) -> Optional[Response]:
+        """
+        A 304 when the client already holds the body these validators
+        describe; If-Modified-Since is checked against `updated`, the full
+        precision capture time.
+        """
+        if not _not_modified(request_headers, validators, updated):
+            return None
+        with self.lock:
+            self.counts["not_modified"] += 1
+        return Response(status_code=304, headers={**validators, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"})
+
+    async def get(self, key: str, version: int, build: Callable[[], Any], validators: Dict[str, str]) -> CachedBody:
+        """The body of `key` at `version`, or at a newer one another request already built."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] >= version:
+                future = entry[1]
+                self.entries.move_to_end(key)
+                self.counts["hit" if future.done() else "coalesced"] += 1
+            else:
+                future = self.pool.submit(self._build, version, build, validators)
+                self.entries[key] = (version, future)
+                self.entries.move_to_end(key)
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                self.counts["build"] += 1
+
+        if future.done() and future.exception() is None:
+            return future.result()
+        try:
+            return await asyncio.wrap_future(future)
+        except Exception:
+            with self.lock:
+                if self.entries.get(key, (None, None))[1] is future:
+                    # let the next request try again
+                    del self.entries[key]
+                    self.counts["failed"] += 1
+            raise
+
+    def report(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "encodings": list(COMPRESSORS),
+                "entries": {key: version for key, (version, _) in self.entries.items()},
+                **self.counts,
+            }
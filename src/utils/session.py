@@ -0,0 +1,127 @@
+"""
+Market session calendar, and the controller that paces the tick job by it.
+
+The tick runs at its normal interval while the market is open. Outside the
+session it is paused, or slowed to a configured after-hours interval. A
+warm-up runs once when pre-open starts and the end-of-day jobs run once
+after close.
+"""
+from datetime import date, datetime, time
+import threading
+from typing import Any, Callable, Iterable, Optional
+
+from utils import clock
+from utils.logger import logger
+
+PRE_OPEN = "pre_open"
+OPEN = "open"
+CLOSED = "closed"
+
+
+def _parse_time(value: str) -> time:
+    return datetime.strptime(value, "%H:%M:%S").time()
+
+
+class MarketCalendar:
+    def __init__(self, pre_open: str, open_: str, close: str, holidays: Iterable[str] = ()):
+        self.pre_open = _parse_time(pre_open)
+        self.open = _parse_time(open_)
+        self.close = _parse_time(close)
+        self.holidays = {datetime.strptime(day, "%Y-%m-%d").date() for day in holidays}
+
+    def trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays
+
+    def phase(self, at: datetime) -> str:
+        if not self.trading_day(at.date()):
+            return CLOSED
+        if self.open <= at.time() < self.close:
+            return OPEN
+        if self.pre_open <= at.time() < self.open:
+            return PRE_OPEN
+        return CLOSED
+
+    def after_close(self, at: datetime) -> bool:
+        return self.trading_day(at.date()) and at.time() >= self.close
+
+
+class SessionController:
+    def __init__(
+        self,
+        calendar: MarketCalendar,
+        enabled: bool,
+        after_hours_ms: int,
+        warm_up: Callable[[], Any],
+        end_of_day: Callable[[], Any],
+    ):
+        self.calendar = calendar
+        self.enabled = enabled
+        self.after_hours_ms = after_hours_ms
+        self.warm_up = warm_up
+        self.end_of_day = end_of_day
+        self.lock = threading.Lock()
+        self.scheduler: Any = None
+        self.pacer: Any = None
+        self.job_id = ""
+        self.open_interval: Callable[[], int] = lambda: 0
+        self.phase: Optional[str] = None
+        # trading day each once-a-day job last ran for
+        self.warmed_up: Optional[date] = None
+        self.closed_out: Optional[date] = None
+
+    def attach(self, scheduler: Any, pacer: Any, job_id: str, open_interval: Callable[[], int]) -> None:
+        self.scheduler = scheduler
+        self.pacer = pacer
+        self.job_id = job_id
+        self.open_interval = open_interval
+
+    def current_phase(self) -> str:
+        return self.calendar.phase(clock.now()) if self.enabled else OPEN
+
+    def apply(self) -> None:
+        """Set the tick job cadence for the current phase."""
+        if self.scheduler is None or not self.scheduler.get_job(self.job_id):
+            return
+        if self.current_phase() == OPEN:
+            self.pacer.set_base(self.open_interval())
+            self.scheduler.resume_job(self.job_id)
+        elif self.after_hours_ms > 0:
+            self.pacer.set_base(self.after_hours_ms)
+            self.scheduler.resume_job(self.job_id)
+        else:
+            self.scheduler.pause_job(self.job_id)
+
+    def check(self) -> None:
+        """Run periodically: follow phase changes and fire the once-a-day jobs."""
+        with self.lock:
+            now = clock.now()
+            phase = self.current_phase()
+            if phase != self.phase:
+                logger.info(f"Market session phase {self.phase} -> {phase}")
+                self.phase = phase
+                self.apply()
+
+            if not self.enabled:
+                return
+            if phase == PRE_OPEN and self.warmed_up != now.date():
+                self.warmed_up = now.date()
+                self._run("warm-up", self.warm_up)
+            # also catches a start after close that missed the transition
+            if self.calendar.after_close(now) and self.closed_out != now.date():
+                self.closed_out = now.date()
+                self._run("end of day", self.end_of_day)
+
+    def _run(self, name: str, job: Callable[[], Any]) -> None:
+        logger.info(f"Running {name} jobs")
+        try:
+            job()
+        except Exception:
+            logger.exception(f"{name.capitalize()} jobs failed")
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "phase": self.current_phase(),
+            "last_warm_up": self.warmed_up.isoformat() if self.warmed_up else None,
+            "last_end_of_day": self.closed_out.isoformat() if self.closed_out else None,
+        }
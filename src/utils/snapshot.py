@@ -0,0 +1,147 @@
+"""
+Versioned, immutable snapshots of every screener's output.
+
+A screener's outputs are captured by its stage right after it updates,
+frozen into copies, and published with the rest of the tick as a new
+snapshot in a single reference swap. Endpoints load `store.current` once
+and serve everything from it, so a response never mixes two ticks.
+
+Snapshot versions only grow. Each screener also carries the version of
+the snapshot that last changed its output: a tick that recomputes the
+same data keeps it, so it can key caches.
+"""
+import copy
+from datetime import datetime
+import hashlib
+import json
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import pandas as pd
+
+from utils import clock
+from utils.logger import logger
+
+
+class ScreenerOutput:
+    __slots__ = ("version", "updated", "fingerprint", "views")
+
+    def __init__(self, version: int, updated: Optional[datetime], fingerprint: Optional[str], views: Mapping[str, Any]):
+        self.version = version
+        self.updated = updated
+        self.fingerprint = fingerprint
+        self.views = views
+
+
+class Snapshot:
+    __slots__ = ("version", "created", "screeners")
+
+    def __init__(self, version: int, created: datetime, screeners: Mapping[str, ScreenerOutput]):
+        self.version = version
+        self.created = created
+        self.screeners = screeners
+
+    def output(self, name: str) -> ScreenerOutput:
+        return self.screeners[name]
+
+    def view(self, name: str, view: str) -> Any:
+        return self.screeners[name].views[view]
+
+
+def _digest(value: Any, digest) -> None:
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr(list(value.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(value.index).values.tobytes())
+        for _, column in value.items():
+            try:
+                hashed = pd.util.hash_pandas_object(column, index=False)
+            except TypeError:
+                # cells holding dicts or lists
+                hashed = pd.util.hash_pandas_object(column.astype(str), index=False)
+            digest.update(hashed.values.tobytes())
+    elif isinstance(value, (tuple, list)) and any(isinstance(item, pd.DataFrame) for item in value):
+        for item in value:
+            _digest(item, digest)
+    else:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(_freeze(item) for item in value)
+    return copy.deepcopy(value)
+
+
+class SnapshotStore:
+    def __init__(self, views: Dict[str, Dict[str, Callable[[], Any]]]):
+        # per screener, named accessors of the outputs its endpoints serve
+        self.views = views
+        self.lock = threading.Lock()
+        # captured since the last publish: fingerprint, capture time, frozen views
+        self.pending: Dict[str, Tuple[str, datetime, Dict[str, Any]]] = {}
+        self.current = Snapshot(0, clock.now(), MappingProxyType({}))
+        # called with every new snapshot, outside the lock
+        self.listeners: List[Callable[[Snapshot], None]] = []
+
+    def capture(self, name: str, quiet: bool = False) -> None:
+        """Freeze the current outputs of screener `name` for the next publish."""
+        try:
+            values = {view: accessor() for view, accessor in self.views[name].items()}
+            digest = hashlib.blake2b(digest_size=16)
+            for view in sorted(values):
+                digest.update(view.encode())
+                _digest(values[view], digest)
+            fingerprint = digest.hexdigest()
+        except Exception as error:
+            if quiet:
+                logger.info(f"No outputs of {name} to capture yet: {error!r}")
+            else:
+                logger.exception(f"Could not capture the outputs of {name}")
+            return
+
+        with self.lock:
+            pending = self.pending.get(name)
+            published = self.current.screeners.get(name)
+            last = pending[0] if pending else (published.fingerprint if published else None)
+            if fingerprint == last:
+                return
+        frozen = {view: _freeze(value) for view, value in values.items()}
+        with self.lock:
+            self.pending[name] = (fingerprint, clock.now(), frozen)
+
+    def capture_all(self) -> None:
+        """At startup, before any update; screeners that have not computed yet are skipped."""
+        for name in self.views:
+            self.capture(name, quiet=True)
+
+    def publish(self) -> Snapshot:
+        """Swap in a snapshot holding everything captured since the last publish."""
+        with self.lock:
+            if not self.pending:
+                return self.current
+            version = self.current.version + 1
+            screeners = dict(self.current.screeners)
+            for name, (fingerprint, updated, views) in self.pending.items():
+                screeners[name] = ScreenerOutput(version, updated, fingerprint, MappingProxyType(views))
+            self.pending = {}
+            self.current = snapshot = Snapshot(version, clock.now(), MappingProxyType(screeners))
+        for listener in self.listeners:
+            listener(snapshot)
+        return snapshot
+
+    def on_publish(self, listener: Callable[[Snapshot], None]) -> None:
+        self.listeners.append(listener)
+
+    def report(self) -> Dict[str, Any]:
+        snapshot = self.current
+        return {
+            "version": snapshot.version,
+            "created": snapshot.created.isoformat(),
+            "screeners": {
+                name: {"version": output.version, "updated": output.updated.isoformat() if output.updated else None}
+                for name, output in snapshot.screeners.items()
+            },
+        }
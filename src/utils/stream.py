@@ -0,0 +1,123 @@
+import threading
+from typing import Callable, Optional
+import httpx
+from config.manager import settings
+from utils.api import get_http_client, get_auth_headers
+from utils.logger import logger
+
+STREAM_ENDPOINT = "stream"
+
+
+class Debouncer:
+    """
+    Collapses bursts of `trigger()` calls into one run of `func` at most
+    `wait` seconds after the first of them. Never runs `func` concurrently;
+    a trigger that arrives during a run schedules exactly one more run.
+    """
+
+    def __init__(self, func: Callable[[], None], wait: float):
+        self.func = func
+        self.wait = wait
+        self.lock = threading.Lock()
+        self.timer: Optional[threading.Timer] = None
+        self.running = False
+        self.pending = False
+
+    def trigger(self) -> None:
+        with self.lock:
+            if self.running:
+                self.pending = True
+                return
+            if self.timer is not None:
+                return
+            self.timer = threading.Timer(self.wait, self._run)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _run(self) -> None:
+        with self.lock:
+            self.timer = None
+            self.running = True
+        try:
+            self.func()
+        except Exception:
+            logger.exception("Push triggered update failed")
+        finally:
+            with self.lock:
+                self.running = False
+                rerun, self.pending = self.pending, False
+            if rerun:
+                self.trigger()
+
+    def cancel(self) -> None:
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+
+class UpstreamSubscriber:
+    """
+    Keeps a server-sent events connection to upstream open and calls
+    `on_change` (debounced) for every update event. Reconnects with capped
+    exponential backoff.
+    """
+
+    def __init__(self, on_change: Callable[[], None], debounce_ms: int):
+        self.debouncer = Debouncer(on_change, debounce_ms / 1000)
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.last_event_id: Optional[str] = None
+
+    def start(self) -> None:
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="upstream-subscriber", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        self.debouncer.cancel()
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self.stop_event.is_set():
+            try:
+                self._listen()
+                backoff = 1.0
+                self.stop_event.wait(backoff)
+            except httpx.HTTPError as error:
+                logger.warning(f"Upstream stream dropped: {error}, reconnecting in {backoff:.0f}s")
+                self.stop_event.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            except Exception:
+                # a malformed event or a failing handler must not end push updates for good
+                logger.exception(f"Upstream stream failed, reconnecting in {backoff:.0f}s")
+                self.stop_event.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def _listen(self) -> None:
+        headers = {**get_auth_headers(), "Accept": "text/event-stream"}
+        if self.last_event_id:
+            headers["Last-Event-ID"] = self.last_event_id
+        timeout = httpx.Timeout(None, connect=settings.HTTP_CONNECT_TIMEOUT)
+
+        with get_http_client().stream("GET", STREAM_ENDPOINT, headers=headers, timeout=timeout) as response:
+            response.raise_for_status()
+            logger.info("Connected to upstream stream")
+            # catch up on anything missed while disconnected
+            self.debouncer.trigger()
+
+            event = None
+            for line in response.iter_lines():
+                if self.stop_event.is_set():
+                    return
+                if not line:
+                    if event == "update":
+                        self.debouncer.trigger()
+                    event = None
+                elif line.startswith(":"):
+                    continue
+                elif line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("id:"):
+                    self.last_event_id = line[3:].strip()